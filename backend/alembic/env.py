@@ -39,6 +39,11 @@ from app.data_models.folder_item import folder_item
 from app.data_models.category import Category
 from app.data_models.content_category import ContentCategory
 from app.data_models.tag import Tag
+from app.data_models.queue_job import QueueJob
+from app.data_models.background_job import BackgroundJob
+from app.data_models.embedding_cache import EmbeddingCacheEntry
+from app.data_models.summary_cache import SummaryCacheEntry
+from app.data_models.folder_suggestion import FolderSuggestion
 
 target_metadata = Base.metadata
 
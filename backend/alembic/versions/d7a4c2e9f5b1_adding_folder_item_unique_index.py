@@ -0,0 +1,41 @@
+"""adding folder item unique index
+
+Revision ID: d7a4c2e9f5b1
+Revises: c6b8e1d4f7a2
+Create Date: 2026-10-18 21:04:52.117360
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a4c2e9f5b1'
+down_revision: Union[str, None] = 'c6b8e1d4f7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keep the first filing of every (user, folder, content), the index can't be built over duplicates
+    op.execute("""
+        DELETE FROM folder_item
+        WHERE folder_item_id IN (
+            SELECT folder_item_id FROM (
+                SELECT folder_item_id, row_number() OVER (
+                    PARTITION BY user_id, folder_id, content_id ORDER BY added_at, folder_item_id
+                ) AS position
+                FROM folder_item
+            ) AS ranked
+            WHERE ranked.position > 1
+        )
+    """)
+    op.create_index('ux_folder_item_user_folder_content', 'folder_item', ['user_id', 'folder_id', 'content_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_folder_item_user_folder_content', table_name='folder_item')
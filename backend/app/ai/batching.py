@@ -0,0 +1,175 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional, the estimate falls back to ~4 characters per token
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Copied in csphere-worker/classes and backend/app/ai, the two deploy separately. Keep them
+# identical: csphere-worker/tests/batching_test.py fails when the copies drift
+
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def split_batches(texts: list[str], max_batch_size: int, max_tokens: int,
+                  cost: Callable[[str], int] = estimate_tokens) -> list[list[int]]:
+    '''
+    Groups the indexes of texts into requests of at most max_batch_size inputs and
+    max_tokens tokens. A text over the budget on its own still gets a request
+    '''
+    batches = []
+    current, tokens = [], 0
+    for index, text in enumerate(texts):
+        weight = cost(text)
+        if current and (len(current) >= max_batch_size or tokens + weight > max_tokens):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(index)
+        tokens += weight
+    if current:
+        batches.append(current)
+    return batches
+
+
+class MicroBatcher:
+    '''
+    Turns concurrent single calls into batched ones. submit() blocks its caller while a
+    background thread waits up to max_wait for more items (or until a batch is full),
+    calls batch_fn once with all of them and hands each caller its own result.
+
+    :param batch_fn: list of items -> list of results, in the same order
+    :param max_batch_size: items per batch_fn call
+    :param max_wait: seconds the first item of a batch waits for company
+    :param max_cost: budget per batch, items are weighed with cost (e.g. tokens)
+    '''
+
+    def __init__(self, batch_fn: Callable[[list], list], max_batch_size: int = 64, max_wait: float = 0.005,
+                 max_cost: Optional[int] = None, cost: Callable = estimate_tokens, name: str = 'batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_cost = max_cost
+        self.cost = cost
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._carry = None
+        self._closed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'items': 0, 'batches': 0}
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def submit(self, item, timeout: Optional[float] = None):
+        return self.submit_async(item).result(timeout=timeout)
+
+    def submit_async(self, item) -> Future:
+        if self._closed:
+            raise RuntimeError(f"{self.name} is closed")
+        self._start()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = round(stats['items'] / stats['batches'], 2) if stats['batches'] else 0.0
+        return stats
+
+    def close(self):
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _collect(self) -> Optional[list]:
+        first = self._carry or self._queue.get()
+        self._carry = None
+        if first is None:
+            return None
+
+        batch = [first]
+        cost = self._cost(first)
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # flush what we have, stop on the next round
+                self._queue.put(None)
+                break
+
+            weight = self._cost(entry)
+            if self.max_cost is not None and cost + weight > self.max_cost:
+                # over budget, it opens the next batch
+                self._carry = entry
+                break
+            batch.append(entry)
+            cost += weight
+        return batch
+
+    def _cost(self, entry) -> int:
+        return self.cost(entry[0]) if self.max_cost is not None else 0
+
+    def _flush(self, batch: list):
+        items = [item for item, _ in batch]
+        with self._lock:
+            self._stats['items'] += len(items)
+            self._stats['batches'] += 1
+
+        try:
+            results = self.batch_fn(items)
+            if len(results) != len(items):
+                raise ValueError(f"{self.name}: got {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
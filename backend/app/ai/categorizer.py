@@ -1,12 +1,39 @@
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from app.core.settings import get_settings
+from app.ai.embedder import Embedder, get_embedder
 from app.classes import iab
+from app.classes.iab_centroids import CentroidIndex, CentroidCategorizer
 
 
 class Categorizer:
-    def __init__(self, file_path: str = "dummy.txt", file_url: str = ""):
-        self._impl = iab.SolrQueryIAB(file_path=file_path, file_url=file_url)
+    '''
+    IAB categories for a summary. The default 'centroid' backend scores the summary
+    embedding against precomputed category centroids in process, 'solr' (or
+    CATEGORIZER_BACKEND=solr) uploads it to the remote Solr processing API
+    '''
 
-    def categorize(self, ai_summary: str) -> Dict[str, List[Tuple[str, float]]]:
-        self._impl.setAiSummary(ai_summary=ai_summary)
-        self._impl.index_data()
-        return self._impl.get_categories()
+    def __init__(self, file_path: str = "dummy.txt", file_url: str = "", backend: Optional[str] = None,
+                 embedder: Optional[Embedder] = None):
+        self.backend = backend or get_settings().CATEGORIZER_BACKEND
+        if self.backend == 'solr':
+            self._impl = iab.SolrQueryIAB(file_path=file_path, file_url=file_url)
+        else:
+            self._impl = get_centroid_categorizer(embedder)
+
+    def categorize(self, ai_summary: str, embedding=None) -> Dict[str, List[Tuple[str, float]]]:
+        '''embedding: the summary's embedding when the caller already has it, saves embedding it again'''
+        return self._impl.categorize(ai_summary, embedding=embedding)
+
+
+@lru_cache()
+def get_centroid_categorizer(embedder: Optional[Embedder] = None) -> CentroidCategorizer:
+    '''One centroid matrix per process, loaded (or embedded once and saved) on first use'''
+    settings = get_settings()
+    embedder = embedder or get_embedder()
+    return CentroidCategorizer(
+        lambda: CentroidIndex.load_or_build(settings.IAB_CENTROIDS_PATH, embedder.embed_many, model=embedder.model),
+        embedder.embed,
+        cutoff=settings.IAB_CUTOFF,
+        top_k=settings.IAB_TOP_K,
+    )
@@ -1,21 +1,89 @@
 import os
-from typing import List
-from app.core.settings import Settings
+import logging
+from functools import lru_cache
+from typing import List, Optional
+from app.core.settings import get_settings
+from app.ai.batching import MicroBatcher, split_batches
+from app.embeddings.embedding_cache import EmbeddingCache, get_embedding_cache
 from openai import OpenAI
 
+logger = logging.getLogger(__name__)
+
 
 class Embedder:
-    def __init__(self, model_name: str = "text-embedding-3-small"):
+    '''
+    embed() calls made at the same time (search requests on different threads) are
+    collected by a MicroBatcher for a few ms and sent as one request, embed_many()
+    sends a list with as few requests as the batch size / token limits allow.
+    Both check the embedding cache first, only misses reach the API
+    '''
+
+    def __init__(self, model_name: str = "text-embedding-3-small", max_batch_size: Optional[int] = None,
+                 max_batch_tokens: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                 cache: Optional[EmbeddingCache] = None):
+        settings = get_settings()
         self.model = model_name
+        self.dims = settings.EMBED_DIMENSIONS
+        self.cache = cache if cache is not None else get_embedding_cache()
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.max_batch_size = max_batch_size or settings.EMBED_MAX_BATCH_SIZE
+        self.max_batch_tokens = max_batch_tokens or settings.EMBED_MAX_BATCH_TOKENS
+
+        wait_ms = settings.EMBED_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.batcher = MicroBatcher(
+            self._request_and_store,
+            max_batch_size=self.max_batch_size,
+            max_wait=wait_ms / 1000,
+            max_cost=self.max_batch_tokens,
+            name='embedder',
+        )
 
     def embed(self, text: str) -> List[float]:
         try:
-            resp = self.client.embeddings.create(
-                model=self.model,
-                input=text,
-            )
-            return resp.data[0].embedding
+            if self.cache is not None:
+                cached = self.cache.get_many(self.model, self.dims, [text])[0]
+                if cached is not None:
+                    return cached
+            return self.batcher.submit(text)
         except Exception as e:
             print(f"OpenAI embedding failed: {e}")
             return None
+
+    def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        '''Vectors in the same order as texts, None for empty texts and failed requests'''
+        if self.cache is not None:
+            return self.cache.embed_many(self.model, self.dims, texts, self._request)
+        return self._request(texts)
+
+    def close(self):
+        self.batcher.close()
+
+    def _request_and_store(self, texts: List[str]) -> List[Optional[List[float]]]:
+        vectors = self._request(texts)
+        if self.cache is not None:
+            self.cache.put_many(self.model, self.dims, texts, vectors)
+        return vectors
+
+    def _request(self, texts: List[str]) -> List[Optional[List[float]]]:
+        results = [None] * len(texts)
+        indexes = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        for batch in split_batches([texts[i] for i in indexes], self.max_batch_size, self.max_batch_tokens):
+            batch_indexes = [indexes[i] for i in batch]
+            try:
+                resp = self.client.embeddings.create(
+                    model=self.model,
+                    input=[texts[i] for i in batch_indexes],
+                )
+            except Exception as e:
+                logger.error(f"OpenAI embedding request for {len(batch_indexes)} texts failed: {e}")
+                continue
+            for item in resp.data:
+                results[batch_indexes[item.index]] = item.embedding
+        return results
+
+
+@lru_cache()
+def get_embedder(model_name: str = "text-embedding-3-small") -> Embedder:
+    '''One Embedder (client, batcher thread) per model for the whole process'''
+    return Embedder(model_name=model_name)
@@ -25,10 +25,65 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENROUTER_API_KEY: str
 
-    ACTIVEMQ_URL: str
-    ACTIVEMQ_QUEUE: str
-    ACTIVEMQ_USER: str
-    ACTIVEMQ_PASS: str
+    # Embeddings: inputs and (estimated) tokens per request, and how long an embed()
+    # call waits for concurrent ones to share its request
+    EMBED_MAX_BATCH_SIZE: int = 256
+    EMBED_MAX_BATCH_TOKENS: int = 100_000
+    EMBED_BATCH_WAIT_MS: float = 5.0
+    # text-embedding-3-small, part of the embedding cache key
+    EMBED_DIMENSIONS: int = 1536
+
+    # Embedding cache: in-process LRU in front of the embedding_cache table ('postgres'),
+    # or memory only ('none')
+    EMBED_CACHE_ENABLED: bool = True
+    EMBED_CACHE_STORE: str = 'postgres'
+    EMBED_CACHE_MAX_ENTRIES: int = 10_000
+    EMBED_CACHE_MAX_ROWS: int = 500_000
+    # reads refresh a row's last_used_at at most once per this many seconds
+    EMBED_CACHE_TOUCH_AFTER: int = 3600
+
+    # IAB categories: 'centroid' scores the summary embedding against precomputed
+    # category centroids in process (built on first use and saved to IAB_CENTROIDS_PATH),
+    # 'solr' keeps the remote Solr round trips
+    CATEGORIZER_BACKEND: str = 'centroid'
+    IAB_CENTROIDS_PATH: str = 'iab_centroids.npz'
+    IAB_CUTOFF: float = 0.3
+    IAB_TOP_K: int = 3
+    # Link the centroid categorizer's IAB tier 2 labels to saved content instead of the
+    # LLM's categories. Off keeps the app's categories, ignored with the Solr backend
+    IAB_LINK_CATEGORIES: bool = False
+
+    # 'activemq' or 'postgres' (job_queue table, same database as the app)
+    QUEUE_BACKEND: str = 'activemq'
+    QUEUE_NAME: str = 'csphere'
+    # bookmark imports go to their own lane, empty sends them to the main queue
+    QUEUE_BULK_NAME: str = 'csphere.bulk'
+
+    # Claim check: html over PAYLOAD_OFFLOAD_BYTES is stored zstd compressed in the
+    # payload store ('s3', 'local' or 'none') and the message carries a reference
+    PAYLOAD_STORE: str = 's3'
+    PAYLOAD_LOCAL_DIR: str = 'payload_store'
+    PAYLOAD_OFFLOAD_BYTES: int = 64 * 1024
+    PAYLOAD_ZSTD_LEVEL: int = 3
+
+    # Page captured by the extension on /content/save: request bodies are capped on the
+    # wire when gzip compressed and once decompressed (or as sent), the html and the
+    # readable text are truncated. Every /content route reads its body with these caps
+    SAVE_MAX_COMPRESSED_BYTES: int = 2 * 1024 * 1024
+    SAVE_MAX_BODY_BYTES: int = 8 * 1024 * 1024
+    SAVE_MAX_HTML_CHARS: int = 2 * 1024 * 1024
+    SAVE_MAX_TEXT_CHARS: int = 20_000
+    # /content/import carries the whole bookmark tree
+    IMPORT_MAX_BODY_BYTES: int = 64 * 1024 * 1024
+
+    # bookmarks per batch message sent to the worker by an import
+    IMPORT_CHUNK_SIZE: int = 50
+
+    ACTIVEMQ_URL: str = ''
+    ACTIVEMQ_BULK_QUEUE: str = ''
+    ACTIVEMQ_QUEUE: str = ''
+    ACTIVEMQ_USER: str = ''
+    ACTIVEMQ_PASS: str = ''
 
 
 @lru_cache()
@@ -0,0 +1,35 @@
+import uuid
+
+from sqlalchemy import Column, String, Integer, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class BackgroundJob(Base):
+    '''
+    Progress of long running work started from a request (bookmark imports, library
+    re-bucketing).
+    The api fills in the counts it knows when it hands the work off, the worker
+    bumps processed as it finishes chunks
+    '''
+    __tablename__ = "background_job"
+
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    # pending -> running -> enqueued -> completed, or failed
+    status = Column(String, nullable=False, server_default="pending")
+    total = Column(Integer, nullable=False, server_default="0")
+    skipped = Column(Integer, nullable=False, server_default="0")
+    linked = Column(Integer, nullable=False, server_default="0")
+    enqueued = Column(Integer, nullable=False, server_default="0")
+    processed = Column(Integer, nullable=False, server_default="0")
+    error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_background_job_user", "user_id", "created_at"),
+    )
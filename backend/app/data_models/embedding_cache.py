@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, Integer, TIMESTAMP, Index
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import Vector
+
+from app.db.database import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # keyed by model, dimensions and the sha256 of the normalized text (app/embeddings/embedding_cache.py)
+    model = Column(String, primary_key=True)
+    dims = Column(Integer, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    last_used_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_embedding_cache_last_used", "last_used_at"),
+    )
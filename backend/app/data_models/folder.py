@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Boolean
+from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Boolean, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.database import Base
 from pydantic import BaseModel, EmailStr
@@ -25,7 +25,13 @@ class Folder(Base):
     url_patterns : Mapped[list[str]] = mapped_column(ARRAY(String))
     description : Mapped[str] = mapped_column(String)
     folder_embedding = Column(Vector(1536), nullable=True) #1536 for the gpt model param (small model)
+    # folder_embedding = folder_seed + embedding_sum, kept by the atomic updates in folder_profile.py
+    folder_seed = Column(Vector(1536), nullable=True)
+    embedding_sum = Column(Vector(1536), nullable=True)
+    member_count = Column(Integer, nullable=False, server_default="0")
     created_at = Column(TIMESTAMP, server_default="NOW()")
+    # bumped whenever the bucketing rules change, compiled folder matchers are keyed on it
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default="NOW()")
 
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, ForeignKeyConstraint
+from sqlalchemy import Boolean, Column, String, TIMESTAMP, ForeignKey, ForeignKeyConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.database import Base
 from pydantic import BaseModel, EmailStr
@@ -15,6 +15,8 @@ class folder_item(Base):
     user_id = Column(UUID(as_uuid=True), nullable=False)
     content_id = Column(UUID(as_uuid=True), nullable=False)
     added_at = Column(TIMESTAMP, server_default="NOW()")
+    # the content's embedding is counted in the folder's profile (embedding_sum / member_count)
+    profiled = Column(Boolean, nullable=False, server_default="false")
 
 
     __table_args__ = (
@@ -28,6 +30,8 @@ class folder_item(Base):
             ['folder.folder_id'],
             ondelete="CASCADE"
         ),
+        # a bookmark is filed in a folder once, bulk inserts skip the ones already there
+        Index("ux_folder_item_user_folder_content", "user_id", "folder_id", "content_id", unique=True),
     )
 
 
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Float, TIMESTAMP, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class FolderSuggestion(Base):
+    '''
+    Folder a re-bucketing job proposes for a bookmark, written when the job runs in
+    propose mode instead of filing the bookmarks itself
+    '''
+    __tablename__ = "folder_suggestion"
+
+    job_id = Column(UUID(as_uuid=True), ForeignKey("background_job.job_id", ondelete="CASCADE"), primary_key=True)
+    content_id = Column(UUID(as_uuid=True), ForeignKey("content.content_id", ondelete="CASCADE"), primary_key=True)
+    folder_id = Column(UUID(as_uuid=True), ForeignKey("folder.folder_id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_folder_suggestion_folder", "folder_id"),
+    )
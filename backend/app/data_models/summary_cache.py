@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Text, TIMESTAMP, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class SummaryCacheEntry(Base):
+    __tablename__ = "summary_cache"
+
+    # sha256 of the normalized summary input and a hash of the model / prompt
+    # (csphere-worker classes/summary_cache.py)
+    input_hash = Column(String(64), primary_key=True)
+    prompt_version = Column(String(32), primary_key=True)
+    summary = Column(Text, nullable=False)
+    categories = Column(JSONB, nullable=False, server_default='[]')
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_summary_cache_expires_at", "expires_at"),
+    )
@@ -1,7 +1,7 @@
 from functools import lru_cache
 from app.preprocessing.content_preprocessor import ContentPreprocessor
 from app.ai.summarizer import Summarizer
-from app.ai.embedder import Embedder
+from app.ai.embedder import get_embedder
 from app.embeddings.embedding_manager import ContentEmbeddingManager
 
 
@@ -9,7 +9,7 @@ from app.embeddings.embedding_manager import ContentEmbeddingManager
 def get_shared_services():
     content_preprocessor = ContentPreprocessor()
     summarizer = Summarizer(model="openrouter/auto:floor")
-    embedder = Embedder(model_name="text-embedding-3-small")
+    embedder = get_embedder("text-embedding-3-small")
     return content_preprocessor, summarizer, embedder
 
 
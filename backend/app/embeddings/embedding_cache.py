@@ -0,0 +1,241 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Copied in csphere-worker/classes, backend/app/embeddings and user-embedding-worker/classes
+# (the three deploy separately and share no package). Only the metrics calls and
+# get_embedding_cache may differ, the rest must stay identical since the copies share the
+# table: csphere-worker/tests/embedding_cache_test.py fails when one drifts
+
+
+Vector = List[float]
+
+
+def normalize_text(value: str) -> str:
+    '''Unicode NFC with whitespace runs collapsed, case is kept (it changes the embedding)'''
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', value)).strip()
+
+
+def text_hash(value: str) -> str:
+    return hashlib.sha256(normalize_text(value).encode('utf-8')).hexdigest()
+
+
+class PostgresEmbeddingStore:
+    '''
+    Persistent tier: the `embedding_cache` table, shared by the api and the workers.
+    Reads bump last_used_at in the same statement, but only on rows not used for
+    touch_after seconds, so a hot row is written once per interval rather than on every
+    read (pruning only needs last_used_at to that precision). The table is trimmed back
+    to max_rows least recently used rows every prune_every writes
+    '''
+
+    GET_SQL = text(
+        "WITH hits AS ("
+        "SELECT text_hash, embedding FROM embedding_cache "
+        "WHERE model = :model AND dims = :dims AND text_hash = ANY(:hashes)"
+        "), touched AS ("
+        "UPDATE embedding_cache SET last_used_at = now() WHERE (model, dims, text_hash) IN ("
+        "SELECT model, dims, text_hash FROM embedding_cache "
+        "WHERE model = :model AND dims = :dims AND text_hash = ANY(:hashes) "
+        "AND last_used_at < now() - make_interval(secs => :touch_after) "
+        "FOR UPDATE SKIP LOCKED)"
+        ") "
+        "SELECT text_hash, embedding::text FROM hits"
+    )
+    PUT_SQL = text(
+        "INSERT INTO embedding_cache (model, dims, text_hash, embedding) "
+        "VALUES (:model, :dims, :text_hash, CAST(:embedding AS vector)) "
+        "ON CONFLICT (model, dims, text_hash) DO NOTHING"
+    )
+    PRUNE_SQL = text(
+        "DELETE FROM embedding_cache WHERE (model, dims, text_hash) IN ("
+        "SELECT model, dims, text_hash FROM embedding_cache ORDER BY last_used_at DESC OFFSET :max_rows)"
+    )
+
+    def __init__(self, engine, max_rows: int = 500_000, prune_every: int = 1000, touch_after: int = 3600):
+        self.engine = engine
+        self.max_rows = max_rows
+        self.touch_after = touch_after
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, model: str, dims: int, hashes: list[str]) -> dict[str, Vector]:
+        with self.engine.begin() as conn:
+            rows = conn.execute(self.GET_SQL, {
+                'model': model, 'dims': dims, 'hashes': hashes, 'touch_after': self.touch_after,
+            }).all()
+        return {row[0]: _parse_vector(row[1]) for row in rows}
+
+    def put_many(self, model: str, dims: int, entries: dict[str, Vector]):
+        params = [
+            {'model': model, 'dims': dims, 'text_hash': key, 'embedding': _format_vector(vector)}
+            for key, vector in entries.items()
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(self.PUT_SQL, params)
+
+        with self._lock:
+            self._writes += len(params)
+            prune = self._writes >= self.prune_every
+            if prune:
+                self._writes = 0
+        if prune:
+            with self.engine.begin() as conn:
+                conn.execute(self.PRUNE_SQL, {'max_rows': self.max_rows})
+
+
+class EmbeddingCache:
+    '''
+    Content addressed embedding cache: (model, dims, sha256 of the normalized text).
+    An in-process LRU of max_entries vectors sits in front of an optional persistent
+    store, store errors are logged and treated as misses so the cache never fails an
+    embedding. stats() has the hit rate per tier
+    '''
+
+    def __init__(self, store: Optional[PostgresEmbeddingStore] = None, max_entries: int = 10_000):
+        self.store = store
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'store_hits': 0, 'misses': 0}
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def embed_many(self, model: str, dims: int, texts: List[str], embed_fn: Callable[[List[str]], list]) -> list:
+        '''
+        Cached vectors for texts, embed_fn is called once with the texts that missed
+        (each distinct text once). None results are not cached
+        '''
+        results = self.get_many(model, dims, texts)
+
+        missing = {}
+        for i, (value, vector) in enumerate(zip(texts, results)):
+            if vector is None and value and value.strip():
+                missing.setdefault(text_hash(value), []).append(i)
+        if not missing:
+            return results
+
+        keys = list(missing)
+        vectors = embed_fn([texts[missing[key][0]] for key in keys])
+
+        fresh = {}
+        for key, vector in zip(keys, vectors):
+            for i in missing[key]:
+                results[i] = vector
+            if vector is not None:
+                fresh[key] = vector
+        self._put(model, dims, fresh)
+        return results
+
+    def get_many(self, model: str, dims: int, texts: List[str]) -> list:
+        hashes = [text_hash(value) if value and value.strip() else None for value in texts]
+        results = [None] * len(texts)
+
+        lookup = {}
+        memory_hits = 0
+        with self._lock:
+            for i, key in enumerate(hashes):
+                if key is None:
+                    continue
+                vector = self._memory.get((model, dims, key))
+                if vector is not None:
+                    self._memory.move_to_end((model, dims, key))
+                    memory_hits += 1
+                    results[i] = vector
+                else:
+                    lookup.setdefault(key, []).append(i)
+            self._stats['memory_hits'] += memory_hits
+
+        if lookup and self.store is not None:
+            try:
+                stored = self.store.get_many(model, dims, list(lookup))
+            except Exception as e:
+                logger.warning(f"Embedding cache store read failed: {e}")
+                stored = {}
+            store_hits = 0
+            for key, vector in stored.items():
+                for i in lookup.pop(key, []):
+                    results[i] = vector
+                    store_hits += 1
+            with self._lock:
+                self._stats['store_hits'] += store_hits
+            self._remember(model, dims, stored)
+
+        misses = sum(len(indexes) for indexes in lookup.values())
+        with self._lock:
+            self._stats['misses'] += misses
+        return results
+
+    def put_many(self, model: str, dims: int, texts: List[str], vectors: list):
+        self._put(model, dims, {
+            text_hash(value): vector for value, vector in zip(texts, vectors)
+            if vector is not None and value and value.strip()
+        })
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['store_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['store_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _put(self, model: str, dims: int, entries: dict):
+        if not entries:
+            return
+        self._remember(model, dims, entries)
+        if self.store is not None:
+            try:
+                self.store.put_many(model, dims, entries)
+            except Exception as e:
+                logger.warning(f"Embedding cache store write failed: {e}")
+
+    def _remember(self, model: str, dims: int, entries: dict):
+        with self._lock:
+            for key, vector in entries.items():
+                self._memory[(model, dims, key)] = vector
+                self._memory.move_to_end((model, dims, key))
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+
+def _format_vector(vector: Vector) -> str:
+    return '[' + ','.join(repr(float(x)) for x in vector) + ']'
+
+
+def _parse_vector(value: str) -> Vector:
+    return [float(x) for x in value.strip('[]').split(',')] if value else []
+
+
+@lru_cache()
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    '''Process wide cache from EMBED_CACHE_* settings, None when it is turned off'''
+    settings = get_settings()
+    if not settings.EMBED_CACHE_ENABLED:
+        return None
+
+    store = None
+    if settings.EMBED_CACHE_STORE == 'postgres':
+        from app.db.database import engine
+        store = PostgresEmbeddingStore(
+            engine, max_rows=settings.EMBED_CACHE_MAX_ROWS, touch_after=settings.EMBED_CACHE_TOUCH_AFTER,
+        )
+    return EmbeddingCache(store=store, max_entries=settings.EMBED_CACHE_MAX_ENTRIES)
@@ -15,10 +15,14 @@ from app.classes import iab
 from dotenv import load_dotenv
 from app.preprocessing.content_preprocessor import ContentPreprocessor
 from app.ai.summarizer import Summarizer
-from app.ai.embedder import Embedder
+from app.ai.embedder import Embedder, get_embedder
 from app.ai.categorizer import Categorizer
+from app.core.settings import get_settings
+from app.classes.iab_centroids import category_labels
 
 from app.embeddings.semantic_cache import SemanticCache
+from app.embeddings.category_registry import get_category_registry
+from app.embeddings.folder_profile import add_to_filed_profiles
 from collections import defaultdict
 import logging
 
@@ -48,7 +52,7 @@ class ContentEmbeddingManager:
         # Service Layers 
         self.preprocessor = preprocessor or ContentPreprocessor()
         self.summarizer = summarizer or Summarizer(model="openrouter/auto:floor")
-        self.embedder = embedder or Embedder(model_name=self.embedding_model)
+        self.embedder = embedder or get_embedder(self.embedding_model)
         self.categorizer = categorizer or Categorizer(file_url=content_url)
         
         # Cache Layer
@@ -88,43 +92,15 @@ class ContentEmbeddingManager:
             
         
 
-            #Now create categories that are not yet in the DB
-            category_set = set()
-            db = self.db
-            for category_name in categories:
-                # get the first element's name from the list of tuples
-
-                if category_name.strip() != '':
-
-                    exists = db.query(Category).filter(Category.category_name == category_name).first()
-
-                    if exists:
-                        category_set.add(exists.category_id)
-                        continue
-
-                    utc_time = datetime.now(timezone.utc)
-
-                    new_category = Category(
-                        category_id=uuid4(),
-                        category_name=category_name,
-                        created_at=utc_time,
-                        date_modified=utc_time
-                    )
-
-                    db.add(new_category)
-                    category_set.add(new_category.category_id)
-
-            db.flush()
-
-            #add them to the corresponding content object
-
-            content.categories = db.query(Category).filter(Category.category_id.in_(category_set)).all()
-
             # Embed the summary associated with the content ORM
             embedding = self._generate_embedding(summary)
             if not embedding: 
                 raise Exception("Failed to generate embedding") 
 
+            # content_category rows need the content row, then one bulk insert links them
+            self.db.flush()
+            get_category_registry().link(self.db, {content.content_id: self._categorize(summary, embedding) or categories})
+
             # Insert the summary/embedding data into the ContentAI table
             content_ai = ContentAI(
                 content_id=content.content_id,
@@ -133,6 +109,9 @@ class ContentEmbeddingManager:
             )
 
             self.db.add(content_ai)
+            # folders the content was filed in before it had an embedding
+            self.db.flush()
+            add_to_filed_profiles(self.db, [content.content_id])
             self.db.commit()
             return content_ai
         
@@ -226,6 +205,21 @@ class ContentEmbeddingManager:
     ###############################################################################
 
 
+    def _categorize(self, summary: str, embedding) -> list[str]:
+        '''
+        IAB labels of the summary, scored with the embedding it already has, linked in place
+        of the LLM's categories with IAB_LINK_CATEGORIES. Only the centroid backend, a save
+        never waits on Solr
+        '''
+        if not get_settings().IAB_LINK_CATEGORIES or getattr(self.categorizer, 'backend', None) != 'centroid':
+            return []
+        try:
+            return category_labels(self.categorizer.categorize(summary, embedding=embedding))
+        except Exception as e:
+            logger.warning(f"Failed to categorize content: {e}")
+            return []
+
+
     def _enrich_content(self, url: str, content_id: UUID, db: Session, raw_html):
         try:
             metadata = self.preprocessor.extract(raw_html)
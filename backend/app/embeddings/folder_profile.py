@@ -0,0 +1,133 @@
+import logging
+from typing import Iterable, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Copied in csphere-worker/classes and backend/app/embeddings, the two deploy separately and
+# update the same rows. Keep them identical: csphere-worker/tests/folder_profile_test.py
+# fails when the copies drift
+
+
+# A folder's profile is kept as
+#   folder_seed      metadata embedding (name, description, keywords) * SEED_WEIGHT
+#   embedding_sum    sum of the embeddings of the content filed in the folder
+#   member_count     how many embeddings are in embedding_sum
+#   folder_embedding folder_seed + embedding_sum, what recall compares against. Cosine
+#                    distance ignores the length, so this ranks like the exact mean.
+#                    Without a seed it is the sum alone, NULL (never a zero vector, its
+#                    cosine distance is NaN) while the folder has no member. A folder whose
+#                    seed isn't backfilled yet keeps its old profile until set_folder_seed
+# folder_item.profiled records which filed items are in embedding_sum. Adding only takes
+# the items that aren't counted yet and have an embedding, removing only the counted ones,
+# so the two are exact inverses whatever the order things happen in. Content filed before
+# its embedding exists is added once it is embedded (add_to_filed_profiles).
+# Every change is one UPDATE: the embeddings are summed inside postgres and never come
+# back to python, concurrent updates can't lose each other.
+
+EMBEDDING_DIMS = 1536
+# the folder's description counts as this many bookmarks
+SEED_WEIGHT = 3.0
+
+_ZERO = f"array_fill(0, ARRAY[{EMBEDDING_DIMS}])::real[]::vector"
+
+_SHIFT_PROFILE = """
+WITH shifted AS (
+    UPDATE folder_item SET profiled = {profiled}
+    FROM content_ai
+    WHERE folder_item.content_id = ANY(CAST(:content_ids AS uuid[]))
+        AND {folders}
+        AND folder_item.profiled = {was_profiled}
+        AND content_ai.content_id = folder_item.content_id
+        AND content_ai.embedding IS NOT NULL
+    RETURNING folder_item.folder_id, content_ai.embedding
+), delta AS (
+    SELECT folder_id, sum(embedding) AS total, count(*) AS members
+    FROM shifted
+    GROUP BY folder_id
+)
+UPDATE folder SET
+    embedding_sum = {new_sum},
+    member_count = folder.member_count {op} delta.members,
+    folder_embedding = CASE
+        WHEN folder.folder_seed IS NOT NULL THEN folder.folder_seed + {new_sum}
+        -- the old blended profile of a folder migrated without a seed (backfill_folder_seeds)
+        WHEN folder.folder_embedding IS NOT NULL AND folder.folder_embedding IS DISTINCT FROM folder.embedding_sum
+            THEN folder.folder_embedding
+        WHEN folder.member_count {op} delta.members > 0 THEN {new_sum}
+    END
+FROM delta
+WHERE folder.folder_id = delta.folder_id
+"""
+
+_ONE_FOLDER = "folder_item.folder_id = CAST(:folder_id AS uuid)"
+_ADD = dict(new_sum=f"coalesce(folder.embedding_sum, {_ZERO}) + delta.total", op='+', profiled='true', was_profiled='false')
+_REMOVE = dict(new_sum=f"coalesce(folder.embedding_sum, {_ZERO}) - delta.total", op='-', profiled='false', was_profiled='true')
+
+ADD_TO_PROFILE = text(_SHIFT_PROFILE.format(folders=_ONE_FOLDER, **_ADD))
+REMOVE_FROM_PROFILE = text(_SHIFT_PROFILE.format(folders=_ONE_FOLDER, **_REMOVE))
+ADD_TO_FILED_PROFILES = text(_SHIFT_PROFILE.format(folders='true', **_ADD))
+
+SET_SEED = text(f"""
+UPDATE folder SET
+    folder_seed = CAST(:seed AS vector),
+    folder_embedding = CAST(:seed AS vector) + coalesce(folder.embedding_sum, {_ZERO})
+WHERE folder.folder_id = :folder_id
+""")
+
+
+def add_to_folder_profile(db: Session, folder_id: UUID | str, content_ids: Iterable[UUID | str]) -> bool:
+    '''
+    Adds the embeddings of content filed in the folder to its profile, in the caller's
+    transaction. Call it after the folder_item rows are inserted. False when nothing was
+    added (no embedding yet, or already counted)
+    '''
+    return _shift(db, ADD_TO_PROFILE, content_ids, folder_id=str(folder_id))
+
+
+def remove_from_folder_profile(db: Session, folder_id: UUID | str, content_ids: Iterable[UUID | str]) -> bool:
+    '''Exact inverse of add_to_folder_profile. Call it before the folder_item rows are deleted'''
+    return _shift(db, REMOVE_FROM_PROFILE, content_ids, folder_id=str(folder_id))
+
+
+def add_to_filed_profiles(db: Session, content_ids: Iterable[UUID | str]) -> bool:
+    '''
+    Adds newly embedded content to the profile of every folder it was filed in before it
+    had an embedding (a folder picked on save, a manual add while it was being enriched)
+    '''
+    return _shift(db, ADD_TO_FILED_PROFILES, content_ids)
+
+
+def set_folder_seed(db: Session, folder_id: UUID | str, metadata_embedding: Optional[list[float]]):
+    '''Replaces the metadata part of the profile, what the folder has learned is kept'''
+    if metadata_embedding is None:
+        return
+    seed = np.asarray(metadata_embedding, dtype=np.float32) * SEED_WEIGHT
+    db.execute(SET_SEED, {'folder_id': str(folder_id), 'seed': _vector_literal(seed)})
+
+
+def folder_centroid(embedding_sum, member_count: int) -> Optional[np.ndarray]:
+    '''Exact mean of the folder's content embeddings, None for an empty folder'''
+    if embedding_sum is None or not member_count:
+        return None
+    return np.asarray(embedding_sum, dtype=np.float32) / member_count
+
+
+###############################################################################
+# HELPER METHODS
+###############################################################################
+
+def _shift(db: Session, statement, content_ids, **params) -> bool:
+    content_ids = [str(content_id) for content_id in content_ids]
+    if not content_ids:
+        return False
+    result = db.execute(statement, {'content_ids': content_ids, **params})
+    return result.rowcount > 0
+
+
+def _vector_literal(vector: np.ndarray) -> str:
+    return '[' + ','.join(f"{value:.8g}" for value in vector.tolist()) + ']'
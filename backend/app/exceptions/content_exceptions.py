@@ -19,4 +19,9 @@ class NotesNotFound(Exception):
 
 
 class ContentNotFound(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class ImportJobNotFound(Exception):
+    def __init__(self, job_id: str):
+        super().__init__(f"Import job {job_id} not found")
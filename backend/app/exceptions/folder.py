@@ -13,4 +13,8 @@ class FolderEmbeddingError(Exception):
     pass
 
 class FolderItemNotFound(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class RebucketJobNotFound(Exception):
+    def __init__(self, job_id: str):
+        super().__init__(f"Re-bucketing job {job_id} not found")
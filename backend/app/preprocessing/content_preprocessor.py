@@ -1,37 +1,16 @@
-from bs4 import BeautifulSoup
-from readability import Document
 import re
 
+from app.preprocessing.extractor import extract
+
 
 class ContentPreprocessor:
     """
     Extracts metadata and readable body from raw HTML, cleans text, and builds a summary input string.
     """
 
-    def extract(self, html: str) -> dict:
-        soup = BeautifulSoup(html, "html.parser")
-
-        title = soup.title.string.strip() if soup.title else ""
-        description = ""
-        tags = []
-
-        for meta in soup.find_all("meta"):
-            if meta.get("name") == "description":
-                description = meta.get("content", "")
-            if meta.get("property") == "og:description":
-                description = meta.get("content", "") or description
-            if meta.get("name") == "keywords":
-                tags = [tag.strip() for tag in meta.get("content", "").split(",")]
-
-        doc = Document(html)
-        body = BeautifulSoup(doc.summary(), "html.parser").get_text()
-
-        return {
-            "title": title,
-            "description": description,
-            "tags": tags,
-            "body_text": body.strip(),
-        }
+    def extract(self, html: str, max_chars: int = 1000) -> dict:
+        # one size bounded lxml parse, body_text comes back cleaned and cut to max_chars
+        return extract(html, max_chars=max_chars)
 
     def clean(self, text: str, max_chars: int = 1000) -> str:
         lines = text.split("\n")
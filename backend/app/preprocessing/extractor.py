@@ -0,0 +1,160 @@
+import re
+from typing import Iterable
+
+from lxml import etree
+
+
+# bytes of html parsed at most, the summary only ever uses the first ~1000 characters
+MAX_INPUT_BYTES = 512 * 1024
+
+BOILERPLATE_TAGS = (
+    'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas',
+    'nav', 'header', 'footer', 'aside', 'form', 'button', 'select',
+)
+BLOCK_TAGS = (
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'pre', 'blockquote',
+    'td', 'dd', 'dt', 'figcaption',
+)
+# main content under this many characters is probably a teaser, use the whole body
+MIN_MAIN_CHARS = 200
+
+SKIP_LINE = re.compile(r"(©|\ball rights\b|cookie|advertisement)", re.I)
+WHITESPACE = re.compile(r'\s+')
+
+_parser = etree.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, no_network=True)
+
+
+def extract(html: str | bytes | Iterable[bytes], max_chars: int = 1000, max_bytes: int = MAX_INPUT_BYTES) -> dict:
+    '''
+    Same result as extract_metadata_and_body + clean_text, from one lxml (libxml2) parse:
+        - only the first max_bytes of the page are parsed, an iterable of chunks (a
+          streamed payload) is fed to the parser as it arrives and not read past that
+        - title / description / keywords are read from <head> alone
+        - boilerplate elements are dropped, the main content element is picked once
+          (<article>, <main>, role=main or the parent holding the most paragraph text)
+        - body text is collected block by block and stops at max_chars
+    '''
+    empty = {'title': '', 'description': '', 'tags': [], 'body_text': ''}
+    if isinstance(html, (str, bytes)):
+        if isinstance(html, str):
+            html = html[:max_bytes].encode('utf-8', 'ignore')
+        html = html[:max_bytes]
+        root = etree.fromstring(html, _parser) if html.strip() else None
+    else:
+        root = _parse_stream(html, max_bytes)
+    if root is None:
+        return empty
+
+    metadata = _head_metadata(root)
+
+    body = root.find('body')
+    if body is None:
+        body = root
+    etree.strip_elements(body, *BOILERPLATE_TAGS, with_tail=False)
+
+    main = _main_element(body)
+    text = _collect_text(main, max_chars)
+    if main is not body and len(text) < MIN_MAIN_CHARS:
+        text = _collect_text(body, max_chars)
+
+    metadata['body_text'] = text
+    return metadata
+
+
+###############################################################################
+# HELPER METHODS
+###############################################################################
+
+def _parse_stream(chunks: Iterable[bytes], max_bytes: int):
+    parser = etree.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True, no_network=True)
+    fed = 0
+    try:
+        for chunk in chunks:
+            chunk = chunk[:max_bytes - fed]
+            parser.feed(chunk)
+            fed += len(chunk)
+            if fed >= max_bytes:
+                break
+    finally:
+        # stops the download of whatever is left
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+    if not fed:
+        return None
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return None
+
+
+def _text(element) -> str:
+    return WHITESPACE.sub(' ', ''.join(element.itertext())).strip()
+
+
+def _head_metadata(root) -> dict:
+    head = root.find('head')
+    scope = head if head is not None else root
+
+    title = scope.find('.//title')
+    description, og_description, tags = '', '', []
+    for meta in scope.iter('meta'):
+        name = (meta.get('name') or '').lower()
+        if name == 'description':
+            description = meta.get('content', '')
+        elif name == 'keywords':
+            tags = [tag.strip() for tag in meta.get('content', '').split(',')]
+        elif (meta.get('property') or '').lower() == 'og:description':
+            og_description = meta.get('content', '')
+
+    return {
+        'title': _text(title) if title is not None else '',
+        'description': og_description or description,
+        'tags': tags,
+    }
+
+
+def _main_element(body):
+    for element in body.iter('article', 'main'):
+        return element
+    for element in body.iter():
+        if element.get('role') == 'main':
+            return element
+
+    # readability's core idea without a second parse: the container of the most paragraph text
+    scores = {}
+    for paragraph in body.iter('p'):
+        parent = paragraph.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + len(_text(paragraph))
+    if not scores:
+        return body
+    return max(scores, key=scores.get)
+
+
+def _collect_text(root, max_chars: int) -> str:
+    parts, size = [], 0
+    collected = set()
+
+    def add(text: str) -> bool:
+        nonlocal size
+        if text and not SKIP_LINE.search(text):
+            parts.append(text)
+            size += len(text) + 1
+        return size >= max_chars
+
+    for element in root.iter(*BLOCK_TAGS):
+        # a <p> inside an <li> that was already taken whole
+        if any(ancestor in collected for ancestor in element.iterancestors(*BLOCK_TAGS)):
+            continue
+        collected.add(element)
+        if add(_text(element)):
+            break
+
+    if not parts:
+        # no block elements (div soup): plain text runs
+        for chunk in root.itertext():
+            if add(WHITESPACE.sub(' ', chunk).strip()):
+                break
+
+    return ' '.join(parts)[:max_chars]
@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+from app.core.settings import get_settings
+from app.queues.base import QueueBackend
+
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+@lru_cache()
+def get_queue_backend(lane: str = INTERACTIVE) -> QueueBackend:
+    '''
+    Producer for the queue selected by QUEUE_BACKEND ('activemq' or 'postgres').
+    Bulk work (imports) goes to its own queue when one is configured, so the worker
+    can schedule it behind interactive saves
+    '''
+    settings = get_settings()
+
+    if settings.QUEUE_BACKEND == 'postgres':
+        from app.queues.postgres import PostgresQueue
+        queue_name = settings.QUEUE_BULK_NAME if lane == BULK and settings.QUEUE_BULK_NAME else settings.QUEUE_NAME
+        return PostgresQueue(queue_name)
+
+    if settings.QUEUE_BACKEND == 'activemq':
+        from app.queues.activemq import ActiveMQQueue
+        queue_name = settings.ACTIVEMQ_BULK_QUEUE if lane == BULK and settings.ACTIVEMQ_BULK_QUEUE else settings.ACTIVEMQ_QUEUE
+        return ActiveMQQueue(
+            base_url=settings.ACTIVEMQ_URL,
+            queue_name=queue_name,
+            user=settings.ACTIVEMQ_USER,
+            password=settings.ACTIVEMQ_PASS,
+        )
+
+    raise ValueError(f"Unknown QUEUE_BACKEND: {settings.QUEUE_BACKEND}")
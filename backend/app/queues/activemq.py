@@ -0,0 +1,38 @@
+import logging
+from urllib.parse import quote
+from typing import Optional
+
+import requests
+from sqlalchemy.orm import Session
+
+from app.queues.base import QueueBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveMQQueue(QueueBackend):
+    '''
+    Publishes over the ActiveMQ REST api. Keeps one session so the connection
+    (and its auth) is reused across requests
+    '''
+
+    def __init__(self, base_url: str, queue_name: str, user: str, password: str):
+        self.url = f"{base_url.rstrip('/')}/api/message/{quote(queue_name, safe='')}"
+        self.session = requests.Session()
+        self.session.auth = (user, password)
+
+    def enqueue(self, body: str, db: Optional[Session] = None) -> bool:
+        try:
+            response = self.session.post(
+                self.url,
+                params={'type': 'queue'},
+                data=body.encode('utf-8'),
+                headers={'Content-Type': 'text/plain'},
+                timeout=10,
+            )
+            logger.debug(f"Response from ActiveMQ: {response.status_code} - {response.text}")
+            return response.status_code == 200
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error pushing to ActiveMQ: {e}")
+            return False
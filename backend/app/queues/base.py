@@ -0,0 +1,18 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+
+class QueueBackend(ABC):
+    '''
+    Producer side of the worker's message queue. Drivers backed by the database
+    join the caller's transaction, so the job only becomes visible on commit
+    '''
+
+    @abstractmethod
+    def enqueue(self, body: str, db: Optional[Session] = None) -> bool:
+        pass
+
+    def enqueue_many(self, bodies: list[str], db: Optional[Session] = None) -> bool:
+        return all(self.enqueue(body, db=db) for body in bodies)
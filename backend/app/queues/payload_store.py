@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+
+import zstandard
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Copied from csphere-worker/classes, which also reads payloads back (stream, fetch,
+# _open, stream_blob). What both have must stay identical, the key layout and ref format
+# are the contract between them: csphere-worker/tests/payload_store_test.py fails when the
+# copies drift
+
+
+# claim check: message fields over the threshold are stored here and replaced by a
+# reference ({'key', 'sha256', 'size', 'encoding'}) under '<field>_ref'
+OFFLOADED_FIELDS = ('raw_html',)
+
+
+class PayloadStore(ABC):
+    '''
+    Content addressed, zstd compressed blobs for large message payloads
+    (payloads/sha256/<hash>.zst). The api writes them, the worker streams them back into
+    its html parser (csphere-worker classes/payload_store.py). The zstd frames carry a
+    checksum, a corrupt blob fails while the worker reads it
+    '''
+
+    def __init__(self, level: int = 3, prefix: str = 'payloads/sha256'):
+        self.level = level
+        self.prefix = prefix.rstrip('/')
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def key_for(self, sha256: str) -> str:
+        return f"{self.prefix}/{sha256}.zst"
+
+    def put(self, data: bytes) -> dict:
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = self.key_for(sha256)
+        if not self.exists(key):
+            compressor = zstandard.ZstdCompressor(level=self.level, write_checksum=True)
+            self._write(key, compressor.compress(data))
+        return {'key': key, 'sha256': sha256, 'size': len(data), 'encoding': 'zstd'}
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    @abstractmethod
+    def _write(self, key: str, data: bytes):
+        pass
+
+
+class LocalPayloadStore(PayloadStore):
+    '''Directory stand-in for S3, for local runs and tests'''
+
+    def __init__(self, root: str, level: int = 3, prefix: str = 'payloads/sha256'):
+        super().__init__(level=level, prefix=prefix)
+        self.root = os.path.abspath(root)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.partial"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+
+class S3PayloadStore(PayloadStore):
+    '''S3 backend, the bucket the worker reads from'''
+
+    def __init__(self, s3_client, bucket_name: str, level: int = 3, prefix: str = 'payloads/sha256'):
+        super().__init__(level=level, prefix=prefix)
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except self.s3.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def _write(self, key: str, data: bytes):
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=data, ContentType='application/zstd')
+
+
+
+def offload_payload(message: dict, store: Optional[PayloadStore], threshold: int) -> dict:
+    '''
+    Copy of message with every OFFLOADED_FIELDS value over threshold bytes (utf-8)
+    moved to store and replaced by its reference. Without a store message is returned as is
+    '''
+    if store is None:
+        return message
+    message = dict(message)
+    for field in OFFLOADED_FIELDS:
+        value = message.get(field)
+        if not value:
+            continue
+        data = value.encode('utf-8') if isinstance(value, str) else value
+        if len(data) > threshold:
+            message[f"{field}_ref"] = store.put(data)
+            message[field] = None
+    return message
+
+
+@lru_cache()
+def get_payload_store() -> Optional[PayloadStore]:
+    '''Store selected by PAYLOAD_STORE ('s3', 'local' or 'none' to keep payloads inline)'''
+    settings = get_settings()
+    if settings.PAYLOAD_STORE == 'local':
+        return LocalPayloadStore(settings.PAYLOAD_LOCAL_DIR, level=settings.PAYLOAD_ZSTD_LEVEL)
+    if settings.PAYLOAD_STORE == 's3':
+        from app.functions.AWS_s3 import s3
+        return S3PayloadStore(s3, settings.BUCKET_NAME, level=settings.PAYLOAD_ZSTD_LEVEL)
+    return None
@@ -0,0 +1,49 @@
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.queues.base import QueueBackend
+
+logger = logging.getLogger(__name__)
+
+
+# must match the channel the worker LISTENs on
+NOTIFY_CHANNEL = 'csphere_job_queue'
+
+
+class PostgresQueue(QueueBackend):
+    '''
+    Inserts jobs into the `job_queue` table consumed by the worker with SKIP LOCKED.
+
+    With db the insert and the NOTIFY join the request's transaction: the job exists
+    only if the save commits, and the worker is only woken up once it does
+    '''
+
+    INSERT_SQL = text("INSERT INTO job_queue (queue_name, payload) VALUES (:queue_name, :payload)")
+    NOTIFY_SQL = text("SELECT pg_notify(:channel, :queue_name)")
+
+    def __init__(self, queue_name: str):
+        self.queue_name = queue_name
+
+    def enqueue(self, body: str, db: Optional[Session] = None) -> bool:
+        return self.enqueue_many([body], db=db)
+
+    def enqueue_many(self, bodies: list[str], db: Optional[Session] = None) -> bool:
+        if not bodies:
+            return True
+
+        if db is not None:
+            self._insert(db, bodies)
+            return True
+
+        with SessionLocal() as session:
+            self._insert(session, bodies)
+            session.commit()
+        return True
+
+    def _insert(self, db: Session, bodies: list[str]):
+        db.execute(self.INSERT_SQL, [{'queue_name': self.queue_name, 'payload': body} for body in bodies])
+        db.execute(self.NOTIFY_SQL, {'channel': NOTIFY_CHANNEL, 'queue_name': self.queue_name})
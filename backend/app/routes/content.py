@@ -3,7 +3,7 @@ import logging
 from uuid import UUID
 
 # 2. Third-Party Imports (FastAPI, SQLAlchemy)
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 
@@ -35,6 +35,7 @@ from app.schemas.content import (
 from app.utils.hashing import get_current_user_id
 from app.utils.user import get_current_user
 from app.utils.url import ensure_safe_url
+from app.utils.compressed_request import GzipRoute
 
 # 6. Service Layer (Business Logic)
 from app.services.content_services import (
@@ -47,10 +48,10 @@ from app.services.content_services import (
     untabContent,
     delete_content, 
     get_recent_saved_content, 
-    import_browser_bookmarks_service,
     _enqueue_new_content,
     get_discover_content_service
 )
+from app.services.import_services import start_bookmark_import, run_bookmark_import, get_import_job
 
 # 7. Exceptions
 from app.exceptions.content_exceptions import (
@@ -58,7 +59,8 @@ from app.exceptions.content_exceptions import (
     NoMatchedContent, 
     NotesNotFound, 
     ContentItemNotFound, 
-    ContentNotFound
+    ContentNotFound,
+    ImportJobNotFound,
 )
 
 logger = logging.getLogger(__name__)
@@ -67,6 +69,8 @@ logger = logging.getLogger(__name__)
 router = APIRouter(
     prefix="/content",
     tags=["content"],
+    # the extension sends the captured page gzip compressed
+    route_class=GzipRoute,
 )
 
 
@@ -151,6 +155,10 @@ def save_content(content: ContentCreate, user: User = Depends(get_current_user),
     try:
         safe_url = ensure_safe_url(content.url)
 
+        # the worker only parses the start of a page, anything past the caps is dropped here
+        raw_html = content.raw_html[:settings.SAVE_MAX_HTML_CHARS] if content.raw_html else None
+        page_text = content.page_text[:settings.SAVE_MAX_TEXT_CHARS] if content.page_text else None
+
         _enqueue_new_content(
             url=safe_url,
             title=content.title,
@@ -159,7 +167,11 @@ def save_content(content: ContentCreate, user: User = Depends(get_current_user),
             notes=content.notes,
             tags=content.tags,
             folder_id=content.folder_id,
+            raw_html=raw_html,
+            page_text=page_text,
+            db=db,
         )
+        db.commit()
 
         return {"status": "Success", "message": "Bookmark details sent to message queue"}
 
@@ -370,20 +382,33 @@ def get_recent_content(user_id: UUID = Depends(get_current_user_id), db: Session
 
 
 
-@router.post("/import", status_code=200)
-def import_browser_bookmarks(bookmark_data : BookmarkImportRequest, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
-
+@router.post("/import", status_code=202)
+def import_browser_bookmarks(bookmark_data : BookmarkImportRequest, background_tasks: BackgroundTasks, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    '''
+    Starts the import and returns right away, progress is read from GET /content/import/{job_id}
+    '''
     try:
-        return import_browser_bookmarks_service(bookmark_data=bookmark_data, user_id=user_id, db=db)
-
+        job, bookmarks = start_bookmark_import(bookmark_data=bookmark_data, user_id=user_id, db=db)
 
     except Exception as e:
         logging.error(f"Error occured when trying to sync all bookmarks: {e}")
-        return HTTPException(
+        raise HTTPException(
             status_code=500,
             detail="Failed to save the browser data, try again"
         )
 
+    background_tasks.add_task(run_bookmark_import, job.job_id, bookmarks, user_id)
+    return {'status': 'accepted', 'job_id': str(job.job_id), 'total': job.total}
+
+
+@router.get("/import/{job_id}")
+def get_import_progress(job_id: UUID, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    try:
+        return get_import_job(job_id=job_id, user_id=user_id, db=db)
+
+    except ImportJobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 
 
 
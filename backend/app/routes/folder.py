@@ -1,6 +1,7 @@
 from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.dependencies import get_current_user_id
 from app.data_models.folder import Folder
@@ -10,11 +11,12 @@ from app.data_models.content import Content
 from app.data_models.content_item import ContentItem
 from app.data_models.content_ai import ContentAI
 
-from app.services.folder import update_folder_metadata, create_user_folder, addItemToFolder, remove_contents_from_folder
+from app.services.folder import update_folder_metadata, create_user_folder, addItemToFolder, remove_contents_from_folder, move_contents_between_folders
+from app.services.rebucket_services import bucketing_rules, start_rebucket, get_rebucket_job, get_rebucket_suggestions, rebucket_events
 
 from app.db.database import get_db
-from app.schemas.folder import  FolderDetails, FolderItem, FolderMetadata, RemoveContentPayload
-from app.exceptions.folder import FolderNotFound, FolderItemNotFound
+from app.schemas.folder import  FolderDetails, FolderItem, FolderMetadata, RemoveContentPayload, MoveContentPayload, RebucketRequest
+from app.exceptions.folder import FolderNotFound, FolderItemNotFound, RebucketJobNotFound
 from app.utils.hashing import get_current_user_id
 from datetime import datetime
 from uuid import uuid4
@@ -109,16 +111,29 @@ def process_folder_metadata(
 ):
     try:
         logger.info(f"Folder metdata being processed: {metadata}")
+        current = db.query(Folder).filter(Folder.folder_id == folder_id, Folder.user_id == user_id).first()
+        rules_before = bucketing_rules(current) if current else None
+
         folder = update_folder_metadata(
             db=db,
             folder_id=folder_id,
             user_id=user_id,
             metadata=metadata,
         )
-        return {"success": True, "folder_id": folder.folder_id}
 
     except FolderNotFound:
         raise HTTPException(status_code=404, detail="Folder not found")
+
+    # bucketing was turned on or its rules changed: the existing library gets
+    # re-evaluated too, not only future saves
+    rebucket_job_id = None
+    if folder.bucketing_mode and bucketing_rules(folder) != rules_before:
+        try:
+            rebucket_job_id = start_rebucket(user_id=user_id, db=db).job_id
+        except Exception as e:
+            logger.error(f"Failed to start re-bucketing for folder {folder_id}: {e}")
+
+    return {"success": True, "folder_id": folder.folder_id, "rebucket_job_id": rebucket_job_id}
     
 
 
@@ -342,3 +357,98 @@ def delete_content_from_folder(
     
 
 
+@router.post("/folder/{folder_id}/content/move")
+def move_content_between_folders(
+    folder_id: UUID,
+    payload: MoveContentPayload,
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    if not payload.content_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="content_ids list cannot be empty",
+        )
+    if payload.target_folder_id == folder_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Target folder must be a different folder",
+        )
+
+    try:
+        return move_contents_between_folders(
+            db=db,
+            folder_id=folder_id,
+            target_folder_id=payload.target_folder_id,
+            user_id=user_id,
+            content_ids=payload.content_ids,
+        )
+
+    except FolderNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Folder not found",
+        )
+
+    except FolderItemNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No matching content found in folder",
+        )
+
+
+@router.post("/folder/rebucket", status_code=202)
+def rebucket_library(
+    payload: RebucketRequest,
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_db),
+):
+    '''
+    Re-evaluates every bookmark that isn't in a folder yet against the user's smart
+    folders, progress is read from GET /folder/rebucket/{job_id}(/events)
+    '''
+    try:
+        job = start_rebucket(user_id=user_id, db=db, apply=payload.apply)
+
+    except Exception as e:
+        logger.error(f"Failed to start re-bucketing: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start re-bucketing, try again",
+        )
+
+    return {"job_id": str(job.job_id), "status": job.status}
+
+
+@router.get("/folder/rebucket/{job_id}")
+def get_rebucket_progress(job_id: UUID, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    try:
+        return get_rebucket_job(job_id=job_id, user_id=user_id, db=db)
+
+    except RebucketJobNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/folder/rebucket/{job_id}/events")
+def stream_rebucket_progress(job_id: UUID, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    '''Server-sent events with the job's progress until it completes or fails'''
+    try:
+        get_rebucket_job(job_id=job_id, user_id=user_id, db=db)
+
+    except RebucketJobNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    return StreamingResponse(
+        rebucket_events(job_id, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/folder/rebucket/{job_id}/suggestions")
+def get_rebucket_proposals(job_id: UUID, user_id: UUID = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    try:
+        return {"job_id": str(job_id), "suggestions": get_rebucket_suggestions(job_id=job_id, user_id=user_id, db=db)}
+
+    except RebucketJobNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -22,6 +22,10 @@ class ContentCreate(BaseModel):
     tags: Optional[list[ContentCreateTags]] = None
     notes: Optional[str] = None
     folder_id: Optional[UUID] = None
+    # captured by the extension so the worker doesn't have to render the page,
+    # either the page's html or its readable text
+    raw_html: Optional[str] = None
+    page_text: Optional[str] = None
 
 
 class TabRemover(BaseModel):
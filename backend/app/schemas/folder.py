@@ -35,4 +35,14 @@ class FolderMetadata(BaseModel):
 
 
 class RemoveContentPayload(BaseModel):
-    content_ids: list[str]
\ No newline at end of file
+    content_ids: list[str]
+
+
+class MoveContentPayload(BaseModel):
+    content_ids: list[str]
+    target_folder_id: UUID
+
+
+class RebucketRequest(BaseModel):
+    # False only proposes folders, read back from /folder/rebucket/{job_id}/suggestions
+    apply: bool = True
@@ -0,0 +1,38 @@
+'''
+Fills folder_seed for the folders created before profiles were kept as seed + sum
+(migration a9d3f6b2c8e4 leaves it NULL). Each folder's metadata is embedded and
+set_folder_seed rebuilds folder_embedding from it and the members' sum.
+
+    python -m app.scripts.backfill_folder_seeds
+'''
+import logging
+
+from app.data_models.folder import Folder
+from app.db.database import SessionLocal
+from app.embeddings.folder_profile import set_folder_seed
+from app.services.folder import create_folder_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_folder_seeds(batch_size: int = 100) -> int:
+    filled = 0
+    with SessionLocal() as db:
+        folders = db.query(Folder).filter(Folder.folder_seed.is_(None)).all()
+        for position, folder in enumerate(folders, start=1):
+            embedding = create_folder_embedding(db=db, folder=folder)
+            if embedding is None:
+                logger.warning(f"Skipping folder {folder.folder_id}, its metadata couldn't be embedded")
+                continue
+            set_folder_seed(db, folder.folder_id, embedding)
+            filled += 1
+            if position % batch_size == 0:
+                db.commit()
+        db.commit()
+    logger.info(f"Filled the seed of {filled} folders")
+    return filled
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backfill_folder_seeds()
@@ -4,7 +4,7 @@ from app.data_models.content_item import ContentItem
 from app.data_models.content_ai import ContentAI
 from app.data_models.folder_item import folder_item
 from app.data_models.folder import Folder
-from app.schemas.content import ContentWithSummary, UserSavedContent, TabRemover, NoteContentUpdate, CategoryOut, BookmarkImportRequest
+from app.schemas.content import ContentWithSummary, UserSavedContent, TabRemover, NoteContentUpdate, CategoryOut
 from app.preprocessing.query_preprocessor import QueryPreprocessor
 from app.deps.services import get_embedding_manager
 from app.data_models.user import User
@@ -13,6 +13,8 @@ import logging
 from sqlalchemy.orm import joinedload
 from dateutil.parser import isoparse
 from app.core.settings import get_settings
+from app.queues import get_queue_backend, INTERACTIVE
+from app.queues.payload_store import get_payload_store, offload_payload
 from app.schemas.content import ContentCreateTags
 from app.schemas.tag import TagOut
 
@@ -20,10 +22,8 @@ from sqlalchemy.orm import Session
 from uuid import UUID
 from sqlalchemy import desc 
 
-import requests 
 import json 
 
-from email.utils import quote
 
 
 from app.exceptions.content_exceptions import EmbeddingManagerNotFound, NoMatchedContent, ContentItemNotFound, NotesNotFound, ContentNotFound
@@ -103,24 +103,13 @@ def search_content(*, db : Session, query: str,user: User):
 
 
 
-def push_to_activemq(message: str):
-    ACTIVEMQ_URL=settings.ACTIVEMQ_URL
-    ACTIVEMQ_QUEUE= settings.ACTIVEMQ_QUEUE
-    ACTIVEMQ_USER= settings.ACTIVEMQ_USER
-    ACTIVEMQ_PASS= settings.ACTIVEMQ_PASS
-
-    try:
-        url = f"{ACTIVEMQ_URL}/api/message/{quote(ACTIVEMQ_QUEUE)}?type=queue"
-        headers = {'Content-Type': 'text/plain'}
-
-        response = requests.post(url, data=message, headers=headers, auth=(ACTIVEMQ_USER, ACTIVEMQ_PASS))
-
-        logging.debug(f"Response from ActiveMQ: {response.status_code} - {response.text}")
-        return response.status_code == 200
-    
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error pushing to ActiveMQ: {e}")
-        return False
+def push_to_queue(message: str, db: Session | None = None, lane: str = INTERACTIVE) -> bool:
+    '''
+    Publishes a message for the worker on the given lane ('interactive' or 'bulk').
+    With db the Postgres driver enqueues inside the caller's transaction, so the
+    caller has to commit
+    '''
+    return get_queue_backend(lane).enqueue(message, db=db)
 
 
 def _enqueue_new_content(
@@ -132,6 +121,9 @@ def _enqueue_new_content(
     notes: str | None,
     tags: list[ContentCreateTags ]| None,
     folder_id: str | UUID | None,
+    raw_html: str | None = None,
+    page_text: str | None = None,
+    db: Session | None = None,
 ) -> None:
     utc_time = datetime.now(timezone.utc)
 
@@ -148,17 +140,24 @@ def _enqueue_new_content(
             "source": source,
             "first_saved_at": utc_time.isoformat(),
         },
-        "raw_html": None,
+        # page captured by the client, the worker skips rendering when either is set
+        "raw_html": raw_html,
+        "page_text": page_text,
         "user_id": str(user_id),
         "notes": notes,
         "folder_id": str(folder_id) if folder_id else None,
-        "tag_ids" : tag_ids
+        "tag_ids" : tag_ids,
+        "priority": INTERACTIVE,
+        "enqueued_at": utc_time.isoformat(),
     }
+    # large html goes to the payload store, the message only carries its reference
+    settings = get_settings()
+    payload = offload_payload(payload, get_payload_store(), settings.PAYLOAD_OFFLOAD_BYTES)
     message = json.dumps(payload)
-    result = push_to_activemq(message=message)
+    result = push_to_queue(message=message, db=db)
     
     if not result:
-        raise HTTPException(status_code=503, detail="Failed to push to ActiveMQ")
+        raise HTTPException(status_code=503, detail="Failed to push to the message queue")
     
 
 
@@ -568,57 +567,6 @@ def webkit_to_iso(webkit_timestamp):
     return datetime.fromtimestamp(unix_time, tz=timezone.utc).isoformat()
     
 
-def import_browser_bookmarks_service(bookmark_data: BookmarkImportRequest, user_id: UUID, db: Session):
-    bookmarks_list = []
-
-    def collect_bookmarks(node, folder_path="Root"):
-
-        if node.children is not None:
-            new_path = f"{folder_path} > {node.title}"
-            for child in node.children:
-                collect_bookmarks(child, new_path)
-        
-        elif node.url:
-            if node.url.startswith('https'):
-                bookmarks_list.append({                    
-                    'url': node.url,
-                    'title': node.title,
-                    'source': 'browser import', 
-                    'first_saved_at': webkit_to_iso(node.dateAdded)
-                })
-
-
-    for root_node in bookmark_data.bookmarks:
-        collect_bookmarks(root_node)
-
-    print(f"Successfully collected {len(bookmarks_list)} bookmarks")
-
-    for bookmark in bookmarks_list:
-        payload = {
-            "content_payload":bookmark,
-            "raw_html": '',
-            "user_id" : str(user_id),
-            "notes" : '',
-            'folder_id': '', 
-            'tags_ids' : []
-
-        }
-
-
-        message = json.dumps(payload)
-        result = push_to_activemq(message=message)
-        if result:
-            continue 
-        else:
-            logging.error('Failed to push to active mq')
-            
-
-
-    
-    # Now you can proceed to save bookmarks_list to your DB
-    return {'status' : 'success', 'message' : 'All bookmarks have been pushed'}
-
-
 def get_discover_content_service(user_id: str, db: Session):
     user = db.query(User).filter(User.id == user_id).first()
 
@@ -1,4 +1,5 @@
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import delete, insert, select
 from sqlalchemy.orm import Session
 
 
@@ -9,14 +10,14 @@ from app.data_models.content_ai import ContentAI
 from app.schemas.folder import  FolderDetails, FolderItem, FolderMetadata
 from uuid import UUID
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timezone
 from app.embeddings.embedding_manager import ContentEmbeddingManager
 from typing import Optional
 from app.data_models.folder_item import folder_item
+from app.embeddings.folder_profile import add_to_folder_profile, remove_from_folder_profile, set_folder_seed
 
 from app.exceptions.folder import FolderNotFound, DuplicateFolder, FolderEmbeddingError, FolderItemNotFound
 
-import numpy as np
 import logging
 
 logger = logging.getLogger(__name__) 
@@ -41,9 +42,6 @@ def update_folder_metadata(
     if not folder:
         raise FolderNotFound()
     
-    #save the previous folder embedding
-    prev_embedding = folder.folder_embedding
-
     folder.folder_name = metadata.name
     folder.bucketing_mode = metadata.smartBucketingEnabled
 
@@ -59,29 +57,15 @@ def update_folder_metadata(
         # folder.keywords = []
         # folder.url_patterns = []
 
+    # the worker recompiles this user's folder matcher when it sees a newer updated_at
+    folder.updated_at = datetime.now(timezone.utc)
+
     db.commit()
     db.refresh(folder)
 
+    # the new metadata replaces the seed of the profile, what the folder learned stays
     new_folder_embedding = create_folder_embedding(db=db, folder=folder)
-
-    if new_folder_embedding is not None and prev_embedding is not None:
-        
-        alpha = 0.7
-        old_vec = np.array(prev_embedding)
-        meta_vec = np.array(new_folder_embedding)
-        
-        blended_vec = (alpha * meta_vec) + ((1 - alpha) * old_vec)
-        
-        # Re-normalize
-        norm = np.linalg.norm(blended_vec)
-        if norm > 0:
-            blended_vec = blended_vec / norm
-        
-        folder.folder_embedding = blended_vec.tolist()
-        
-        
-    else:
-        folder.folder_embedding = new_folder_embedding
+    set_folder_seed(db, folder.folder_id, new_folder_embedding)
     db.commit()
     return folder
 
@@ -146,7 +130,7 @@ def create_user_folder(
         # Best-effort embedding
         embedding = create_folder_embedding(db, new_folder)
         if embedding:
-            new_folder.folder_embedding = embedding
+            set_folder_seed(db, new_folder.folder_id, embedding)
             db.commit()
 
         return {
@@ -206,37 +190,16 @@ def addItemToFolder(*, db: Session,user_id: UUID,  folder_id: str, itemDetails:
 def update_folder_learning(db: Session, folder_id: str, content_id: str):
     """
     Updates the folder's vector profile based on newly added content.
+    Sum + count of the members, one atomic UPDATE (app/embeddings/folder_profile.py)
     """
     try:
-        folder: Folder = db.query(Folder).filter(Folder.folder_id == folder_id).first()
-        content_embedding = get_content_embedding(db=db, content_id=content_id)
-
-        # Use 'is None' to avoid NumPy ambiguity errors
-        if folder is None or folder.folder_embedding is None or content_embedding is None:
-            logging.error(f"Learning skipped: Missing data for folder {folder_id} or content {content_id}")
-            return False
-
-        # Convert to numpy arrays
-        current_vec = np.array(folder.folder_embedding)
-        new_content_vec = np.array(content_embedding)
-
-        # Ensure they are the same shape (e.g., both 1536 dimensions)
-        if current_vec.shape != new_content_vec.shape:
-            logging.error(f"Shape mismatch: Folder({current_vec.shape}) vs Content({new_content_vec.shape})")
+        if not add_to_folder_profile(db, folder_id, [content_id]):
+            db.rollback()
+            # counted by add_to_filed_profiles once the content is embedded
+            logging.info(f"Learning deferred: content {content_id} has no embedding yet or is already in folder {folder_id}")
             return False
 
-        alpha = 0.1 
-        updated_vec = ((1 - alpha) * current_vec) + (alpha * new_content_vec)
-
-        # Normalization is key for Cosine Similarity
-        norm = np.linalg.norm(updated_vec)
-        if norm > 0:
-            updated_vec = updated_vec / norm
-
-        # Save back to DB
-        folder.folder_embedding = updated_vec.tolist()
         db.commit()
-        
         logging.info(f"Folder {folder_id} successfully shifted toward content {content_id}")
         return True
 
@@ -311,36 +274,15 @@ def get_folder_or_404(db: Session, folder_id: UUID) -> Folder:
     
 def _penalize_folder_learning(db: Session, folder_id: str, content_id: str):
     """
-    Moves the folder embedding AWAY from the content embedding.
+    Takes the content's embedding back out of the folder profile, the exact inverse
+    of update_folder_learning.
     Used when a user manually removes an item they feel was misclassified.
     """
     try:
-        folder = db.query(Folder).filter(Folder.folder_id == folder_id).first()
-        content_embedding = get_content_embedding(db, content_id)
-
-        if folder is None or folder.folder_embedding is None or content_embedding is None:
+        if not remove_from_folder_profile(db, folder_id, [content_id]):
+            db.rollback()
             return False
 
-        current_vec = np.array(folder.folder_embedding)
-        removed_vec = np.array(content_embedding)
-
-        # PENALIZATION RATE (Beta)
-        # We use a smaller rate so one removal doesn't ruin the whole folder
-        beta = 0.15
-
-        # Vector Subtraction: Move current_vec away from removed_vec
-        # New = Current - Beta * (Removed - Current)
-        updated_vec = current_vec - beta * (removed_vec - current_vec)
-
-        # Re-normalize to keep it a valid unit vector for cosine similarity
-        norm = np.linalg.norm(updated_vec)
-        if norm > 0:
-            updated_vec = updated_vec / norm
-
-        # Save the "corrected" identity
-        folder.folder_embedding = updated_vec.tolist()
-        
-        
         db.commit()
         logger.info(f"Folder {folder_id} penalized. Moved away from content {content_id}.")
         return True
@@ -362,31 +304,31 @@ def remove_contents_from_folder(
     try:
         get_folder_or_404(db, folder_id)
 
-        deleted_count = (
-            db.query(folder_item)
-            .filter(
+        #Penalize the learning vector: the counted embeddings are taken out of the
+        #folder profile with one UPDATE before their rows go, committed with the delete
+        #Later in the future make a vectore status to compare content with a vector of 
+        #contents that has been removed in the past
+        logging.info('Penalizing folder with the removed data')
+        remove_from_folder_profile(db, folder_id, content_ids)
+
+        removed_ids = db.execute(
+            delete(folder_item)
+            .where(
                 folder_item.folder_id == folder_id,
                 folder_item.user_id == user_id,
                 folder_item.content_id.in_(content_ids),
             )
-            .delete(synchronize_session=False)
-        )
+            .returning(folder_item.content_id)
+        ).scalars().all()
 
-        if deleted_count == 0:
+        if not removed_ids:
             raise FolderItemNotFound("No matching content found in folder")
 
         db.commit()
 
-        #Penalize the learning vector 
-        #Later in the future make a vectore status to compare content with a vector of 
-        #contents that has been removed in the past
-        logging.info('Penalizing folder with the removed data')
-        for content_id in content_ids:
-            _penalize_folder_learning(db=db, folder_id=folder_id, content_id=content_id)
-
         return {
             "status": "success",
-            "removed": deleted_count,
+            "removed": len(removed_ids),
         }
 
     except Exception as e:
@@ -398,3 +340,86 @@ def remove_contents_from_folder(
         raise
 
 
+def move_contents_between_folders(
+    db: Session,
+    folder_id: UUID,
+    target_folder_id: UUID,
+    user_id: UUID,
+    content_ids: list[str],
+):
+    """
+    Moves content from folder_id to target_folder_id in one transaction: one delete,
+    one insert and one profile update per folder, whatever the number of items
+    """
+    if not content_ids:
+        return {"status": "success", "moved": 0}
+
+    try:
+        folders = (
+            db.query(Folder.folder_id)
+            .filter(Folder.user_id == user_id, Folder.folder_id.in_([folder_id, target_folder_id]))
+            .all()
+        )
+        if len({row.folder_id for row in folders}) != len({folder_id, target_folder_id}):
+            raise FolderNotFound()
+
+        # out of the source profile while the rows still say what it counted
+        remove_from_folder_profile(db, folder_id, content_ids)
+
+        moved_ids = db.execute(
+            delete(folder_item)
+            .where(
+                folder_item.folder_id == folder_id,
+                folder_item.user_id == user_id,
+                folder_item.content_id.in_(content_ids),
+            )
+            .returning(folder_item.content_id)
+        ).scalars().all()
+
+        if not moved_ids:
+            raise FolderItemNotFound("No matching content found in folder")
+
+        # content already filed in the target is only taken out of the source
+        present = set(
+            db.execute(
+                select(folder_item.content_id).where(
+                    folder_item.folder_id == target_folder_id,
+                    folder_item.user_id == user_id,
+                    folder_item.content_id.in_(moved_ids),
+                )
+            ).scalars().all()
+        )
+        added_ids = list(dict.fromkeys(content_id for content_id in moved_ids if content_id not in present))
+
+        now = datetime.utcnow()
+        if added_ids:
+            db.execute(
+                insert(folder_item),
+                [
+                    {
+                        'folder_item_id': uuid4(),
+                        'folder_id': target_folder_id,
+                        'user_id': user_id,
+                        'content_id': content_id,
+                        'added_at': now,
+                    }
+                    for content_id in added_ids
+                ],
+            )
+
+        add_to_folder_profile(db, target_folder_id, added_ids)
+
+        db.commit()
+
+        return {
+            "status": "success",
+            "moved": len(moved_ids),
+        }
+
+    except Exception as e:
+        db.rollback()
+        logging.error(
+            f"Failed to move content from folder {folder_id} to {target_folder_id}: {e}",
+            exc_info=True,
+        )
+        raise
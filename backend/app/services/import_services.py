@@ -0,0 +1,281 @@
+import json
+import logging
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from uuid import UUID
+
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.data_models.background_job import BackgroundJob
+from app.data_models.content import Content
+from app.data_models.content_item import ContentItem
+from app.db.database import SessionLocal
+from app.exceptions.content_exceptions import ImportJobNotFound
+from app.queues import get_queue_backend, BULK
+from app.schemas.content import BookmarkImportRequest
+from app.services.content_services import webkit_to_iso
+
+logger = logging.getLogger(__name__)
+
+
+BOOKMARK_IMPORT = 'bookmark_import'
+# the worker tells batch messages apart from single saves with this type
+BOOKMARK_BATCH = 'bookmark_batch'
+
+# urls per IN (...) lookup, keeps the statement well under the bind parameter limit
+LOOKUP_CHUNK_SIZE = 5000
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref_src'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url: str) -> str | None:
+    '''
+    Normal form used to dedupe an import: lower case scheme and host, no default port,
+    no fragment and no tracking parameters. None for urls the worker can't save
+    (not http(s), credentials, no host, localhost). Only a key, what is saved and
+    enqueued is the url as the user had it
+    '''
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if scheme not in DEFAULT_PORTS or not host or host == 'localhost':
+        return None
+    if parts.username or parts.password:
+        return None
+
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ])
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def collect_bookmarks(bookmark_data: BookmarkImportRequest) -> list[dict]:
+    '''
+    Flattens the bookmark tree with an explicit stack (deep folder trees don't hit the
+    recursion limit), in the order the browser shows them
+    '''
+    now = datetime.now(timezone.utc).isoformat()
+    bookmarks = []
+    stack = list(reversed(bookmark_data.bookmarks))
+    while stack:
+        node = stack.pop()
+        if node.children is not None:
+            stack.extend(reversed(node.children))
+        elif node.url:
+            bookmarks.append({
+                'url': node.url,
+                'title': node.title,
+                'source': 'browser import',
+                'first_saved_at': webkit_to_iso(node.dateAdded) or now,
+            })
+    return bookmarks
+
+
+def start_bookmark_import(bookmark_data: BookmarkImportRequest, user_id: UUID, db: Session) -> tuple[BackgroundJob, list[dict]]:
+    '''
+    Creates the job row the client polls, the import itself runs in run_bookmark_import
+    '''
+    bookmarks = collect_bookmarks(bookmark_data)
+
+    job = BackgroundJob(user_id=user_id, kind=BOOKMARK_IMPORT, status='pending', total=len(bookmarks))
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    logger.info(f"Bookmark import {job.job_id} created with {len(bookmarks)} bookmarks")
+    return job, bookmarks
+
+
+def run_bookmark_import(job_id: UUID, bookmarks: list[dict], user_id: UUID):
+    '''
+    Background part of an import, in stages:
+        1. canonicalize and dedupe the urls
+        2. one lookup for the urls that already exist and the ones this user already saved
+        3. link the existing content to the user with one bulk insert
+        4. enqueue the new urls as chunked batch messages on the bulk lane
+    The job row is updated after each stage
+    '''
+    settings = get_settings()
+
+    with SessionLocal() as db:
+        job = db.get(BackgroundJob, job_id)
+        if job is None:
+            logger.error(f"Bookmark import {job_id} not found")
+            return
+
+        try:
+            job.status = 'running'
+            db.commit()
+
+            unique = _dedupe(bookmarks)
+            job.skipped = len(bookmarks) - len(unique)
+            db.commit()
+
+            existing = _find_existing(db, unique, user_id)
+
+            new_bookmarks = []
+            to_link = []
+            for url, bookmark in unique.items():
+                match = existing.get(url) or existing.get(bookmark['url'])
+                if match is None:
+                    new_bookmarks.append(bookmark)
+                elif match['saved']:
+                    job.skipped += 1
+                else:
+                    to_link.append((match['content_id'], bookmark))
+
+            linked = _link_existing(db, to_link, user_id)
+            job.skipped += len(to_link) - len(linked)
+            job.linked = len(linked)
+
+            # batches are inserted in the same transaction as the links when the
+            # queue lives in postgres, the import either lands whole or not at all
+            bodies = _batch_messages(job.job_id, user_id, new_bookmarks, linked, settings.IMPORT_CHUNK_SIZE)
+            if not get_queue_backend(BULK).enqueue_many(bodies, db=db):
+                raise RuntimeError('Failed to push the import batches to the message queue')
+
+            # processed counts up to this as the worker finishes batches
+            job.enqueued = len(new_bookmarks) + len(linked)
+            job.status = 'enqueued' if bodies else 'completed'
+            db.commit()
+
+            logger.info(
+                f"Bookmark import {job_id}: {job.total} found, {job.skipped} skipped, "
+                f"{job.linked} linked, {job.enqueued} enqueued in {len(bodies)} batches"
+            )
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bookmark import {job_id} failed: {e}", exc_info=True)
+            job.status = 'failed'
+            job.error = str(e)
+            db.commit()
+
+
+def get_import_job(job_id: UUID, user_id: UUID, db: Session) -> dict:
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.job_id == job_id,
+        BackgroundJob.user_id == user_id,
+    ).first()
+
+    if not job:
+        raise ImportJobNotFound(str(job_id))
+
+    return {
+        'job_id': str(job.job_id),
+        'status': job.status,
+        'total': job.total,
+        'skipped': job.skipped,
+        'linked': job.linked,
+        'enqueued': job.enqueued,
+        'processed': job.processed,
+        'error': job.error,
+        'created_at': job.created_at,
+        'updated_at': job.updated_at,
+    }
+
+
+###############################################################################
+# HELPER METHODS
+###############################################################################
+
+def _dedupe(bookmarks: list[dict]) -> dict[str, dict]:
+    '''canonical url -> bookmark, first one wins. Unsavable urls are dropped'''
+    unique = {}
+    for bookmark in bookmarks:
+        url = canonicalize_url(bookmark['url'])
+        if url is None or url in unique:
+            continue
+        unique[url] = bookmark
+    return unique
+
+
+def _find_existing(db: Session, unique: dict[str, dict], user_id: UUID) -> dict[str, dict]:
+    '''
+    url -> {'content_id', 'saved'} for the urls already in `content`, saved is True when
+    this user has it too. Content is stored under the url it was saved with, both that
+    and the canonical form are looked up
+    '''
+    urls = list({*unique.keys(), *(b['url'] for b in unique.values())})
+    existing = {}
+
+    for start in range(0, len(urls), LOOKUP_CHUNK_SIZE):
+        rows = (
+            db.query(Content.url, Content.content_id, ContentItem.user_id)
+            .outerjoin(ContentItem, and_(
+                ContentItem.content_id == Content.content_id,
+                ContentItem.user_id == user_id,
+            ))
+            .filter(Content.url.in_(urls[start:start + LOOKUP_CHUNK_SIZE]))
+            .all()
+        )
+        for url, content_id, item_user_id in rows:
+            existing[url] = {'content_id': content_id, 'saved': item_user_id is not None}
+
+    return existing
+
+
+def _link_existing(db: Session, to_link: list[tuple[UUID, dict]], user_id: UUID) -> list[dict]:
+    '''
+    Saves already stored content for the user in one insert. Returns the bookmarks that
+    were linked (with their content_id), rows that raced with another save are left out
+    '''
+    if not to_link:
+        return []
+
+    # two urls of the import can point at the same content
+    by_content = {}
+    for content_id, bookmark in to_link:
+        by_content.setdefault(content_id, bookmark)
+
+    stmt = (
+        insert(ContentItem)
+        .values([
+            {'user_id': user_id, 'content_id': content_id, 'saved_at': bookmark['first_saved_at'], 'notes': ''}
+            for content_id, bookmark in by_content.items()
+        ])
+        .on_conflict_do_nothing(index_elements=['user_id', 'content_id'])
+        .returning(ContentItem.content_id)
+    )
+    inserted = {row[0] for row in db.execute(stmt)}
+
+    return [
+        {'content_id': str(content_id), 'url': bookmark['url'], 'title': bookmark['title']}
+        for content_id, bookmark in by_content.items() if content_id in inserted
+    ]
+
+
+def _batch_messages(job_id: UUID, user_id: UUID, new_bookmarks: list[dict], linked: list[dict], chunk_size: int) -> list[str]:
+    '''
+    New bookmarks go to the worker to be fetched and enriched, linked ones only need
+    to be bucketed into the user's folders
+    '''
+    enqueued_at = datetime.now(timezone.utc).isoformat()
+    payloads = [
+        {key: bookmark[key] for key in ('url', 'title', 'source', 'first_saved_at')}
+        for bookmark in new_bookmarks
+    ]
+
+    bodies = []
+    for field, items in (('bookmarks', payloads), ('linked', linked)):
+        for start in range(0, len(items), chunk_size):
+            bodies.append(json.dumps({
+                'type': BOOKMARK_BATCH,
+                'job_id': str(job_id),
+                'user_id': str(user_id),
+                field: items[start:start + chunk_size],
+                'priority': BULK,
+                'enqueued_at': enqueued_at,
+            }))
+    return bodies
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.data_models.background_job import BackgroundJob
+from app.data_models.folder import Folder
+from app.data_models.folder_suggestion import FolderSuggestion
+from app.db.database import SessionLocal
+from app.exceptions.folder import RebucketJobNotFound
+from app.queues import get_queue_backend, BULK
+
+logger = logging.getLogger(__name__)
+
+
+# message type the worker tells re-bucketing jobs apart with, and the kind of the jobs
+# that file bookmarks. Proposing jobs only write folder_suggestion rows, they get their own
+# kind so the two never stand in for each other
+FOLDER_REBUCKET = 'folder_rebucket'
+FOLDER_REBUCKET_PROPOSAL = 'folder_rebucket_proposal'
+REBUCKET_KINDS = (FOLDER_REBUCKET, FOLDER_REBUCKET_PROPOSAL)
+
+ACTIVE = ('pending', 'running')
+# an active job that hasn't moved for this long (lost message, dead worker) no longer
+# blocks a new one, the worker updates a running job after every chunk
+ACTIVE_JOB_TIMEOUT = timedelta(minutes=30)
+
+FINISHED = ('completed', 'failed')
+# how often the event stream reads the job row, and sends a comment to keep it open
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 15.0
+
+
+def bucketing_rules(folder: Folder) -> tuple:
+    '''What the worker buckets with, compared before and after an edit'''
+    return (
+        bool(folder.bucketing_mode),
+        tuple(folder.keywords or ()),
+        tuple(folder.url_patterns or ()),
+        folder.description or '',
+    )
+
+
+def start_rebucket(user_id: UUID, db: Session, apply: bool = True) -> BackgroundJob:
+    '''
+    Hands the whole library to the worker as one message on the bulk lane (see
+    csphere-worker processors/rebucket.py). A user has one active job of a kind: while
+    one is pending or running it is returned instead of enqueuing another, concurrent
+    jobs would all read the same unfiled bookmarks. apply=False only proposes folders,
+    read them back with get_rebucket_suggestions
+    '''
+    kind = FOLDER_REBUCKET if apply else FOLDER_REBUCKET_PROPOSAL
+
+    # serializes starts per user and kind until the commit, two requests can't both miss the active job
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {'key': f"{kind}:{user_id}"})
+    active = db.query(BackgroundJob).filter(
+        BackgroundJob.user_id == user_id,
+        BackgroundJob.kind == kind,
+        BackgroundJob.status.in_(ACTIVE),
+        BackgroundJob.updated_at > datetime.now(timezone.utc) - ACTIVE_JOB_TIMEOUT,
+    ).order_by(BackgroundJob.created_at.desc()).first()
+    if active:
+        db.commit()
+        logger.info(f"Re-bucketing {active.job_id} is still {active.status} for user {user_id}, reusing it")
+        return active
+
+    job = BackgroundJob(user_id=user_id, kind=kind, status='pending')
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    body = json.dumps({
+        'type': FOLDER_REBUCKET,
+        'job_id': str(job.job_id),
+        'user_id': str(user_id),
+        'apply': apply,
+        'priority': BULK,
+        'enqueued_at': datetime.now(timezone.utc).isoformat(),
+    })
+    # the job stays pending until the worker picks it up and marks it running
+    if not get_queue_backend(BULK).enqueue_many([body], db=db):
+        job.status = 'failed'
+        job.error = 'Failed to push the re-bucketing job to the message queue'
+        db.commit()
+        raise RuntimeError(job.error)
+    db.commit()
+
+    logger.info(f"Re-bucketing {job.job_id} enqueued for user {user_id} (apply: {apply})")
+    return job
+
+
+def get_rebucket_job(job_id: UUID, user_id: UUID, db: Session) -> dict:
+    job = db.query(BackgroundJob).filter(
+        BackgroundJob.job_id == job_id,
+        BackgroundJob.user_id == user_id,
+        BackgroundJob.kind.in_(REBUCKET_KINDS),
+    ).first()
+
+    if not job:
+        raise RebucketJobNotFound(str(job_id))
+
+    return {
+        'job_id': str(job.job_id),
+        'status': job.status,
+        'apply': job.kind == FOLDER_REBUCKET,
+        'total': job.total,
+        'processed': job.processed,
+        'assigned': job.linked,
+        'error': job.error,
+        'created_at': job.created_at,
+        'updated_at': job.updated_at,
+    }
+
+
+async def rebucket_events(job_id: UUID, user_id: UUID) -> AsyncIterator[str]:
+    '''
+    Server-sent events for a job: one 'data:' event with the job every time it changes,
+    the stream ends once the job completed or failed. The worker commits progress once
+    per chunk, polling the row is all the api needs
+    '''
+    last, idle = None, 0.0
+    while True:
+        try:
+            job = await run_in_threadpool(_read_job, job_id, user_id)
+        except RebucketJobNotFound as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+
+        event = json.dumps(job, default=str)
+        if event != last:
+            last, idle = event, 0.0
+            yield f"data: {event}\n\n"
+        elif idle >= HEARTBEAT_INTERVAL:
+            idle = 0.0
+            yield ": heartbeat\n\n"
+
+        if job['status'] in FINISHED:
+            return
+        await asyncio.sleep(POLL_INTERVAL)
+        idle += POLL_INTERVAL
+
+
+def get_rebucket_suggestions(job_id: UUID, user_id: UUID, db: Session) -> list[dict]:
+    '''Folders a proposing job (apply=False) picked, best scores first'''
+    get_rebucket_job(job_id=job_id, user_id=user_id, db=db)
+
+    suggestions = db.query(FolderSuggestion).filter(
+        FolderSuggestion.job_id == job_id,
+        FolderSuggestion.user_id == user_id,
+    ).order_by(FolderSuggestion.score.desc()).all()
+
+    return [
+        {
+            'content_id': str(suggestion.content_id),
+            'folder_id': str(suggestion.folder_id),
+            'score': suggestion.score,
+        }
+        for suggestion in suggestions
+    ]
+
+
+###############################################################################
+# HELPER METHODS
+###############################################################################
+
+def _read_job(job_id: UUID, user_id: UUID) -> dict:
+    with SessionLocal() as db:
+        return get_rebucket_job(job_id=job_id, user_id=user_id, db=db)
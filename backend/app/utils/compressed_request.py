@@ -0,0 +1,96 @@
+import zlib
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+from app.core.settings import get_settings
+
+
+# a whole exported bookmark tree is legitimately larger than one saved page
+LARGE_BODY_PATHS = ('/content/import',)
+
+
+class GzipRequest(Request):
+    '''
+    Request whose body is read with a size cap, and decompressed while it streams in when
+    it was sent with Content-Encoding: gzip. Both the bytes on the wire and the
+    decompressed body are capped, a zip bomb stops at the cap instead of being inflated
+    in memory, and an uncompressed body can't get around it
+    '''
+
+    def __init__(self, scope, receive, max_compressed: Optional[int] = None, max_body: Optional[int] = None):
+        super().__init__(scope, receive)
+        settings = get_settings()
+        self.max_compressed = max_compressed or settings.SAVE_MAX_COMPRESSED_BYTES
+        self.max_body = max_body or settings.SAVE_MAX_BODY_BYTES
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            if "gzip" in self.headers.get("content-encoding", "").lower():
+                self._body = await self._read_gzip(self.max_compressed, self.max_body)
+            else:
+                self._body = await self._read_plain(self.max_body)
+        return self._body
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _check_content_length(self, limit: int):
+        # refused before anything is read when the client announces the size
+        try:
+            declared = int(self.headers.get("content-length", ""))
+        except ValueError:
+            return
+        if declared > limit:
+            raise HTTPException(status_code=413, detail="Request body too large")
+
+    async def _read_plain(self, max_body: int) -> bytes:
+        self._check_content_length(max_body)
+        chunks, size = [], 0
+        async for chunk in self.stream():
+            size += len(chunk)
+            if size > max_body:
+                raise HTTPException(status_code=413, detail="Request body too large")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _read_gzip(self, max_compressed: int, max_body: int) -> bytes:
+        self._check_content_length(max_compressed)
+        # wbits 16 + MAX_WBITS: gzip header and trailer
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        received, chunks, size = 0, [], 0
+        try:
+            async for chunk in self.stream():
+                received += len(chunk)
+                if received > max_compressed:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+                # never inflate past the cap, even for a single chunk
+                data = decompressor.decompress(chunk, max_body + 1 - size)
+                size += len(data)
+                if size > max_body or decompressor.unconsumed_tail:
+                    raise HTTPException(status_code=413, detail="Decompressed request body too large")
+                chunks.append(data)
+            chunks.append(decompressor.flush())
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip request body")
+        return b"".join(chunks)
+
+
+class GzipRoute(APIRoute):
+    '''
+    Route class for routers that accept gzip compressed request bodies (see GzipRequest).
+    Bodies are capped by the SAVE_MAX_* settings, the paths in LARGE_BODY_PATHS at
+    IMPORT_MAX_BODY_BYTES compressed or not
+    '''
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+        limit = get_settings().IMPORT_MAX_BODY_BYTES if self.path in LARGE_BODY_PATHS else None
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive, max_compressed=limit, max_body=limit)
+            return await original_route_handler(request)
+
+        return custom_route_handler
@@ -0,0 +1,67 @@
+import asyncio
+import gzip
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.compressed_request import GzipRequest
+
+
+def _read(body: bytes, gzipped: bool = False, content_length: bool = True, chunk_size: int = 64,
+          max_compressed: int = 1000, max_body: int = 1000) -> bytes:
+    '''GzipRequest.body() for body sent in chunk_size pieces'''
+    headers = []
+    if gzipped:
+        headers.append((b'content-encoding', b'gzip'))
+    if content_length:
+        headers.append((b'content-length', str(len(body)).encode()))
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)] or [b'']
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': position < len(chunks) - 1}
+        for position, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/content/save', 'headers': headers, 'query_string': b''}
+    request = GzipRequest(scope, receive, max_compressed=max_compressed, max_body=max_body)
+    return asyncio.run(request.body())
+
+
+def _status(**kwargs) -> tuple:
+    with pytest.raises(HTTPException) as raised:
+        _read(**kwargs)
+    return raised.value.status_code, raised.value.detail
+
+
+def test_bodies_under_the_caps():
+    assert _read(b'x' * 1000) == b'x' * 1000
+    assert _read(gzip.compress(b'y' * 1000), gzipped=True) == b'y' * 1000
+
+
+def test_plain_body_over_the_cap():
+    # announced: refused before reading, streamed without a length: stopped at the cap
+    assert _status(body=b'x' * 1001) == (413, 'Request body too large')
+    assert _status(body=b'x' * 1001, content_length=False) == (413, 'Request body too large')
+
+
+def test_gzip_over_the_compressed_cap():
+    # random bytes don't compress
+    body = gzip.compress(os.urandom(2000))
+    assert len(body) > 1000
+    assert _status(body=body, gzipped=True, max_body=100_000) == (413, 'Request body too large')
+    assert _status(body=body, gzipped=True, content_length=False, max_body=100_000) == (413, 'Request body too large')
+
+
+def test_gzip_inflating_over_the_cap():
+    # a few dozen bytes on the wire, ten times the cap once inflated
+    bomb = gzip.compress(b'\0' * 10_000)
+    assert len(bomb) < 1000
+    assert _status(body=bomb, gzipped=True) == (413, 'Decompressed request body too large')
+    assert _status(body=bomb, gzipped=True, chunk_size=len(bomb)) == (413, 'Decompressed request body too large')
+
+
+def test_invalid_gzip():
+    assert _status(body=b'not gzip at all', gzipped=True) == (400, 'Invalid gzip request body')
@@ -0,0 +1,44 @@
+import os
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def live_db():
+    '''
+    Session on DATABASE_URL, a database migrated to head (alembic upgrade head).
+    Skipped when none is configured
+    '''
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if not os.getenv('DATABASE_URL'):
+        pytest.skip('needs DATABASE_URL (a migrated postgres with pgvector)')
+
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def user_id(live_db):
+    '''A throwaway user, deleted with its jobs afterwards'''
+    from sqlalchemy import text
+
+    user_id = uuid.uuid4()
+    live_db.execute(
+        text("INSERT INTO users (id, email, username, password) VALUES (:id, :email, 'test', '')"),
+        {'id': user_id, 'email': f"{user_id}@test.local"},
+    )
+    live_db.commit()
+    yield user_id
+
+    live_db.rollback()
+    live_db.execute(text("DELETE FROM background_job WHERE user_id = :id"), {'id': user_id})
+    live_db.execute(text("DELETE FROM users WHERE id = :id"), {'id': user_id})
+    live_db.commit()
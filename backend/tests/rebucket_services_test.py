@@ -0,0 +1,67 @@
+import threading
+
+from sqlalchemy import text
+
+from app.services import rebucket_services
+from app.services.rebucket_services import start_rebucket
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.bodies = []
+        self._lock = threading.Lock()
+
+    def enqueue_many(self, bodies, db=None):
+        with self._lock:
+            self.bodies.extend(bodies)
+        return True
+
+
+def _start_concurrently(user_id, apply, starts: int = 4) -> list:
+    from app.db.database import SessionLocal
+
+    barrier = threading.Barrier(starts)
+    job_ids = []
+
+    def start():
+        with SessionLocal() as db:
+            barrier.wait()
+            job_ids.append(start_rebucket(user_id, db, apply=apply).job_id)
+
+    threads = [threading.Thread(target=start) for _ in range(starts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return job_ids
+
+
+def test_concurrent_starts_share_one_job(live_db, user_id, monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(rebucket_services, 'get_queue_backend', lambda lane: queue)
+
+    job_ids = _start_concurrently(user_id, apply=True)
+
+    # the advisory lock lets one request create the job, the others find it active
+    assert len(job_ids) == 4 and len(set(job_ids)) == 1
+    assert len(queue.bodies) == 1
+
+    # a proposing job is another kind, it doesn't stand in for the filing one
+    proposal = start_rebucket(user_id, live_db, apply=False)
+    assert proposal.job_id != job_ids[0]
+    assert len(queue.bodies) == 2
+
+
+def test_stale_job_no_longer_blocks(live_db, user_id, monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(rebucket_services, 'get_queue_backend', lambda lane: queue)
+
+    stale = start_rebucket(user_id, live_db).job_id
+    live_db.execute(
+        text("UPDATE background_job SET updated_at = now() - :age WHERE job_id = :job_id"),
+        {'age': rebucket_services.ACTIVE_JOB_TIMEOUT * 2, 'job_id': stale},
+    )
+    live_db.commit()
+
+    assert start_rebucket(user_id, live_db).job_id != stale
+    assert len(queue.bodies) == 2
@@ -0,0 +1,142 @@
+'''
+HTML extraction: the current BeautifulSoup + readability path against the single
+parse lxml extractor (classes/extractor.py), on a corpus of saved pages.
+
+The corpus is a directory of .html files. Build one from real pages once with --fetch
+(one url per line), then rerun against the same files:
+
+    python -m bench.extraction --corpus bench/corpus --fetch urls.txt
+    python -m bench.extraction --corpus bench/corpus --repeat 3
+
+Each implementation runs in its own process so peak memory is measured separately:
+python heap (tracemalloc) and resident set growth (libxml2 allocates outside python).
+'''
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlsplit
+
+import httpx
+
+
+def fetch_corpus(urls_path: str, corpus: str):
+    os.makedirs(corpus, exist_ok=True)
+    with open(urls_path) as f:
+        urls = [line.strip() for line in f if line.strip()]
+
+    headers = {'User-Agent': 'Mozilla/5.0 (csphere extraction bench)'}
+    with httpx.Client(follow_redirects=True, timeout=20, headers=headers) as client:
+        for i, url in enumerate(urls):
+            parts = urlsplit(url)
+            name = f"{i:04d}-{parts.netloc}{parts.path}".replace('/', '_')[:120] + '.html'
+            path = os.path.join(corpus, name)
+            if os.path.exists(path):
+                continue
+            try:
+                resp = client.get(url)
+                resp.raise_for_status()
+            except Exception as e:
+                print(f"skipped {url}: {e}")
+                continue
+            with open(path, 'w', encoding='utf-8') as out:
+                out.write(resp.text)
+
+
+def load_corpus(corpus: str) -> list[str]:
+    pages = []
+    for name in sorted(os.listdir(corpus)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(corpus, name), encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    return pages
+
+
+def _current(html: str) -> dict:
+    from classes.EmbeddingManager import extract_metadata_and_body, clean_text
+
+    metadata = extract_metadata_and_body(html)
+    metadata['body_text'] = clean_text(metadata['body_text'])
+    return metadata
+
+
+def _lxml(html: str) -> dict:
+    from classes.extractor import extract
+
+    return extract(html)
+
+
+IMPLEMENTATIONS = {'current (bs4 + readability)': _current, 'lxml single parse': _lxml}
+
+
+def _run(name: str, corpus: str, repeat: int, results):
+    pages = load_corpus(corpus)
+    extract_fn = IMPLEMENTATIONS[name]
+    extract_fn('<html><body><p>warm up</p></body></html>')
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    timings, failed, body_chars = [], 0, 0
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            try:
+                body_chars += len(extract_fn(html)['body_text'])
+            except Exception:
+                failed += 1
+            timings.append((time.perf_counter() - start) * 1000)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings.sort()
+    results.put({
+        'name': name,
+        'pages': len(pages),
+        'mean_ms': statistics.fmean(timings) if timings else 0.0,
+        'p50_ms': timings[len(timings) // 2] if timings else 0.0,
+        'p95_ms': timings[int(len(timings) * 0.95)] if timings else 0.0,
+        'heap_peak_mb': heap_peak / 2 ** 20,
+        # ru_maxrss is in KB on linux
+        'rss_growth_mb': (rss_after - rss_before) / 1024,
+        'failed': failed,
+        'avg_body_chars': body_chars / max(len(timings) - failed, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction benchmark")
+    parser.add_argument('--corpus', required=True, help='directory of saved .html pages')
+    parser.add_argument('--fetch', help='file with one url per line, saved into --corpus first')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_corpus(args.fetch, args.corpus)
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for name in IMPLEMENTATIONS:
+        results = context.Queue()
+        process = context.Process(target=_run, args=(name, args.corpus, args.repeat, results))
+        process.start()
+        rows.append(results.get())
+        process.join()
+
+    total_mb = sum(os.path.getsize(os.path.join(args.corpus, name)) for name in os.listdir(args.corpus)) / 2 ** 20
+    print(f"corpus: {rows[0]['pages']} pages, {total_mb:.1f} MB, repeat {args.repeat}")
+    for row in rows:
+        print(
+            f"{row['name']:<28} {row['mean_ms']:7.2f} ms/page (p50 {row['p50_ms']:.2f}, p95 {row['p95_ms']:.2f})  "
+            f"heap peak {row['heap_peak_mb']:6.1f} MB  rss +{row['rss_growth_mb']:.1f} MB  "
+            f"body {row['avg_body_chars']:.0f} chars  failed {row['failed']}"
+        )
+    if rows[1]['mean_ms']:
+        print(f"speedup: {rows[0]['mean_ms'] / rows[1]['mean_ms']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
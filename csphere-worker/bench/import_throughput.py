@@ -0,0 +1,93 @@
+'''
+Bookmark import throughput: the single message path against the batch processor.
+
+Runs the real processors against the configured database, OpenRouter / OpenAI and the
+render pool, so point DATABASE_URL at a dev database and pass a user that exists there.
+
+    python -m bench.import_throughput --user-id <uuid> --urls urls.txt --chunk 25 --limit 100
+
+Both paths save the same pages, each under its own ?csphere_bench=<run> query so
+neither finds the other's content (or an earlier run's) already saved.
+'''
+import argparse
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from core.metrics import metrics
+from core.services import get_services
+from schemas.content_schemas import MessageSchema, BookmarkBatchSchema
+from worker import handle_message, handle_batch_message
+
+
+def _bookmarks(urls: list[str], tag: str) -> list[dict]:
+    now = datetime.now(timezone.utc).isoformat()
+    return [{
+        'url': f"{url}{'&' if '?' in url else '?'}csphere_bench={tag}",
+        'title': '',
+        'source': 'browser import',
+        'first_saved_at': now,
+    } for url in urls]
+
+
+def run_single(user_id: str, bookmarks: list[dict]) -> float:
+    start = time.perf_counter()
+    for bookmark in bookmarks:
+        message = {
+            'content_payload': bookmark,
+            'raw_html': '',
+            'user_id': user_id,
+            'notes': '',
+            'folder_id': '',
+            'tag_ids': [],
+            'priority': 'bulk',
+        }
+        try:
+            handle_message(message, MessageSchema(**message))
+        except Exception as e:
+            print(f"single: {bookmark['url']} failed: {e}")
+    return time.perf_counter() - start
+
+
+def run_batch(user_id: str, bookmarks: list[dict], chunk: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(bookmarks), chunk):
+        batch = BookmarkBatchSchema(
+            type='bookmark_batch',
+            # no background_job row, the progress update matches nothing
+            job_id=str(uuid4()),
+            user_id=user_id,
+            bookmarks=bookmarks[i:i + chunk],
+            enqueued_at=datetime.now(timezone.utc),
+        )
+        handle_batch_message(batch)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bookmark import throughput")
+    parser.add_argument('--user-id', required=True)
+    parser.add_argument('--urls', required=True, help='file with one url per line')
+    parser.add_argument('--chunk', type=int, default=25)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.urls) as f:
+        urls = [line.strip() for line in f if line.strip()][:args.limit]
+
+    run = uuid4().hex[:8]
+    try:
+        single = run_single(args.user_id, _bookmarks(urls, f"{run}-single"))
+        batch = run_batch(args.user_id, _bookmarks(urls, f"{run}-batch"), args.chunk)
+    finally:
+        get_services().close()
+
+    print(f"bookmarks: {len(urls)}")
+    print(f"single message path:         {single:.1f}s ({len(urls) / single * 60:.1f} bookmarks/min)")
+    print(f"batch processor (chunk {args.chunk}):  {batch:.1f}s ({len(urls) / batch * 60:.1f} bookmarks/min)")
+    print(f"timings: {metrics.snapshot('stage.')['timings']}")
+    print(f"batch:   {metrics.snapshot('batch.')}")
+
+
+if __name__ == '__main__':
+    main()
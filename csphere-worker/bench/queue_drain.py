@@ -0,0 +1,75 @@
+'''
+Queue drain benchmark against the local fake broker.
+
+Compares the old oneShot polling loop (one GET then a fixed sleep) with
+ActiveMQQueue (long-poll + back-to-back batch drain).
+
+    python -m bench.queue_drain --messages 500 --latency 0.005 --legacy-sleep 0.05
+
+The legacy loop sleeps 5 s in production; a smaller --legacy-sleep keeps the run short,
+its throughput scales as 1 / (sleep + round trip).
+'''
+import argparse
+import json
+import time
+
+import requests
+
+from queues import ActiveMQQueue, FakeActiveMQBroker
+
+QUEUE = 'CSPHEREBENCH'
+
+
+def _fill(broker: FakeActiveMQBroker, count: int):
+    for i in range(count):
+        broker.put(QUEUE, json.dumps({'content_payload': {'url': f'https://example.com/{i}'}}))
+
+
+def drain_legacy(broker: FakeActiveMQBroker, count: int, sleep: float) -> float:
+    url = f"{broker.url}/api/message/{QUEUE}?type=queue&oneShot=true"
+    received = 0
+    start = time.perf_counter()
+    while received < count:
+        response = requests.get(url, auth=('admin', 'admin'))
+        if response.status_code == 200 and response.text.strip():
+            received += 1
+        time.sleep(sleep)
+    return time.perf_counter() - start
+
+
+def drain_consumer(broker: FakeActiveMQBroker, count: int, batch_size: int) -> float:
+    queue = ActiveMQQueue(broker.url, QUEUE, 'admin', 'admin', read_timeout_ms=1000, batch_size=batch_size)
+    received = 0
+    start = time.perf_counter()
+    for batch in queue.batches(batch_size):
+        received += len(batch)
+        if received >= count:
+            break
+    elapsed = time.perf_counter() - start
+    queue.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue drain benchmark")
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005, help='simulated broker round trip (s)')
+    parser.add_argument('--legacy-sleep', type=float, default=0.05)
+    parser.add_argument('--batch-size', type=int, default=25)
+    args = parser.parse_args()
+
+    with FakeActiveMQBroker(request_latency=args.latency) as broker:
+        _fill(broker, args.messages)
+        legacy = drain_legacy(broker, args.messages, args.legacy_sleep)
+
+        _fill(broker, args.messages)
+        consumer = drain_consumer(broker, args.messages, args.batch_size)
+
+    print(f"messages: {args.messages}")
+    print(f"legacy oneShot + sleep({args.legacy_sleep}s): {legacy:.2f}s ({args.messages / legacy:.1f} msg/s)")
+    print(f"long-poll batch consumer:              {consumer:.2f}s ({args.messages / consumer:.1f} msg/s)")
+    print(f"legacy at the production 5 s sleep:    {1 / (5 + args.latency):.2f} msg/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+'''
+Page render benchmark against a local http server.
+
+Compares the old capture path (a new Chromium launch per url) with RenderPool
+(warm browsers, one context per url, images/fonts/media blocked).
+
+    python -m bench.render_bench --pages 50 --concurrency 8 --browsers 2
+
+Every page references a few images that the server answers slowly (--asset-delay),
+which is what resource blocking saves on real pages.
+'''
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classes.render_pool import RenderPool, capture_page_once
+
+
+PAGE = '''<html><head><title>Page {n}</title></head><body>
+<h1>Bench page {n}</h1>
+<p>{text}</p>
+<img src="/asset/{n}-1.png"><img src="/asset/{n}-2.png"><img src="/asset/{n}-3.png">
+</body></html>'''
+
+
+def _serve(asset_delay: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/asset/'):
+                time.sleep(asset_delay)
+                body, content_type = b'\x89PNG\r\n\x1a\n', 'image/png'
+            else:
+                n = self.path.strip('/') or '0'
+                body, content_type = PAGE.format(n=n, text='lorem ipsum ' * 200).encode(), 'text/html'
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_legacy(urls: list[str]) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        asyncio.run(capture_page_once(url))
+    return time.perf_counter() - start
+
+
+def bench_pool(urls: list[str], browsers: int, concurrency: int) -> tuple[float, dict]:
+    with RenderPool(browsers=browsers, max_concurrency=concurrency) as pool:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(pool.render, urls))
+        elapsed = time.perf_counter() - start
+        stats = pool.stats()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page render benchmark")
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--legacy-pages', type=int, default=10, help='the legacy path is slow, render fewer pages with it')
+    parser.add_argument('--browsers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--asset-delay', type=float, default=0.2, help='seconds the server takes per image')
+    args = parser.parse_args()
+
+    server = _serve(args.asset_delay)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{i}" for i in range(args.pages)]
+
+    try:
+        legacy = bench_legacy(urls[:args.legacy_pages])
+        pooled, stats = bench_pool(urls, args.browsers, args.concurrency)
+    finally:
+        server.shutdown()
+
+    print(f"legacy launch per url:  {args.legacy_pages} pages in {legacy:.2f}s ({args.legacy_pages / legacy:.2f} pages/s)")
+    print(f"render pool:            {args.pages} pages in {pooled:.2f}s ({args.pages / pooled:.2f} pages/s)")
+    print(f"pool stats: {stats}")
+
+
+if __name__ == '__main__':
+    main()
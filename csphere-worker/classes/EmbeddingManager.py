@@ -1,6 +1,7 @@
 import os
 import re
 import json
+import hashlib
 
 from openai import OpenAI
 from uuid import UUID
@@ -23,6 +24,13 @@ from data_models.content_item import ContentItem
 #currently not using the summarizer model 
 from summarizer_model import SummarizerModel
 from classes import iab
+from classes.batching import MicroBatcher, split_batches
+from classes.embedding_cache import EmbeddingCache
+from classes.summary_cache import SummaryCache
+from classes.iab_centroids import CentroidCategorizer, category_labels
+from classes.folder_profile import add_to_filed_profiles
+from classes.category_registry import CategoryRegistry
+from classes.extractor import extract
 
 
 
@@ -34,6 +42,60 @@ logger = logging.getLogger(__name__)
 
 
 load_dotenv()
+
+
+# Everything that shapes a summary. summary_prompt_version() hashes it, so changing
+# any of it invalidates the summary cache on its own
+SUMMARY_MODEL = "openrouter/auto:floor"
+SUMMARY_CATEGORIES = [
+    "Science & Technology",
+    "Arts & Entertainment",
+    "News & Politics",
+    "History & Culture",
+    "Health & Wellness",
+    "Business & Finance",
+    "Education & Learning",
+    "Home & Lifestyle",
+    "Nature & Environment",
+    "Sports & Recreation",
+]
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a concise technical summarizer. "
+    "Summarize the article in exactly two short sentences. "
+    "Focus on the main point only. "
+    f"You will also return 1 to 3 categories you believe match the content based on this list here: {SUMMARY_CATEGORIES}"
+)
+SUMMARY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "response",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {
+                    "type": "string",
+                    "description": "Short summary of the content",
+                },
+                "categories": {
+                    "type": "array",
+                    "description": "List of matched categories",
+                    "items": {"type": "string"},
+                },
+            },
+            "required": ["summary", "categories"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def summary_prompt_version(salt: str = '') -> str:
+    '''Short hash of the model / prompt / schema, plus a manual salt (SUMMARY_CACHE_VERSION)'''
+    spec = json.dumps([SUMMARY_MODEL, SUMMARY_SYSTEM_PROMPT, SUMMARY_RESPONSE_FORMAT, salt], sort_keys=True)
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]
+
+
 class ContentEmbeddingManager:
     '''
     Manages:
@@ -44,22 +106,52 @@ class ContentEmbeddingManager:
         - Handling database interactions for both `Content` and `ContentAI` models
     '''
 
-    def __init__(self, db, embedding_model_name='text-embedding-3-small', summary_model_name='gpt-3.5-turbo', content_url : str = ''):
+    def __init__(self, db, embedding_model_name='text-embedding-3-small', summary_model_name='gpt-3.5-turbo', content_url : str = '',
+                 openai_client: OpenAI | None = None, openrouter_client: OpenAI | None = None,
+                 embedding_batcher: MicroBatcher | None = None, embedding_cache: EmbeddingCache | None = None,
+                 summary_cache: SummaryCache | None = None, categorizer: CentroidCategorizer | None = None,
+                 category_registry: CategoryRegistry | None = None, embedding_dims: int = 1536, max_batch_size: int = 256, max_batch_tokens: int = 100_000,
+                 link_iab_categories: bool = False):
+        '''
+        Pass in the shared clients from core.services so their connection pools are reused,
+        the manager itself is cheap and made per message. With embedding_batcher single
+        embeddings from concurrent messages are sent together, with embedding_cache texts
+        embedded before (by any service) are not sent at all, and with summary_cache the
+        same page content is only summarized once. link_iab_categories links the centroid
+        categorizer's IAB labels instead of the LLM's categories
+        '''
         self.db = db
         self.embedding_model = embedding_model_name
         self.summary_model = summary_model_name
-        self.categorizer = iab.SolrQueryIAB(file_path="dummy.txt", file_url=content_url)
+        self.content_url = content_url
+        self._categorizer = categorizer
+        self.link_iab_categories = link_iab_categories
+        # the registry's one keeps name -> id across messages, a private one only for this manager
+        self.category_registry = category_registry or CategoryRegistry(db.get_bind())
+        self.embedding_batcher = embedding_batcher
+        self.embedding_cache = embedding_cache
+        self.summary_cache = summary_cache
+        self.embedding_dims = embedding_dims
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
         self.ai_summary = ''
         
-        self.openrouter_client = OpenAI(
+        self.openrouter_client = openrouter_client or OpenAI(
             base_url="https://openrouter.ai/api/v1",
             api_key= os.getenv("OPENROUTER_API_KEY")
         )
 
-        self.openai_client = OpenAI(
+        self.openai_client = openai_client or OpenAI(
             api_key= os.getenv("OPENAI_API_KEY")
         )
 
+    @property
+    def categorizer(self) -> CentroidCategorizer | iab.SolrQueryIAB:
+        # without the registry's centroid categorizer fall back to Solr, built on first use
+        if self._categorizer is None:
+            self._categorizer = iab.SolrQueryIAB(file_path="dummy.txt", file_url=self.content_url)
+        return self._categorizer
+
         
 
     ###############################################################################
@@ -67,10 +159,11 @@ class ContentEmbeddingManager:
     ###############################################################################
 
 
-    def process_content(self, content: Content, raw_html)-> ContentAI | None:
+    def process_content(self, content: Content, raw_html, summary_input: str | None = None, page_title: str | None = None)-> ContentAI | None:
         '''
         Inserts content into the database if it doesn't exist, summarizes it, and embeds the summary
         If any exceptions occur, the transaction will be rolled back
+        summary_input/page_title can be passed in when the html was already parsed (pipeline parse stage)
         '''
         try:
             if self._content_ai_exists(content.content_id):
@@ -80,7 +173,10 @@ class ContentEmbeddingManager:
 
             # Enrich the content by parsing the raw_html. If getting the html fails, default the summary_input to title
             #add in raw html to the enrich content function 
-            summary_input, content_title = self._enrich_content(content.url, content.content_id, self.db, raw_html)
+            if summary_input:
+                content_title = page_title
+            else:
+                summary_input, content_title = self._enrich_content(content.url, content.content_id, self.db, raw_html)
             if not summary_input:
                 summary_input = content.url or "No title avaliable"
 
@@ -98,43 +194,15 @@ class ContentEmbeddingManager:
             if not content.title and content_title:
                 content.title = content_title
                 
-            #Now create categories that are not yet in the DB
-            category_set = set()
-            db = self.db
-            for category_name in categories:
-                # get the first element's name from the list of tuples
-
-                if category_name.strip() != '':
-
-                    exists = db.query(Category).filter(Category.category_name == category_name).first()
-
-                    if exists:
-                        category_set.add(exists.category_id)
-                        continue
-
-                    utc_time = datetime.now(timezone.utc)
-
-                    new_category = Category(
-                        category_id=uuid4(),
-                        category_name=category_name,
-                        created_at=utc_time,
-                        date_modified=utc_time
-                    )
-
-                    db.add(new_category)
-                    category_set.add(new_category.category_id)
-
-            db.flush()
-
-            #add them to the corresponding content object
-
-            content.categories = db.query(Category).filter(Category.category_id.in_(category_set)).all()
-
             # Embed the summary associated with the content ORM
             embedding = self._generate_embedding(summary)
             if not embedding: 
                 raise Exception("Failed to generate embedding") 
 
+            # content_category rows need the content row, then one bulk insert links them
+            self.db.flush()
+            self.category_registry.link(self.db, {content.content_id: self._iab_labels(embedding) or categories})
+
             # Insert the summary/embedding data into the ContentAI table
             content_ai = ContentAI(
                 content_id=content.content_id,
@@ -143,6 +211,9 @@ class ContentEmbeddingManager:
             )
 
             self.db.add(content_ai)
+            # folders the content was filed in before it had an embedding (picked on save)
+            self.db.flush()
+            add_to_filed_profiles(self.db, [content.content_id])
             return content_ai
         
         except SQLAlchemyError as e:
@@ -187,105 +258,72 @@ class ContentEmbeddingManager:
     ###############################################################################
 
 
-    def generateCategories(self):
-        self.categorizer.setAiSummary(ai_summary=self.ai_summary)
-        self.categorizer.index_data()
-        categories_dic = self.categorizer.get_categories()
+    def generateCategories(self, embedding=None) -> list[str]:
+        '''IAB labels of the current summary, scored with its embedding when it is passed in'''
+        try:
+            return category_labels(self.categorizer.categorize(self.ai_summary, embedding=embedding))
+        except Exception as e:
+            logger.warning(f"Failed to categorize content: {e}")
+            return []
 
-        return categories_dic
+    def _iab_labels(self, embedding) -> list[str]:
+        '''
+        IAB labels linked in place of the LLM's categories when link_iab_categories is on.
+        Only the in process centroid categorizer is used, a save never waits on Solr
+        '''
+        if not self.link_iab_categories or self._categorizer is None:
+            return []
+        return self.generateCategories(embedding)
     
 
     def _enrich_content(self, url: str, content_id: UUID, db: Session, raw_html):
-        try:
-           
-            metadata = self._extract_metadata_and_body(raw_html)
-            metadata["body_text"] = self._clean_text(metadata["body_text"])
-
-            summary_input = ''
-            if not metadata or metadata == '':
-                #build the data with just the title 
-                summary_input = self._build_summary_input(url)
-            else:
-                summary_input = self._build_summary_input(metadata)
-            return summary_input, (metadata["title"] if metadata else url)
+        return build_summary_input(url, raw_html)
 
-        except Exception as e:
-            print(f"Error enriching content from {url}: {e}")
-            return None, None
+
+    def embed_many(self, texts: list[str]) -> list:
+        '''
+        Embeds texts with as few requests as the batch size / token limits allow.
+        Vectors come back in the same order, None for the texts whose request failed
+        '''
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed_many(self.embedding_model, self.embedding_dims, texts, self._request_embeddings)
+        return self._request_embeddings(texts)
+
+
+    def _request_embeddings(self, texts: list[str]) -> list:
+        return embed_texts(self.openai_client, self.embedding_model, texts,
+                           max_batch_size=self.max_batch_size, max_tokens=self.max_batch_tokens)
 
 
     def _generate_embedding(self, text):
         try:
-            response = self.openai_client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            if self.embedding_batcher is None:
+                return self.embed_many([text])[0]
+            if self.embedding_cache is not None:
+                cached = self.embedding_cache.get_many(self.embedding_model, self.embedding_dims, [text])[0]
+                if cached is not None:
+                    return cached
+            # the registry's batcher stores what it embeds in the same cache
+            return self.embedding_batcher.submit(text)
         except Exception as e:
             print(f"OpenAI embedding failed: {e}")
             return None
-        
+
 
     def _content_ai_exists(self, content_id: UUID) -> bool:
         return self.db.query(ContentAI).filter_by(content_id=content_id).first() is not None
 
 
     def _clean_text(self, text:str, max_chars=1000) -> str:    
-        lines = text.split("\n")
-        cleaned = []
-
-        for line in lines:
-            line = line.strip()
-            if not line or re.search(r"(©|\ball rights\b|cookie|advertisement)", line, re.I):
-                continue
-            cleaned.append(line)
-
-        joined = " ".join(cleaned)
-        return joined[:max_chars]
+        return clean_text(text, max_chars=max_chars)
             
 
     def _extract_metadata_and_body(self, html: str) -> dict:
-        soup = BeautifulSoup(html, "html.parser")
-        
-        title = soup.title.string.strip() if soup.title else ""
-        description = ""
-        tags = []
-
-        for meta in soup.find_all("meta"):
-            if meta.get("name") == "description":
-                description = meta.get("content", "")
-            if meta.get("property") == "og:description":
-                description = meta.get("content", "") or description
-            if meta.get("name") == "keywords":
-                tags = [tag.strip() for tag in meta.get("content", "").split(",")]
-
-        doc = Document(html)
-        # html snippet of main content body with boilerplate (nav bars, ads, footers) removed
-        body = BeautifulSoup(doc.summary(), "html.parser").get_text()
-
-        return {
-            "title": title,
-            "description": description,
-            "tags": tags,   
-            "body_text": body.strip()
-        }
+        return extract_metadata_and_body(html)
 
 
     def _build_summary_input(self, metadata: dict) -> str:
-        input_parts = []
-
-        if metadata["title"]:
-            input_parts.append(f"Title: {metadata['title']}")
-        if metadata["description"]:
-            input_parts.append(f"Description: {metadata['description']}")
-        if metadata["tags"]:
-            input_parts.append(f"Tags: {', '.join(metadata['tags'])}")
-        if metadata["body_text"]:
-            input_parts.append(f"Content:\n\n{metadata['body_text']}")
-        
-        # snippet = metadata["body_text"][:500]
-        # input_parts.append(f"Content Snippet: {snippet}")
-        return "\n".join(input_parts)
+        return format_summary_input(metadata)
 
 
     def _insert_db(self, Data_Model, data):
@@ -315,57 +353,31 @@ class ContentEmbeddingManager:
     
     
     def _summarize_content(self, summary_input):
-        categories = [
-            "Science & Technology",
-            "Arts & Entertainment",
-            "News & Politics",
-            "History & Culture",
-            "Health & Wellness",
-            "Business & Finance",
-            "Education & Learning",
-            "Home & Lifestyle",
-            "Nature & Environment",
-            "Sports & Recreation",
-        ]
+        '''
+        (summary, categories) for the summary input, None when the LLM call failed.
+        The summary cache is checked first, a hit skips the LLM call
+        '''
+        if self.summary_cache is not None:
+            cached = self.summary_cache.get(summary_input)
+            if cached is not None:
+                return cached
+
+        result = self._request_summary(summary_input)
+        if result and self.summary_cache is not None:
+            self.summary_cache.put(summary_input, *result)
+        return result
+
+
+    def _request_summary(self, summary_input):
         try:
             logger.info(f"Summarizing content with input: {summary_input}")
             response = self.openrouter_client.chat.completions.create(
-                model="openrouter/auto:floor",
+                model=SUMMARY_MODEL,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a concise technical summarizer. "
-                            "Summarize the article in exactly two short sentences. "
-                            "Focus on the main point only. "
-                            f"You will also return 1 to 3 categories you believe match the content based on this list here: {categories}"
-                        ),
-                    },
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                     {"role": "user", "content": summary_input},
                 ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "response",
-                        "strict": True,
-                        "schema": {
-                            "type": "object",
-                            "properties": {
-                                "summary": {
-                                    "type": "string",
-                                    "description": "Short summary of the content",
-                                },
-                                "categories": {
-                                    "type": "array",
-                                    "description": "List of matched categories",
-                                    "items": {"type": "string"},
-                                },
-                            },
-                            "required": ["summary", "categories"],
-                            "additionalProperties": False,
-                        },
-                    },
-                },
+                response_format=SUMMARY_RESPONSE_FORMAT,
             )
 
             raw_content = response.choices[0].message.content.strip()
@@ -377,3 +389,123 @@ class ContentEmbeddingManager:
         except Exception as e:
             logger.error(f"OpenRouter summarization failed: {e}")
             return None
+
+
+###############################################################################
+# EMBEDDINGS
+###############################################################################
+
+
+def embed_texts(client: OpenAI, model: str, texts: list[str], max_batch_size: int = 256, max_tokens: int = 100_000) -> list:
+    '''
+    One embeddings request per batch of texts (the API takes an array of inputs),
+    split on max_batch_size inputs / max_tokens tokens. Empty texts and failed
+    batches get None
+    '''
+    results = [None] * len(texts)
+    indexes = [i for i, text in enumerate(texts) if text and text.strip()]
+
+    for batch in split_batches([texts[i] for i in indexes], max_batch_size, max_tokens):
+        batch_indexes = [indexes[i] for i in batch]
+        try:
+            response = client.embeddings.create(model=model, input=[texts[i] for i in batch_indexes])
+        except Exception as e:
+            logger.error(f"OpenAI embedding request for {len(batch_indexes)} texts failed: {e}")
+            continue
+        for item in response.data:
+            results[batch_indexes[item.index]] = item.embedding
+    return results
+
+
+###############################################################################
+# HTML PARSING
+# Module level so the pipeline's parse stage can run them in a process pool
+###############################################################################
+
+
+def clean_text(text:str, max_chars=1000) -> str:
+    lines = text.split("\n")
+    cleaned = []
+
+    for line in lines:
+        line = line.strip()
+        if not line or re.search(r"(©|\ball rights\b|cookie|advertisement)", line, re.I):
+            continue
+        cleaned.append(line)
+
+    joined = " ".join(cleaned)
+    return joined[:max_chars]
+
+
+def extract_metadata_and_body(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    
+    title = soup.title.string.strip() if soup.title else ""
+    description = ""
+    tags = []
+
+    for meta in soup.find_all("meta"):
+        if meta.get("name") == "description":
+            description = meta.get("content", "")
+        if meta.get("property") == "og:description":
+            description = meta.get("content", "") or description
+        if meta.get("name") == "keywords":
+            tags = [tag.strip() for tag in meta.get("content", "").split(",")]
+
+    doc = Document(html)
+    # html snippet of main content body with boilerplate (nav bars, ads, footers) removed
+    body = BeautifulSoup(doc.summary(), "html.parser").get_text()
+
+    return {
+        "title": title,
+        "description": description,
+        "tags": tags,   
+        "body_text": body.strip()
+    }
+
+
+def format_summary_input(metadata: dict) -> str:
+    input_parts = []
+
+    if metadata["title"]:
+        input_parts.append(f"Title: {metadata['title']}")
+    if metadata["description"]:
+        input_parts.append(f"Description: {metadata['description']}")
+    if metadata["tags"]:
+        input_parts.append(f"Tags: {', '.join(metadata['tags'])}")
+    if metadata["body_text"]:
+        input_parts.append(f"Content:\n\n{metadata['body_text']}")
+    
+    return "\n".join(input_parts)
+
+
+def build_summary_input(url: str, raw_html) -> tuple[str | None, str | None]:
+    '''
+    Parses raw html into the text sent to the summarizer
+    Returns (summary_input, page_title) or (None, None) when the html can't be parsed
+    '''
+    try:
+        # one size bounded lxml parse (classes/extractor.py), body text comes back cleaned
+        metadata = extract(raw_html)
+
+        summary_input = ''
+        if not metadata or metadata == '':
+            #build the data with just the title 
+            summary_input = format_summary_input(url)
+        else:
+            summary_input = format_summary_input(metadata)
+        return summary_input, (metadata["title"] if metadata else url)
+
+    except Exception as e:
+        print(f"Error enriching content from {url}: {e}")
+        return None, None
+
+
+def build_text_summary_input(url: str, title: str | None, page_text: str) -> tuple[str, str]:
+    '''
+    Summarizer input from readable text the client already extracted (no html to parse)
+    Returns (summary_input, page_title)
+    '''
+    page_title = title or url
+    metadata = {'title': page_title, 'description': '', 'tags': [], 'body_text': clean_text(page_text)}
+    return format_summary_input(metadata), page_title
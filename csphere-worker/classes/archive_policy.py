@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import requests
+
+from core.metrics import metrics
+from data_models.content import Content
+
+logger = logging.getLogger(__name__)
+
+
+# Actions an ArchiveDecision can carry
+CAPTURE_NEW = 'capture_new'
+REUSE_FRESH = 'reuse_fresh'
+REUSE_UNCHANGED = 'reuse_unchanged'
+REUSE_CHECK_FAILED = 'reuse_check_failed'
+RECAPTURE_CHANGED = 'recapture_changed'
+RECAPTURE_STALE = 'recapture_stale'
+
+
+class ArchiveDecision:
+    def __init__(self, action: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.action = action
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def capture(self) -> bool:
+        return self.action in (CAPTURE_NEW, RECAPTURE_CHANGED, RECAPTURE_STALE)
+
+    def __repr__(self):
+        return f"ArchiveDecision({self.action!r}, etag={self.etag!r}, last_modified={self.last_modified!r})"
+
+
+class ArchivePolicy:
+    '''
+    Decides whether a saved page needs a new snapshot.
+
+    - no snapshot yet: capture
+    - snapshot younger than max_age: reuse it, no network at all
+    - older: conditional HEAD with the stored ETag / Last-Modified. 304 or matching
+      validators reuse the snapshot, anything else re-captures. Pages that send no
+      validators are re-captured once they are stale.
+    - HEAD fails (timeout, 405...): keep the snapshot we have
+
+    Every decision is counted in core.metrics under archive.decision.<action>
+    '''
+
+    def __init__(self, max_age: timedelta, revalidate: bool = True, head_timeout: float = 5.0,
+                 session: Optional[requests.Session] = None):
+        self.max_age = max_age
+        self.revalidate = revalidate
+        self.head_timeout = head_timeout
+        self.session = session or requests.Session()
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def decide(self, content: Content, url: str) -> ArchiveDecision:
+        decision = self._decide(content, url)
+        metrics.incr(f'archive.decision.{decision.action}')
+        if not decision.capture:
+            metrics.incr('archive.captures_avoided')
+            metrics.incr('archive.s3_puts_avoided')
+        logger.info(f"Archive decision for {url}: {decision}")
+        return decision
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _decide(self, content: Content, url: str) -> ArchiveDecision:
+        if not content.html_content_url:
+            etag, last_modified = self._validators(url)
+            return ArchiveDecision(CAPTURE_NEW, etag, last_modified)
+
+        archived_at = content.html_archived_at
+        if archived_at and datetime.now(timezone.utc) - archived_at < self.max_age:
+            return ArchiveDecision(REUSE_FRESH, content.html_etag, content.html_last_modified)
+
+        if not self.revalidate:
+            return ArchiveDecision(RECAPTURE_STALE)
+
+        headers = {}
+        if content.html_etag:
+            headers['If-None-Match'] = content.html_etag
+        if content.html_last_modified:
+            headers['If-Modified-Since'] = content.html_last_modified
+
+        try:
+            response = self.session.head(url, headers=headers, timeout=self.head_timeout, allow_redirects=True)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"HEAD check failed for {url}, keeping the current snapshot: {e}")
+            return ArchiveDecision(REUSE_CHECK_FAILED, content.html_etag, content.html_last_modified)
+
+        if response.status_code >= 400:
+            return ArchiveDecision(REUSE_CHECK_FAILED, content.html_etag, content.html_last_modified)
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        if response.status_code == 304:
+            return ArchiveDecision(REUSE_UNCHANGED, content.html_etag, content.html_last_modified)
+
+        if not headers or not (etag or last_modified):
+            # nothing to compare against, fall back to age
+            return ArchiveDecision(RECAPTURE_STALE, etag, last_modified)
+
+        unchanged = (
+            (etag is None or etag == content.html_etag)
+            and (last_modified is None or last_modified == content.html_last_modified)
+        )
+        if unchanged:
+            return ArchiveDecision(REUSE_UNCHANGED, etag, last_modified)
+        return ArchiveDecision(RECAPTURE_CHANGED, etag, last_modified)
+
+    def _validators(self, url: str) -> tuple[Optional[str], Optional[str]]:
+        '''ETag / Last-Modified to store with a new snapshot, best effort'''
+        if not self.revalidate:
+            return None, None
+        try:
+            response = self.session.head(url, timeout=self.head_timeout, allow_redirects=True)
+            if response.status_code < 400:
+                return response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"HEAD for validators failed for {url}: {e}")
+        return None, None
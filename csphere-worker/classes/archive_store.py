@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+CHUNK_SIZE = 256 * 1024
+# S3 multipart parts must be at least 5 MB (except the last one)
+MIN_PART_SIZE = 8 * 1024 * 1024
+
+EXTENSIONS = {'gzip': '.gz', 'br': '.br', 'identity': ''}
+
+
+class StoredArchive:
+    def __init__(self, key: str, url: str, sha256: str, size: int, stored_size: Optional[int], deduplicated: bool):
+        self.key = key
+        self.url = url
+        self.sha256 = sha256
+        self.size = size
+        self.stored_size = stored_size
+        self.deduplicated = deduplicated
+
+    def __repr__(self):
+        return (f"StoredArchive(key={self.key!r}, size={self.size}, stored_size={self.stored_size}, "
+                f"deduplicated={self.deduplicated})")
+
+
+class ArchiveStore(ABC):
+    '''
+    Content addressed storage for html snapshots.
+
+    The key is the sha256 of the uncompressed snapshot (archives/sha256/<hash>.html[.gz|.br]),
+    so the same snapshot saved twice is stored once: put() checks for the key first and
+    skips the upload when it exists. Snapshots are compressed chunk by chunk while they
+    are written, nothing goes through a temp file.
+    '''
+
+    def __init__(self, encoding: str = 'gzip', prefix: str = 'archives/sha256'):
+        if encoding == 'br' and brotli is None:
+            logger.warning("brotli is not installed, storing archives with gzip")
+            encoding = 'gzip'
+        if encoding not in EXTENSIONS:
+            raise ValueError(f"Unsupported archive encoding: {encoding}")
+        self.encoding = encoding
+        self.prefix = prefix.rstrip('/')
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def key_for(self, sha256: str) -> str:
+        return f"{self.prefix}/{sha256}.html{EXTENSIONS[self.encoding]}"
+
+    def put(self, snapshot: bytes) -> StoredArchive:
+        sha256 = hashlib.sha256(snapshot).hexdigest()
+        key = self.key_for(sha256)
+
+        if self.exists(key):
+            logger.info(f"Archive {key} already stored, skipping the upload")
+            return StoredArchive(key, self.url_for(key), sha256, len(snapshot), None, deduplicated=True)
+
+        stored_size = self._write(key, self._compressed_chunks(snapshot))
+        return StoredArchive(key, self.url_for(key), sha256, len(snapshot), stored_size, deduplicated=False)
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        pass
+
+    @abstractmethod
+    def read(self, key: str) -> bytes:
+        """Returns the decompressed snapshot."""
+        pass
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    @abstractmethod
+    def _write(self, key: str, chunks: Iterator[bytes]) -> int:
+        """Writes the already compressed chunks under key, returns the stored size."""
+        pass
+
+    def _compressed_chunks(self, snapshot: bytes) -> Iterator[bytes]:
+        view = memoryview(snapshot)
+        if self.encoding == 'identity':
+            for start in range(0, len(view), CHUNK_SIZE):
+                yield bytes(view[start:start + CHUNK_SIZE])
+            return
+
+        if self.encoding == 'br':
+            compressor = brotli.Compressor(quality=5)
+            compress, flush = (lambda chunk: compressor.process(bytes(chunk))), compressor.finish
+        else:
+            # wbits=31 writes a gzip header, so Content-Encoding: gzip works as is
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            compress, flush = compressor.compress, compressor.flush
+
+        for start in range(0, len(view), CHUNK_SIZE):
+            out = compress(view[start:start + CHUNK_SIZE])
+            if out:
+                yield out
+        tail = flush()
+        if tail:
+            yield tail
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return brotli.decompress(data)
+        if self.encoding == 'gzip':
+            return zlib.decompress(data, 31)
+        return data
+
+
+class LocalArchiveStore(ArchiveStore):
+    '''Filesystem backend, used for local runs and tests'''
+
+    def __init__(self, root: str, encoding: str = 'gzip', prefix: str = 'archives/sha256'):
+        super().__init__(encoding=encoding, prefix=prefix)
+        self.root = os.path.abspath(root)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def url_for(self, key: str) -> str:
+        return f"file://{self._path(key)}"
+
+    def read(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return self._decompress(f.read())
+
+    def _write(self, key: str, chunks: Iterator[bytes]) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.partial"
+        size = 0
+        with open(partial, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        # readers never see a half written archive
+        os.replace(partial, path)
+        return size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+
+class S3ArchiveStore(ArchiveStore):
+    '''
+    S3 backend. Compressed chunks are buffered into multipart parts and uploaded as they
+    fill up, small snapshots (one part) go up with a single put_object
+    '''
+
+    def __init__(self, s3_client, bucket_name: str, encoding: str = 'gzip', prefix: str = 'archives/sha256'):
+        super().__init__(encoding=encoding, prefix=prefix)
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except self.s3.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def url_for(self, key: str) -> str:
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{key}"
+
+    def read(self, key: str) -> bytes:
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        return self._decompress(response['Body'].read())
+
+    def _object_args(self) -> dict:
+        args = {'ContentType': 'text/html; charset=utf-8'}
+        if self.encoding != 'identity':
+            args['ContentEncoding'] = self.encoding
+        return args
+
+    def _write(self, key: str, chunks: Iterator[bytes]) -> int:
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts = []
+
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) >= MIN_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = self.s3.create_multipart_upload(
+                            Bucket=self.bucket_name, Key=key, **self._object_args()
+                        )['UploadId']
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+
+            if upload_id is None:
+                self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=bytes(buffer), **self._object_args())
+                return size
+
+            if buffer:
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+            )
+            return size
+
+        except Exception:
+            if upload_id is not None:
+                self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            raise
+
+    def _upload_part(self, key: str, upload_id: str, number: int, body: bytes) -> dict:
+        response = self.s3.upload_part(
+            Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=number, Body=body,
+        )
+        return {'ETag': response['ETag'], 'PartNumber': number}
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+from typing import Optional
+from uuid import uuid4
+
+from fake_useragent import UserAgent
+from playwright.async_api import Page
+
+from classes.render_pool import BrowserUnavailable, RenderPool
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Same defaults single-file-cli uses for a self contained snapshot
+SINGLEFILE_OPTIONS = {
+    'removeHiddenElements': True,
+    'removeUnusedStyles': True,
+    'removeUnusedFonts': True,
+    'removeFrames': False,
+    'compressHTML': True,
+    'loadDeferredImages': True,
+    'loadDeferredImagesMaxIdleTime': 1500,
+    'blockScripts': True,
+    'blockVideos': True,
+    'blockAudios': True,
+}
+
+# Where `npm install [-g] single-file-cli` puts the bundle, tried when SINGLEFILE_BUNDLE_PATH is empty
+BUNDLE_CANDIDATES = (
+    'node_modules/single-file-cli/lib/single-file-bundle.js',
+    '/usr/local/lib/node_modules/single-file-cli/lib/single-file-bundle.js',
+    '/usr/lib/node_modules/single-file-cli/lib/single-file-bundle.js',
+)
+
+
+class PageArchiver:
+    '''
+    Captures self contained html snapshots (SingleFile) inside the warm browser pool.
+
+    The SingleFile bundle is injected into each page's context and getPageData() runs
+    in the page itself, so a capture is one tab in an already running browser and the
+    snapshot comes back as bytes, no Node start, npx lookup or temp file per page.
+    Without a bundle every capture falls back to the `npx single-file-cli` subprocess,
+    logged and counted as archive.cli_fallback.
+
+    :param render_pool: shared RenderPool the captures run in
+    :param bundle_path: path to single-file-bundle.js (from the single-file-cli package),
+        empty looks in BUNDLE_CANDIDATES
+    :param max_concurrency: captures running at the same time
+    :param page_timeout: seconds allowed for one capture
+    '''
+
+    def __init__(self, render_pool: RenderPool, bundle_path: str = '', max_concurrency: int = 4,
+                 page_timeout: float = 60.0, options: Optional[dict] = None):
+        self.render_pool = render_pool
+        self.page_timeout = page_timeout
+        self.options = options or SINGLEFILE_OPTIONS
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bundle = self._load_bundle(bundle_path)
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def archive(self, url: str) -> Optional[bytes]:
+        '''Returns the snapshot html as utf-8 bytes, None when the capture failed'''
+        if not url.startswith("http"):
+            url = "https://" + url
+
+        with self._slots:
+            if self._bundle is None:
+                metrics.incr('archive.cli_fallback')
+                logger.warning(f"No SingleFile bundle loaded, archiving {url} with single-file-cli")
+                return archive_with_cli(url, timeout=self.page_timeout * 2)
+
+            logger.info(f"Archiving following url: {url}")
+            try:
+                content = self.render_pool.run(
+                    url,
+                    self._get_page_data,
+                    timeout=self.page_timeout,
+                    # the snapshot embeds images and fonts, so nothing can be blocked here
+                    block_resources=False,
+                    init_script=self._bundle,
+                    wait_until='load',
+                )
+            except BrowserUnavailable as e:
+                logger.error(f"Can't archive {url}: {e}")
+                return None
+
+        if not content:
+            logger.error(f"SingleFile capture failed for {url}")
+            return None
+        return content.encode('utf-8')
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    async def _get_page_data(self, page: Page) -> Optional[str]:
+        data = await page.evaluate("options => singlefile.getPageData(options)", self.options)
+        return data.get('content') if data else None
+
+    @staticmethod
+    def _load_bundle(bundle_path: str) -> Optional[str]:
+        candidates = (bundle_path,) if bundle_path else BUNDLE_CANDIDATES
+        for path in candidates:
+            if os.path.exists(path):
+                logger.info(f"SingleFile bundle loaded from {path}")
+                with open(path, encoding='utf-8') as f:
+                    return f.read()
+
+        logger.error(
+            f"SingleFile bundle not found (tried {', '.join(candidates)}), every snapshot will start "
+            "its own `npx single-file-cli` and browser. Set SINGLEFILE_BUNDLE_PATH"
+        )
+        return None
+
+
+def archive_with_cli(url: str, timeout: float = 120) -> Optional[bytes]:
+    '''
+    Legacy capture: one `npx single-file-cli` run (and browser) per url
+    '''
+    output_dir = "temp_archives"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.abspath(os.path.join(output_dir, f"{uuid4().hex}.html"))
+
+    ua = UserAgent(browsers=['chrome', 'edge'], os=['macos', 'windows'])
+    browser_args = [
+        "--no-sandbox",
+        "--disable-setuid-sandbox",
+        "--disable-gpu",
+        "--disable-dev-shm-usage",
+        f"--user-agent={ua.random}",
+        "--disable-blink-features=AutomationControlled",
+    ]
+    command = [
+        "npx",
+        "single-file-cli",
+        url,
+        output_path,
+        "--browser-args",
+        json.dumps(browser_args),
+    ]
+
+    logger.info(f"Archiving following url with single-file-cli: {url}")
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0 and os.path.exists(output_path):
+            with open(output_path, 'rb') as f:
+                return f.read()
+        logger.error(f"SingleFile Error ({result.returncode}): {result.stderr}")
+    except Exception as e:
+        logger.error(f"Archive subprocess failed: {e}")
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    return None
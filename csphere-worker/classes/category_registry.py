@@ -0,0 +1,114 @@
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Iterable
+from uuid import UUID, uuid4
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.metrics import metrics
+from data_models.category import Category
+from data_models.content_category import ContentCategory
+
+logger = logging.getLogger(__name__)
+
+# Copied in csphere-worker/classes and backend/app/embeddings, the two deploy separately.
+# Only the imports, the metrics calls and get_category_registry may differ:
+# csphere-worker/tests/category_registry_test.py fails when the copies drift
+
+
+class CategoryRegistry:
+    '''
+    category_name -> category_id for the whole process. Categories are a small global
+    set that only grows, so the map is warmed with one query and new names are created
+    with a single INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    New categories are committed on their own connection, an id is only cached once its
+    row exists for everyone (a rolled back message can't leave a dangling id behind)
+    '''
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._ids: dict[str, UUID] = {}
+        self._warm = False
+        self._lock = threading.Lock()
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def ids(self, names: Iterable[str]) -> dict[str, UUID]:
+        '''{name: category_id} for the non blank names, creating the missing categories'''
+        wanted = {name.strip() for name in names if name and name.strip()}
+        if not wanted:
+            return {}
+
+        self._warm_up()
+        with self._lock:
+            found = {name: self._ids[name] for name in wanted if name in self._ids}
+        missing = wanted - found.keys()
+        metrics.incr('category_registry.hits', len(found))
+
+        if missing:
+            metrics.incr('category_registry.misses', len(missing))
+            created = self._create(missing)
+            found.update(created)
+            with self._lock:
+                self._ids.update(created)
+        return found
+
+    def link(self, db: Session, content_categories: dict[UUID, Iterable[str]]):
+        '''
+        Links each content to its categories with one insert, in the caller's transaction.
+        content_categories: {content_id: [category_name, ...]}
+        '''
+        ids = self.ids(name for names in content_categories.values() for name in names)
+        rows = {
+            (content_id, ids[name.strip()])
+            for content_id, names in content_categories.items()
+            for name in names if name and name.strip() in ids
+        }
+        if not rows:
+            return
+        db.execute(
+            insert(ContentCategory)
+            .values([{'content_id': content_id, 'category_id': category_id} for content_id, category_id in rows])
+            .on_conflict_do_nothing()
+        )
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _warm_up(self):
+        with self._lock:
+            if self._warm:
+                return
+            with self.engine.connect() as conn:
+                rows = conn.execute(select(Category.category_name, Category.category_id)).all()
+            self._ids.update({name: category_id for name, category_id in rows if name})
+            self._warm = True
+            logger.info(f"Category registry warmed with {len(self._ids)} categories")
+
+    def _create(self, names: set[str]) -> dict[str, UUID]:
+        now = datetime.now(timezone.utc)
+        with self.engine.begin() as conn:
+            created = dict(conn.execute(
+                insert(Category)
+                .values([
+                    {'category_id': uuid4(), 'category_name': name, 'created_at': now, 'date_modified': now}
+                    for name in names
+                ])
+                .on_conflict_do_nothing(index_elements=['category_name'])
+                .returning(Category.category_name, Category.category_id)
+            ).all())
+
+            # created by another process since the warm up
+            raced = names - created.keys()
+            if raced:
+                created.update(dict(conn.execute(
+                    select(Category.category_name, Category.category_id).where(Category.category_name.in_(raced))
+                ).all()))
+        return created
@@ -0,0 +1,271 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+import ahocorasick
+import numpy as np
+from rapidfuzz import fuzz, process
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.metrics import metrics
+from data_models.folder import Folder
+
+logger = logging.getLogger(__name__)
+
+
+# share of the reranking score from the folder's keywords, its description and the
+# cosine similarity to its profile. A folder is picked from MATCH_THRESHOLD up
+KEYWORD_WEIGHT = 0.2
+DESCRIPTION_WEIGHT = 0.3
+VECTOR_WEIGHT = 0.5
+MATCH_THRESHOLD = 0.20
+
+# patterns that can't share one alternation: backreferences would point at another
+# pattern's groups once combined
+BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class FolderMatcher:
+    '''
+    A user's bucketing folders compiled once for matching:
+        - every url pattern goes in one precompiled alternation, a url none of them
+          matches (the usual case) is ruled out with a single search
+        - every keyword goes in one Aho-Corasick automaton, one pass over the text
+          finds the keywords of all the folders
+        - the descriptions are scored against the text with one rapidfuzz cdist call
+    folders: rows with folder_id, keywords, url_patterns and description
+    '''
+
+    def __init__(self, folders: Iterable):
+        self.folder_ids = []
+        # folder_id -> its row in the score matrices
+        self.positions = {}
+        self._url_rules = []
+        self._keyword_counts = []
+        self._empty_keywords = []
+        keyword_folders = {}
+        descriptions, description_positions = [], []
+
+        for position, folder in enumerate(folders):
+            self.folder_ids.append(folder.folder_id)
+            self.positions[folder.folder_id] = position
+
+            patterns = []
+            for pattern in folder.url_patterns or []:
+                try:
+                    patterns.append(re.compile(pattern.lower()))
+                except re.error:
+                    logger.debug(f"Skipping invalid url pattern {pattern!r} of folder {folder.folder_id}")
+            if patterns:
+                self._url_rules.append((position, patterns))
+
+            keywords = [keyword.lower() for keyword in folder.keywords or []]
+            self._keyword_counts.append(len(keywords))
+            # '' is in every text
+            self._empty_keywords.append(sum(1 for keyword in keywords if not keyword))
+            for keyword in keywords:
+                if keyword:
+                    # a keyword listed twice counts twice, like it did in the per folder loop
+                    keyword_folders.setdefault(keyword, []).append(position)
+
+            if folder.description and folder.description.strip():
+                descriptions.append(folder.description.lower())
+                description_positions.append(position)
+
+        self._url_filter = self._compile_url_filter()
+
+        self._automaton = None
+        if keyword_folders:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, positions in keyword_folders.items():
+                self._automaton.add_word(keyword, (keyword, positions))
+            self._automaton.make_automaton()
+
+        self._descriptions = descriptions
+        self._description_positions = np.asarray(description_positions, dtype=np.intp)
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def url_matches(self, content_url: str) -> list:
+        '''folder_ids with a url pattern matching content_url, in folder order'''
+        if not self._url_rules:
+            return []
+        if self._url_filter is not None and not self._url_filter.search(content_url):
+            return []
+        return [
+            self.folder_ids[position]
+            for position, patterns in self._url_rules
+            if any(pattern.search(content_url) for pattern in patterns)
+        ]
+
+    def url_match(self, content_url: str):
+        '''
+        The folder a url rule files content_url into, None when no rule fires. When rules
+        of several folders fire the most specific one wins (longest matching pattern)
+        '''
+        if not self._url_rules:
+            return None
+        if self._url_filter is not None and not self._url_filter.search(content_url):
+            return None
+        best, best_length = None, -1
+        for position, patterns in self._url_rules:
+            for pattern in patterns:
+                if len(pattern.pattern) > best_length and pattern.search(content_url):
+                    best, best_length = self.folder_ids[position], len(pattern.pattern)
+        return best
+
+    def keyword_scores(self, content_text: str) -> np.ndarray:
+        '''Share of each folder's keywords found in content_text (lowercased)'''
+        return self.keyword_matrix([content_text])[0]
+
+    def description_scores(self, content_text: str) -> np.ndarray:
+        '''token_set_ratio of each folder's description against content_text, 0 to 1'''
+        return self.description_matrix([content_text])[0]
+
+    def scores(self, content_text: str) -> dict:
+        '''{folder_id: keyword and description part of the reranking score}'''
+        if not self.folder_ids:
+            return {}
+        return dict(zip(self.folder_ids, self.lexical_matrix([content_text])[0].tolist()))
+
+    def keyword_matrix(self, texts: list[str]) -> np.ndarray:
+        '''(texts x folders) share of each folder's keywords found in each text'''
+        counts = np.tile(np.asarray(self._empty_keywords, dtype=np.float32), (len(texts), 1))
+        if self._automaton is not None:
+            for row, content_text in enumerate(texts):
+                if not content_text:
+                    continue
+                found = {}
+                for _, (keyword, positions) in self._automaton.iter(content_text):
+                    found[keyword] = positions
+                for positions in found.values():
+                    np.add.at(counts[row], positions, 1)
+        totals = np.asarray(self._keyword_counts, dtype=np.float32)
+        return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+    def description_matrix(self, texts: list[str]) -> np.ndarray:
+        '''(texts x folders) description similarity, every pair in one cdist call'''
+        scores = np.zeros((len(texts), len(self.folder_ids)), dtype=np.float32)
+        if self._descriptions and texts:
+            similarity = process.cdist(texts, self._descriptions, scorer=fuzz.token_set_ratio, dtype=np.float32)
+            scores[:, self._description_positions] = similarity / 100.0
+        return scores
+
+    def lexical_matrix(self, texts: list[str]) -> np.ndarray:
+        '''(texts x folders) keyword and description part of the reranking score'''
+        return (self.keyword_matrix(texts) * KEYWORD_WEIGHT
+                + self.description_matrix(texts) * DESCRIPTION_WEIGHT)
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _compile_url_filter(self):
+        patterns = [pattern.pattern for _, compiled in self._url_rules for pattern in compiled]
+        if not patterns or any(BACKREFERENCE.search(pattern) for pattern in patterns):
+            return None
+        try:
+            return re.compile('|'.join(f"(?:{pattern})" for pattern in patterns))
+        except re.error:
+            # inline flags like (?i) only compile at the start of a pattern
+            return None
+
+
+def assign_folders(embeddings: np.ndarray, folder_matrix: np.ndarray, lexical: np.ndarray, rules: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Best folder for every (content, folder) pair at once, the same scoring as
+    BucketProcessor.find_best_matching_folder:
+        embeddings    (contents x dims), zero rows for content without an embedding
+        folder_matrix (folders x dims) folder profiles, zero rows for folders without one
+        lexical       (contents x folders) from FolderMatcher.lexical_matrix
+        rules         (contents,) folder position a url rule picked, -1 for none
+    Returns (folder position, score) per content, position -1 when nothing clears
+    MATCH_THRESHOLD. A url rule always wins
+    '''
+    def normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    similarity = normalize(np.asarray(embeddings, dtype=np.float32)) @ normalize(np.asarray(folder_matrix, dtype=np.float32)).T
+    scores = similarity * VECTOR_WEIGHT + lexical
+    # vector recall only ever returns folders with a profile and a similarity
+    scores[similarity == 0] = -np.inf
+
+    best = np.argmax(scores, axis=1) if scores.shape[1] else np.full(len(scores), -1)
+    best_scores = scores[np.arange(len(scores)), best] if scores.shape[1] else np.zeros(len(scores))
+    best = np.where(np.round(best_scores, 2) >= MATCH_THRESHOLD, best, -1)
+
+    ruled = rules >= 0
+    best = np.where(ruled, rules, best)
+    best_scores = np.where(ruled, 1.0, best_scores)
+    return best, best_scores.astype(np.float32)
+
+
+class FolderMatcherCache:
+    '''
+    user_id -> compiled FolderMatcher, an LRU of max_users. An entry is only reused while
+    the user's bucketing folders are unchanged: their count and latest updated_at (bumped
+    by the backend's update_folder_metadata) are read with one aggregate query, at most
+    once every max_age seconds per user. Within max_age a lookup touches no database, an
+    edit made through the api reaches every worker after max_age at the latest
+    '''
+
+    def __init__(self, max_users: int = 1000, max_age: float = 5.0):
+        self.max_users = max_users
+        self.max_age = max_age
+        self._matchers = OrderedDict()
+        self._lock = threading.Lock()
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def get(self, db: Session, user_id) -> FolderMatcher:
+        key = str(user_id)
+        with self._lock:
+            entry = self._matchers.get(key)
+            if entry is not None and time.monotonic() - entry[2] < self.max_age:
+                self._matchers.move_to_end(key)
+                metrics.incr('folder_matcher.hits')
+                return entry[1]
+
+        version = tuple(db.execute(
+            select(func.count(), func.max(Folder.updated_at))
+            .where(Folder.user_id == user_id, Folder.bucketing_mode == True)
+        ).one())
+
+        with self._lock:
+            entry = self._matchers.get(key)
+            if entry is not None and entry[0] == version:
+                self._matchers[key] = (version, entry[1], time.monotonic())
+                self._matchers.move_to_end(key)
+                metrics.incr('folder_matcher.hits')
+                return entry[1]
+
+        metrics.incr('folder_matcher.misses')
+        folders = db.execute(
+            select(Folder.folder_id, Folder.keywords, Folder.url_patterns, Folder.description)
+            .where(Folder.user_id == user_id, Folder.bucketing_mode == True)
+        ).all()
+        matcher = FolderMatcher(folders)
+
+        with self._lock:
+            self._matchers[key] = (version, matcher, time.monotonic())
+            self._matchers.move_to_end(key)
+            while len(self._matchers) > self.max_users:
+                self._matchers.popitem(last=False)
+        return matcher
+
+    def invalidate(self, user_id=None):
+        '''Drops one user's matcher, or all of them'''
+        with self._lock:
+            if user_id is None:
+                self._matchers.clear()
+            else:
+                self._matchers.pop(str(user_id), None)
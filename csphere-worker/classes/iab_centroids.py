@@ -0,0 +1,187 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Copied in csphere-worker/classes and backend/app/classes, the two deploy separately. Keep
+# them identical (the same taxonomy gives the same labels on both save paths):
+# csphere-worker/tests/iab_centroids_test.py fails when the copies drift
+
+
+# IAB Content Taxonomy, tier 1 -> tier 2. Each (tier 1, tier 2) pair gets a centroid,
+# keys come out as 'Tier 1/Tier 2' like the Solr categorizer returned them
+IAB_TAXONOMY = {
+    "Automotive": ["Auto Buying and Selling", "Auto Repair", "Electric Vehicle", "Motorcycles"],
+    "Books and Literature": ["Fiction", "Poetry", "Comics and Graphic Novels"],
+    "Business and Finance": ["Business", "Economy", "Personal Finance", "Investing", "Startups"],
+    "Careers": ["Job Search", "Remote Working", "Career Advice"],
+    "Education": ["College Education", "Online Education", "Language Learning"],
+    "Events and Attractions": ["Concerts and Music Events", "Conferences", "Museums and Galleries"],
+    "Family and Relationships": ["Parenting", "Marriage and Civil Unions", "Dating"],
+    "Fine Art": ["Design", "Digital Arts", "Photography", "Painting"],
+    "Food & Drink": ["Cooking", "Healthy Cooking and Eating", "Restaurants", "Alcoholic Beverages"],
+    "Healthy Living": ["Fitness and Exercise", "Nutrition", "Wellness", "Weight Loss"],
+    "Hobbies & Interests": ["Arts and Crafts", "Games and Puzzles", "Collecting", "Genealogy"],
+    "Home & Garden": ["Gardening", "Home Improvement", "Interior Decorating", "Smart Home"],
+    "Medical Health": ["Diseases and Conditions", "Mental Health", "Pharmaceutical Drugs", "Medical Research"],
+    "Movies": ["Film Reviews", "Documentary Movies", "Film Industry"],
+    "Music and Audio": ["Music Industry", "Podcasts", "Musical Instruments"],
+    "News and Politics": ["Politics", "International News", "Local News", "Elections"],
+    "Personal Finance": ["Personal Debt", "Retirement Planning", "Taxes", "Insurance"],
+    "Pets": ["Dogs", "Cats", "Pet Supplies"],
+    "Pop Culture": ["Celebrity News", "Humor and Satire"],
+    "Real Estate": ["Houses", "Apartments", "Real Estate Buying and Selling"],
+    "Religion & Spirituality": ["Christianity", "Islam", "Buddhism", "Spirituality"],
+    "Science": ["Biological Sciences", "Chemistry", "Environment", "Physics", "Space and Astronomy", "Mathematics"],
+    "Shopping": ["Coupons and Discounts", "Fashion Shopping"],
+    "Sports": ["American Football", "Basketball", "Soccer", "Tennis", "Cycling", "Esports"],
+    "Style & Fashion": ["Beauty", "Men's Fashion", "Women's Fashion", "Fashion Trends"],
+    "Technology & Computing": [
+        "Artificial Intelligence", "Computing", "Programming Languages", "Software Development",
+        "Cybersecurity", "Cloud Computing", "Consumer Electronics", "Robotics",
+    ],
+    "Television": ["Reality TV", "Drama TV", "Streaming Services"],
+    "Travel": ["Travel Locations", "Travel Preparation and Advice", "Air Travel", "Hotels and Motels"],
+    "Video Gaming": ["Console Games", "PC Games", "Mobile Games", "Game Development"],
+}
+
+
+def taxonomy_labels() -> Tuple[List[str], List[str]]:
+    '''(keys, texts): 'Tier 1/Tier 2' keys and the text each centroid is embedded from'''
+    keys, texts = [], []
+    for tier1, tier2s in IAB_TAXONOMY.items():
+        for tier2 in tier2s:
+            keys.append(f"{tier1}/{tier2}")
+            texts.append(f"{tier1}: {tier2}")
+    return keys, texts
+
+
+def category_labels(categories: Dict[str, List[Tuple[str, float]]]) -> List[str]:
+    '''Tier 2 labels of a categorize() result, best score first, what gets linked to the content'''
+    ranked = sorted(
+        ((score, label) for matches in categories.values() for label, score in matches),
+        key=lambda match: -match[0],
+    )
+    return [label for _, label in ranked]
+
+
+class CentroidIndex:
+    '''
+    IAB category centroids as one L2 normalized (categories x dims) matrix. Categorizing
+    a summary embedding is a single matrix-vector product: cosine similarity against
+    every centroid, scores under cutoff dropped, best top_k kept
+    '''
+
+    def __init__(self, keys: List[str], matrix: np.ndarray, model: str = ''):
+        self.keys = list(keys)
+        self.model = model
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    @classmethod
+    def build(cls, embed_many: Callable[[List[str]], list], model: str = '') -> 'CentroidIndex':
+        '''Embeds the taxonomy labels once (one embed_many call)'''
+        keys, texts = taxonomy_labels()
+        vectors = embed_many(texts)
+        rows = [(key, vector) for key, vector in zip(keys, vectors) if vector is not None]
+        if not rows:
+            raise RuntimeError('No IAB centroid could be embedded')
+        return cls([key for key, _ in rows], np.asarray([vector for _, vector in rows], dtype=np.float32), model)
+
+    @classmethod
+    def load(cls, path: str) -> 'CentroidIndex':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['keys'].tolist(), data['matrix'], str(data['model']))
+
+    @classmethod
+    def load_or_build(cls, path: str, embed_many: Callable[[List[str]], list], model: str = '') -> 'CentroidIndex':
+        '''
+        Loads the precomputed centroids at path, or builds them and writes path so the
+        next process only loads. A file for another model or taxonomy is rebuilt
+        '''
+        keys, _ = taxonomy_labels()
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.model == model and sorted(index.keys) == sorted(keys):
+                    return index
+                logger.info(f"IAB centroids at {path} are stale, rebuilding")
+            except Exception as e:
+                logger.warning(f"Failed to load IAB centroids from {path}: {e}")
+
+        index = cls.build(embed_many, model)
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                logger.warning(f"Failed to save IAB centroids to {path}: {e}")
+        return index
+
+    def save(self, path: str):
+        np.savez(path, keys=np.asarray(self.keys), matrix=self.matrix, model=np.asarray(self.model))
+
+    def scores(self, embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.shape != (self.matrix.shape[1],) or norm == 0:
+            return np.zeros(len(self.keys), dtype=np.float32)
+        return self.matrix @ (vector / norm)
+
+    def categorize(self, embedding, cutoff: float = 0.3, top_k: Optional[int] = 3) -> Dict[str, List[Tuple[str, float]]]:
+        '''
+        {'Tier 1/Tier 2': [('Tier 2', score)]}, best first, the same shape
+        SolrQueryIAB.get_categories returns
+        '''
+        scores = self.scores(embedding)
+        order = np.argsort(-scores)
+        if top_k:
+            order = order[:top_k]
+
+        result = defaultdict(list)
+        for i in order:
+            score = float(scores[i])
+            if score < cutoff:
+                break
+            key = self.keys[i]
+            result[key].append((key.split('/', 1)[-1], round(score, 4)))
+        return result
+
+
+class CentroidCategorizer:
+    '''
+    In-process replacement for SolrQueryIAB: categorize(ai_summary) embeds the summary
+    (or takes its embedding) and scores it against the CentroidIndex, no temp files and
+    no network calls beyond the embedding. The index is loaded on first use
+    '''
+
+    def __init__(self, load_index: Callable[[], CentroidIndex], embed: Callable[[str], list],
+                 cutoff: float = 0.3, top_k: Optional[int] = 3):
+        self.load_index = load_index
+        self.embed = embed
+        self.cutoff = cutoff
+        self.top_k = top_k
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> CentroidIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = self.load_index()
+            return self._index
+
+    def categorize(self, ai_summary: str, embedding=None) -> Dict[str, List[Tuple[str, float]]]:
+        if embedding is None:
+            embedding = self.embed(ai_summary) if ai_summary and ai_summary.strip() else None
+        if embedding is None:
+            return defaultdict(list)
+        return self.index.categorize(embedding, cutoff=self.cutoff, top_k=self.top_k)
@@ -0,0 +1,163 @@
+import hashlib
+import io
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+# Copied in backend/app/queues, which only writes payloads: the read side (stream, fetch,
+# _open, stream_blob) is worker only, get_payload_store backend only. What both have must
+# stay identical, the key layout and ref format are the contract between them:
+# csphere-worker/tests/payload_store_test.py fails when the copies drift
+
+
+# claim check: message fields over the threshold are stored here and replaced by a
+# reference ({'key', 'sha256', 'size', 'encoding'}) under '<field>_ref'
+OFFLOADED_FIELDS = ('raw_html',)
+READ_SIZE = 256 * 1024
+
+
+class PayloadStore(ABC):
+    '''
+    Content addressed, zstd compressed blobs for large message payloads
+    (payloads/sha256/<hash>.zst). The backend writes them, the worker streams them back
+    chunk by chunk so a page never has to sit in memory compressed and decompressed
+    at once. The zstd frames carry a checksum, a corrupt blob fails while it is read
+    '''
+
+    def __init__(self, level: int = 3, prefix: str = 'payloads/sha256'):
+        self.level = level
+        self.prefix = prefix.rstrip('/')
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def key_for(self, sha256: str) -> str:
+        return f"{self.prefix}/{sha256}.zst"
+
+    def put(self, data: bytes) -> dict:
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = self.key_for(sha256)
+        if not self.exists(key):
+            compressor = zstandard.ZstdCompressor(level=self.level, write_checksum=True)
+            self._write(key, compressor.compress(data))
+        return {'key': key, 'sha256': sha256, 'size': len(data), 'encoding': 'zstd'}
+
+    def stream(self, ref: dict) -> Iterator[bytes]:
+        '''Decompressed chunks of the payload, fetched when the first chunk is asked for'''
+        if ref.get('encoding') != 'zstd':
+            raise ValueError(f"Unsupported payload encoding: {ref.get('encoding')}")
+        with self._open(ref['key']) as source:
+            yield from zstandard.ZstdDecompressor().read_to_iter(source, read_size=READ_SIZE)
+
+    def fetch(self, ref: dict) -> bytes:
+        '''The compressed blob as is, for a parser in another process (see stream_blob)'''
+        with self._open(ref['key']) as source:
+            return source.read()
+
+    def read(self, ref: dict) -> bytes:
+        data = b''.join(self.stream(ref))
+        if hashlib.sha256(data).hexdigest() != ref['sha256']:
+            raise ValueError(f"Payload {ref['key']} does not match its sha256")
+        return data
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    @abstractmethod
+    def _write(self, key: str, data: bytes):
+        pass
+
+    @abstractmethod
+    def _open(self, key: str):
+        """File like object with the compressed blob, used as a context manager."""
+        pass
+
+
+class LocalPayloadStore(PayloadStore):
+    '''Directory stand-in for S3, for local runs and tests'''
+
+    def __init__(self, root: str, level: int = 3, prefix: str = 'payloads/sha256'):
+        super().__init__(level=level, prefix=prefix)
+        self.root = os.path.abspath(root)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.partial"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    def _open(self, key: str):
+        return open(self._path(key), 'rb')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+
+class S3PayloadStore(PayloadStore):
+    '''S3 backend, reads stream straight from the response body'''
+
+    def __init__(self, s3_client, bucket_name: str, level: int = 3, prefix: str = 'payloads/sha256'):
+        super().__init__(level=level, prefix=prefix)
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except self.s3.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def _write(self, key: str, data: bytes):
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=data, ContentType='application/zstd')
+
+    def _open(self, key: str):
+        return self.s3.get_object(Bucket=self.bucket_name, Key=key)['Body']
+
+
+def stream_blob(blob: bytes) -> Iterator[bytes]:
+    '''Decompressed chunks of a blob returned by PayloadStore.fetch'''
+    return zstandard.ZstdDecompressor().read_to_iter(io.BytesIO(blob), read_size=READ_SIZE)
+
+
+def offload_payload(message: dict, store: Optional[PayloadStore], threshold: int) -> dict:
+    '''
+    Copy of message with every OFFLOADED_FIELDS value over threshold bytes (utf-8)
+    moved to store and replaced by its reference. Without a store message is returned as is
+    '''
+    if store is None:
+        return message
+    message = dict(message)
+    for field in OFFLOADED_FIELDS:
+        value = message.get(field)
+        if not value:
+            continue
+        data = value.encode('utf-8') if isinstance(value, str) else value
+        if len(data) > threshold:
+            message[f"{field}_ref"] = store.put(data)
+            message[field] = None
+    return message
+
+
+def message_digest(body: str | bytes) -> str:
+    '''What gets logged for a queue message: its size and a short hash, never the payload'''
+    data = body.encode('utf-8') if isinstance(body, str) else body
+    return f"<message {len(data)} bytes sha256:{hashlib.sha256(data).hexdigest()[:12]}>"
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Optional
+
+from playwright.async_api import async_playwright, Browser, Page, Route
+
+logger = logging.getLogger(__name__)
+
+
+BLOCKED_RESOURCES = {'image', 'font', 'media'}
+# seconds after a failed launch before the pool tries to launch a browser again
+RELAUNCH_BACKOFF = 5.0
+
+
+class BrowserUnavailable(RuntimeError):
+    '''No browser is running and none could be launched'''
+
+
+class _BrowserSlot:
+    '''One warm browser plus the bookkeeping needed to recycle it'''
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.active = 0
+        self.rendered = 0
+        self.retiring = False
+
+
+class RenderPool:
+    '''
+    Fixed-size pool of warm Chromium browsers for rendering pages.
+
+    Playwright runs on its own event loop in a background thread, so any worker thread
+    can call render() synchronously. Every URL gets a fresh browser context (isolated
+    cookies/storage) in one of the running browsers, so a render costs a new tab
+    instead of a process launch. A browser is replaced after recycle_after pages to
+    cap its memory, new pages go to the replacement while the old one drains. A browser
+    that crashes or fails to launch is relaunched, when none is left run() raises
+    BrowserUnavailable.
+
+    :param browsers: number of browsers kept running
+    :param max_concurrency: pages rendered at the same time across all browsers
+    :param page_timeout: seconds allowed for one navigation
+    :param block_resources: abort image, font and media requests
+    :param recycle_after: pages a browser renders before it is replaced
+    :param wait_until: playwright load state to wait for before reading the html
+    '''
+
+    def __init__(self, browsers: int = 2, max_concurrency: int = 8, page_timeout: float = 30.0,
+                 block_resources: bool = True, recycle_after: int = 200, wait_until: str = 'domcontentloaded',
+                 launch_args: Optional[list[str]] = None, user_agent: Optional[str] = None):
+        self.browsers = browsers
+        self.max_concurrency = max_concurrency
+        self.page_timeout = page_timeout
+        self.block_resources = block_resources
+        self.recycle_after = recycle_after
+        self.wait_until = wait_until
+        self.launch_args = launch_args or ['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
+        self.user_agent = user_agent
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='render-pool', daemon=True)
+        self._started = False
+        self._start_lock = threading.Lock()
+
+        self._playwright = None
+        self._slots: list[_BrowserSlot] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._launch_lock: Optional[asyncio.Lock] = None
+        # browsers being launched, and loop time of the last failed launch
+        self._launching = 0
+        self._launch_failed_at: Optional[float] = None
+        self._closing = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'rendered': 0, 'failed': 0, 'timeouts': 0, 'recycled': 0, 'blocked_requests': 0,
+                       'crashed': 0, 'launch_failed': 0}
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+            self._started = True
+            logger.info(f"Render pool started with {self.browsers} browser(s), {self.max_concurrency} concurrent page(s)")
+
+    def render(self, url: str, timeout: Optional[float] = None) -> Optional[str]:
+        '''Renders url and returns the page html, None when the page failed to load. Thread safe'''
+        return self.run(url, _page_html, timeout=timeout)
+
+    def run(self, url: str, page_fn: Callable[[Page], Awaitable], timeout: Optional[float] = None,
+            block_resources: Optional[bool] = None, init_script: Optional[str] = None, wait_until: Optional[str] = None):
+        '''
+        Opens url in a fresh context and returns await page_fn(page), None when the page
+        failed. Thread safe. init_script is added to the context before navigation,
+        block_resources/wait_until override the pool defaults for this page. Raises
+        BrowserUnavailable when no browser is running and relaunching one failed
+        '''
+        self.start()
+        coro = self.run_async(url, page_fn, timeout=timeout, block_resources=block_resources,
+                              init_script=init_script, wait_until=wait_until)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def run_async(self, url: str, page_fn: Callable[[Page], Awaitable], timeout: Optional[float] = None,
+                        block_resources: Optional[bool] = None, init_script: Optional[str] = None,
+                        wait_until: Optional[str] = None):
+        '''Same as run() for callers already running on the pool's loop'''
+        if not url.startswith('http'):
+            url = 'https://' + url
+        timeout = timeout or self.page_timeout
+        block_resources = self.block_resources if block_resources is None else block_resources
+
+        async with self._semaphore:
+            slot = await self._acquire_slot()
+            context = None
+            try:
+                context = await slot.browser.new_context(user_agent=self.user_agent)
+                if block_resources:
+                    await context.route('**/*', self._block_heavy_resources)
+                if init_script:
+                    await context.add_init_script(script=init_script)
+
+                page = await context.new_page()
+                page.set_default_timeout(timeout * 1000)
+                await page.goto(url, wait_until=wait_until or self.wait_until)
+                result = await page_fn(page)
+                self._count('rendered')
+                return result
+
+            except Exception as e:
+                self._count('timeouts' if 'Timeout' in type(e).__name__ else 'failed')
+                logger.warning(f"Failed to render {url}: {e}")
+                return None
+
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.debug(f"Failed to close browser context: {e}")
+                await self._release_slot(slot)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['browsers'] = len(self._slots)
+        stats['active_pages'] = sum(slot.active for slot in self._slots)
+        return stats
+
+    def close(self):
+        if not self._started:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    ###############################################################################
+    # HELPER METHODS (run on the pool's loop)
+    ###############################################################################
+
+    async def _start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._launch_lock = asyncio.Lock()
+        self._playwright = await async_playwright().start()
+        for _ in range(self.browsers):
+            self._launching += 1
+            await self._add_browser()
+        if not self._slots:
+            logger.error("Render pool started without a browser, the next render tries to launch one")
+
+    async def _launch(self) -> _BrowserSlot:
+        browser = await self._playwright.chromium.launch(args=self.launch_args)
+        slot = _BrowserSlot(browser)
+        browser.on('disconnected', lambda _: self._on_disconnected(slot))
+        return slot
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        if not self._slots:
+            # every browser crashed or failed to launch: the first page relaunches one,
+            # the ones behind it wait on that launch instead of starting their own
+            async with self._launch_lock:
+                if not self._slots:
+                    if self._launch_backing_off():
+                        raise BrowserUnavailable('No browser is running, the last launch failed')
+                    self._launching += 1
+                    if not await self._add_browser():
+                        raise BrowserUnavailable('No browser is running and relaunching one failed')
+        elif self._running() + self._launching < self.browsers and not self._launch_backing_off():
+            # a browser was lost, the pool gets back to size without holding up this page
+            self._replace_browser()
+
+        # least busy browser that isn't draining for a recycle (all of them are only while
+        # a replacement is still launching)
+        candidates = [s for s in self._slots if not s.retiring] or self._slots
+        slot = min(candidates, key=lambda s: s.active)
+        slot.active += 1
+        slot.rendered += 1
+
+        if slot.rendered >= self.recycle_after and not slot.retiring:
+            # this page is the last one, launch the replacement in the background so
+            # neither this page nor the next ones wait on it
+            slot.retiring = True
+            self._replace_browser()
+            self._count('recycled')
+        return slot
+
+    def _replace_browser(self):
+        self._launching += 1
+        asyncio.ensure_future(self._add_browser())
+
+    async def _add_browser(self) -> bool:
+        '''Launches a browser into the pool, callers count it in _launching first'''
+        try:
+            self._slots.append(await self._launch())
+            self._launch_failed_at = None
+            return True
+        except Exception as e:
+            self._launch_failed_at = asyncio.get_running_loop().time()
+            self._count('launch_failed')
+            logger.error(f"Failed to launch a browser: {e}")
+            return False
+        finally:
+            self._launching -= 1
+
+    def _launch_backing_off(self) -> bool:
+        return (self._launch_failed_at is not None
+                and asyncio.get_running_loop().time() - self._launch_failed_at < RELAUNCH_BACKOFF)
+
+    def _running(self) -> int:
+        return sum(1 for slot in self._slots if not slot.retiring)
+
+    def _on_disconnected(self, slot: _BrowserSlot):
+        # recycled browsers leave _slots before they are closed
+        if self._closing or slot not in self._slots:
+            return
+        self._slots.remove(slot)
+        self._count('crashed')
+        logger.warning(f"Browser disconnected with {slot.active} page(s) open, launching a replacement")
+        # a retiring browser's replacement is already launching
+        if not slot.retiring:
+            self._replace_browser()
+
+    async def _release_slot(self, slot: _BrowserSlot):
+        slot.active -= 1
+        if slot.retiring and slot.active == 0 and slot in self._slots:
+            self._slots.remove(slot)
+            try:
+                await slot.browser.close()
+            except Exception as e:
+                logger.debug(f"Failed to close recycled browser: {e}")
+
+    async def _block_heavy_resources(self, route: Route):
+        if route.request.resource_type in BLOCKED_RESOURCES:
+            self._count('blocked_requests')
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _close(self):
+        self._closing = True
+        for slot in self._slots:
+            try:
+                await slot.browser.close()
+            except Exception as e:
+                logger.debug(f"Failed to close browser: {e}")
+        self._slots = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+
+async def _page_html(page: Page) -> str:
+    return await page.content()
+
+
+async def capture_page_once(url: str) -> Optional[str]:
+    '''
+    Old capture path: a brand new browser per url. Kept for the render bench
+    '''
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        try:
+            page = await browser.new_page()
+            await page.goto(url, wait_until="networkidle")
+            return await page.content()
+        finally:
+            await browser.close()
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import text
+
+from core.metrics import metrics
+from classes.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+Summary = tuple[str, list[str]]
+
+
+def input_hash(summary_input: str) -> str:
+    '''sha256 of the normalized summary input, casefolded (it doesn't change the summary)'''
+    return hashlib.sha256(normalize_text(summary_input).casefold().encode('utf-8')).hexdigest()
+
+
+class PostgresSummaryStore:
+    '''
+    Persistent tier: the `summary_cache` table. Rows are keyed by (input_hash,
+    prompt_version) and expire after ttl_days, expired rows are deleted every
+    prune_every writes
+    '''
+
+    GET_SQL = text(
+        "SELECT summary, categories FROM summary_cache "
+        "WHERE input_hash = :input_hash AND prompt_version = :prompt_version AND expires_at > now()"
+    )
+    PUT_SQL = text(
+        "INSERT INTO summary_cache (input_hash, prompt_version, summary, categories, expires_at) "
+        "VALUES (:input_hash, :prompt_version, :summary, CAST(:categories AS jsonb), "
+        "now() + make_interval(days => :ttl_days)) "
+        "ON CONFLICT (input_hash, prompt_version) DO UPDATE SET "
+        "summary = EXCLUDED.summary, categories = EXCLUDED.categories, "
+        "created_at = now(), expires_at = EXCLUDED.expires_at"
+    )
+    PRUNE_SQL = text("DELETE FROM summary_cache WHERE expires_at <= now()")
+
+    def __init__(self, engine, ttl_days: int = 30, prune_every: int = 1000):
+        self.engine = engine
+        self.ttl_days = ttl_days
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, prompt_version: str) -> Optional[Summary]:
+        with self.engine.connect() as conn:
+            row = conn.execute(self.GET_SQL, {'input_hash': key, 'prompt_version': prompt_version}).first()
+        if row is None:
+            return None
+        categories = row[1] if isinstance(row[1], list) else json.loads(row[1] or '[]')
+        return row[0], categories
+
+    def put(self, key: str, prompt_version: str, summary: str, categories: list[str]):
+        with self.engine.begin() as conn:
+            conn.execute(self.PUT_SQL, {
+                'input_hash': key,
+                'prompt_version': prompt_version,
+                'summary': summary,
+                'categories': json.dumps(categories),
+                'ttl_days': self.ttl_days,
+            })
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes >= self.prune_every
+            if prune:
+                self._writes = 0
+        if prune:
+            with self.engine.begin() as conn:
+                conn.execute(self.PRUNE_SQL)
+
+
+class SummaryCache:
+    '''
+    LLM summaries (summary, categories) keyed by the normalized page content and the
+    prompt version, so the same page is summarized once per prompt. A new model, prompt
+    or SUMMARY_CACHE_VERSION gives a new prompt_version and the old rows simply stop
+    matching. Store errors are logged and treated as misses
+    '''
+
+    def __init__(self, prompt_version: str, store: Optional[PostgresSummaryStore] = None, max_entries: int = 2000):
+        self.prompt_version = prompt_version
+        self.store = store
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'store_hits': 0, 'misses': 0}
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def get(self, summary_input: str) -> Optional[Summary]:
+        if not summary_input or not summary_input.strip():
+            return None
+        key = input_hash(summary_input)
+
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+        if cached is not None:
+            metrics.incr('summary_cache.memory_hits')
+            return cached
+
+        if self.store is not None:
+            try:
+                cached = self.store.get(key, self.prompt_version)
+            except Exception as e:
+                logger.warning(f"Summary cache store read failed: {e}")
+        if cached is not None:
+            self._remember(key, cached)
+            with self._lock:
+                self._stats['store_hits'] += 1
+            metrics.incr('summary_cache.store_hits')
+            return cached
+
+        with self._lock:
+            self._stats['misses'] += 1
+        metrics.incr('summary_cache.misses')
+        return None
+
+    def put(self, summary_input: str, summary: str, categories: list[str]):
+        if not summary_input or not summary_input.strip() or not summary:
+            return
+        key = input_hash(summary_input)
+        self._remember(key, (summary, list(categories)))
+        if self.store is not None:
+            try:
+                self.store.put(key, self.prompt_version, summary, list(categories))
+            except Exception as e:
+                logger.warning(f"Summary cache store write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['store_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['store_hits']) / lookups, 4) if lookups else 0.0
+        stats['prompt_version'] = self.prompt_version
+        return stats
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _remember(self, key: str, value: Summary):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    '''
+    Process wide counters and timings, cheap enough to record on every message.
+    snapshot() is what gets logged / exposed
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timings = defaultdict(lambda: [0, 0.0, 0.0])  # count, total, max
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timing = self._timings[name]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: str = '') -> dict:
+        with self._lock:
+            counters = {k: v for k, v in self._counters.items() if k.startswith(prefix)}
+            timings = {
+                k: {
+                    'count': count,
+                    'avg_ms': round(total / count * 1000, 2) if count else 0.0,
+                    'max_ms': round(peak * 1000, 2),
+                }
+                for k, (count, total, peak) in self._timings.items() if k.startswith(prefix)
+            }
+        return {'counters': counters, 'timings': timings}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+metrics = Metrics()
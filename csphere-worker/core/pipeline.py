@@ -0,0 +1,219 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Sentinel pushed through a stage queue to stop one of its worker threads
+_STOP = object()
+
+
+class StageStats:
+    '''
+    Running counters for a single stage. Updated from the stage's worker
+    threads so every write goes through the lock.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, elapsed: float, outcome: str):
+        with self._lock:
+            if outcome == 'failed':
+                self.failed += 1
+            elif outcome == 'dropped':
+                self.dropped += 1
+            else:
+                self.processed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            handled = self.processed + self.failed + self.dropped
+            return {
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'avg_ms': round((self.total_seconds / handled) * 1000, 2) if handled else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 2),
+            }
+
+
+class Stage:
+    '''
+    One step of the pipeline.
+
+    :param name: label used in logs and stats
+    :param handler: callable taking a job and returning the job for the next stage,
+        or None when the job needs no further stages. Must be a module level function
+        when use_processes is set
+    :param workers: number of threads (or processes) running the handler
+    :param queue_size: bound of the input queue; a full queue blocks the previous stage
+    :param use_processes: run the handler in a process pool (CPU bound work)
+    '''
+
+    def __init__(self, name: str, handler: Callable[[dict], Optional[dict]], workers: int = 1,
+                 queue_size: int = 16, use_processes: bool = False):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.use_processes = use_processes
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._threads: list[threading.Thread] = []
+
+    def run_handler(self, job: dict) -> Optional[dict]:
+        if self._executor is not None:
+            return self._executor.submit(self.handler, job).result()
+        return self.handler(job)
+
+
+class StagedPipeline:
+    '''
+    Runs jobs through a chain of stages connected by bounded queues.
+
+    Every stage has its own pool so slow I/O (LLM, S3, archiving) overlaps with
+    CPU work (HTML parsing) across many in-flight jobs. When a stage falls behind
+    its input queue fills up, the previous stage blocks on put and that pressure
+    travels back to submit(), which is where intake slows down.
+    '''
+
+    def __init__(self, stages: list[Stage],
+                 on_complete: Optional[Callable[[dict], None]] = None,
+                 on_error: Optional[Callable[[str, dict, Exception], None]] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.stages = stages
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self._started = False
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def start(self):
+        if self._started:
+            return
+
+        for index, stage in enumerate(self.stages):
+            if stage.use_processes:
+                stage._executor = ProcessPoolExecutor(max_workers=stage.workers)
+
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for worker_num in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_stage,
+                    args=(stage, next_stage),
+                    name=f"pipeline-{stage.name}-{worker_num}",
+                    daemon=True,
+                )
+                thread.start()
+                stage._threads.append(thread)
+
+        self._started = True
+        logger.info(f"Pipeline started with stages: {[(s.name, s.workers) for s in self.stages]}")
+
+    def submit(self, job: dict, timeout: Optional[float] = None) -> bool:
+        '''
+        Hands a job to the first stage. Blocks while that stage is full so the
+        caller stops pulling new work; returns False if the timeout ran out.
+        '''
+        if not self._started:
+            raise RuntimeError("Pipeline has not been started")
+        try:
+            self.stages[0].queue.put(job, timeout=timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def join(self):
+        '''Waits until every submitted job has left the last stage.'''
+        for stage in self.stages:
+            stage.queue.join()
+
+    def shutdown(self, wait: bool = True):
+        if not self._started:
+            return
+        if wait:
+            self.join()
+
+        for stage in self.stages:
+            for _ in stage._threads:
+                stage.queue.put(_STOP)
+            for thread in stage._threads:
+                thread.join()
+            stage._threads = []
+            if stage._executor is not None:
+                stage._executor.shutdown(wait=wait)
+                stage._executor = None
+
+        self._started = False
+
+    def in_flight(self) -> int:
+        return sum(stage.queue.unfinished_tasks for stage in self.stages)
+
+    def stats(self) -> dict:
+        return {
+            stage.name: {**stage.stats.snapshot(), 'queued': stage.queue.qsize()}
+            for stage in self.stages
+        }
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _run_stage(self, stage: Stage, next_stage: Optional[Stage]):
+        while True:
+            job = stage.queue.get()
+            if job is _STOP:
+                stage.queue.task_done()
+                return
+
+            start = time.perf_counter()
+            try:
+                result = stage.run_handler(job)
+            except Exception as e:
+                stage.stats.record(time.perf_counter() - start, 'failed')
+                metrics.incr(f'stage.{stage.name}.failed')
+                logger.error(f"Stage {stage.name} failed: {e}", exc_info=True)
+                try:
+                    if self.on_error:
+                        self.on_error(stage.name, job, e)
+                except Exception as callback_error:
+                    logger.error(f"Error callback after stage {stage.name} failed: {callback_error}")
+                finally:
+                    stage.queue.task_done()
+                continue
+
+            elapsed = time.perf_counter() - start
+            stage.stats.record(elapsed, 'dropped' if result is None else 'processed')
+            metrics.observe(f'stage.{stage.name}', elapsed)
+
+            try:
+                if result is not None and next_stage is not None:
+                    # Blocks while the next stage is full (backpressure)
+                    next_stage.queue.put(result)
+                elif self.on_complete:
+                    self.on_complete(result if result is not None else job)
+            except Exception as e:
+                logger.error(f"Completion callback after stage {stage.name} failed: {e}", exc_info=True)
+            finally:
+                stage.queue.task_done()
@@ -0,0 +1,309 @@
+import logging
+import threading
+from functools import lru_cache
+
+import boto3
+import httpx
+from botocore.config import Config
+from openai import OpenAI
+
+from core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    '''
+    Process wide clients and processors.
+
+    API clients keep their connection pools for the life of the worker so messages
+    reuse warm TLS connections. Processors hold no per-message state, every call
+    gets the message's own db session instead.
+    '''
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+        )
+        timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=10.0)
+        self.openai_http = httpx.Client(limits=limits, timeout=timeout)
+        self.openrouter_http = httpx.Client(limits=limits, timeout=timeout)
+
+        self.openai_client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=self.openai_http,
+        )
+        self.openrouter_client = OpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=settings.OPENROUTER_API_KEY,
+            http_client=self.openrouter_http,
+        )
+
+        # boto3 clients are thread safe, size the pool for the pipeline's archive workers
+        self.s3_client = boto3.client(
+            "s3",
+            region_name="us-east-1",
+            aws_access_key_id=settings.AWS_ACCESS_KEY,
+            aws_secret_access_key=settings.AWS_SECRET_KEY,
+            config=Config(max_pool_connections=settings.HTTP_MAX_CONNECTIONS),
+        )
+
+        self.archive_store = self._build_archive_store(settings)
+        self.payload_store = self._build_payload_store(settings)
+        self.embedding_cache = self._build_embedding_cache(settings)
+        self.summary_cache = self._build_summary_cache(settings)
+        self.categorizer = self._build_categorizer(settings)
+        self.category_registry = self._build_category_registry()
+        self.folder_matchers = self._build_folder_matchers(settings)
+
+        self._processors = None
+        self._render_pool = None
+        self._archiver = None
+        self._archive_pipeline = None
+        self._embedding_batcher = None
+        # guards the lazily built members below, the first messages arrive on several threads at once
+        self._init_lock = threading.Lock()
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def embedding_manager(self, db, content_url: str = ''):
+        '''Per-call manager bound to db, sharing the registry's API clients'''
+        from classes.EmbeddingManager import ContentEmbeddingManager
+
+        return ContentEmbeddingManager(
+            db=db,
+            content_url=content_url,
+            openai_client=self.openai_client,
+            openrouter_client=self.openrouter_client,
+            embedding_batcher=self.embedding_batcher,
+            embedding_cache=self.embedding_cache,
+            summary_cache=self.summary_cache,
+            categorizer=self.categorizer,
+            category_registry=self.category_registry,
+            embedding_dims=self.settings.EMBED_DIMENSIONS,
+            max_batch_size=self.settings.EMBED_MAX_BATCH_SIZE,
+            max_batch_tokens=self.settings.EMBED_MAX_BATCH_TOKENS,
+            link_iab_categories=self.settings.IAB_LINK_CATEGORIES,
+        )
+
+    @property
+    def embedding_batcher(self):
+        '''Coalesces single embedding calls made by concurrent messages into one request'''
+        with self._init_lock:
+            if self._embedding_batcher is None:
+                from classes.batching import MicroBatcher
+
+                settings = self.settings
+                self._embedding_batcher = MicroBatcher(
+                    self._embed_and_cache,
+                    max_batch_size=settings.EMBED_MAX_BATCH_SIZE,
+                    max_wait=settings.EMBED_BATCH_WAIT_MS / 1000,
+                    max_cost=settings.EMBED_MAX_BATCH_TOKENS,
+                    name='embedding-batcher',
+                )
+            return self._embedding_batcher
+
+    @property
+    def render_pool(self):
+        '''Warm browser pool, only started the first time a page needs rendering'''
+        with self._init_lock:
+            if self._render_pool is None:
+                from classes.render_pool import RenderPool
+
+                settings = self.settings
+                self._render_pool = RenderPool(
+                    browsers=settings.RENDER_BROWSERS,
+                    max_concurrency=settings.RENDER_MAX_CONCURRENCY,
+                    page_timeout=settings.RENDER_PAGE_TIMEOUT,
+                    block_resources=settings.RENDER_BLOCK_RESOURCES,
+                    recycle_after=settings.RENDER_RECYCLE_AFTER,
+                    wait_until=settings.RENDER_WAIT_UNTIL,
+                )
+            return self._render_pool
+
+    @property
+    def archiver(self):
+        '''SingleFile archiver sharing the render pool'''
+        render_pool = self.render_pool
+        with self._init_lock:
+            if self._archiver is None:
+                from classes.archiver import PageArchiver
+
+                self._archiver = PageArchiver(
+                    render_pool,
+                    bundle_path=self.settings.SINGLEFILE_BUNDLE_PATH,
+                    max_concurrency=self.settings.ARCHIVE_MAX_CONCURRENCY,
+                    page_timeout=self.settings.ARCHIVE_PAGE_TIMEOUT,
+                )
+            return self._archiver
+
+    @property
+    def archive_pipeline(self):
+        '''Background archive queue + workers, started on first use'''
+        with self._init_lock:
+            if self._archive_pipeline is None:
+                from stages import build_archive_pipeline
+
+                self._archive_pipeline = build_archive_pipeline(self.settings)
+                self._archive_pipeline.start()
+            return self._archive_pipeline
+
+    def processor(self, task_type: str):
+        with self._init_lock:
+            if self._processors is None:
+                # imported here, the processors import the registry back
+                from processors.content import ContentProcessor
+                from processors.bucket import BucketProcessor
+                from processors.web import WebParsingProcessor
+                from processors.batch import BatchProcessor
+                from processors.rebucket import RebucketProcessor
+
+                self._processors = {
+                    'process_message': ContentProcessor(self),
+                    'process_folder': BucketProcessor(self),
+                    'process_webpage': WebParsingProcessor(self),
+                    'process_batch': BatchProcessor(self, max_workers=self.settings.BATCH_CONCURRENCY),
+                    'process_rebucket': RebucketProcessor(self, chunk_size=self.settings.REBUCKET_CHUNK_SIZE),
+                }
+            return self._processors.get(task_type)
+
+    def pool_stats(self) -> dict:
+        '''Connection pool usage for the database and the shared http clients'''
+        from database import engine
+
+        pool = engine.pool
+        return {
+            'db': {
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            },
+            'openai': _http_pool_stats(self.openai_http),
+            'openrouter': _http_pool_stats(self.openrouter_http),
+            's3': {'max_pool_connections': self.s3_client.meta.config.max_pool_connections},
+            'render': self._render_pool.stats() if self._render_pool else None,
+            'archive': self._archive_pipeline.stats() if self._archive_pipeline else None,
+            'embedding_batcher': self._embedding_batcher.stats() if self._embedding_batcher else None,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache else None,
+            'summary_cache': self.summary_cache.stats() if self.summary_cache else None,
+        }
+
+    def _embed_and_cache(self, texts: list[str]) -> list:
+        from classes.EmbeddingManager import embed_texts
+
+        model = 'text-embedding-3-small'
+        vectors = embed_texts(self.openai_client, model, texts,
+                              max_batch_size=self.settings.EMBED_MAX_BATCH_SIZE, max_tokens=self.settings.EMBED_MAX_BATCH_TOKENS)
+        if self.embedding_cache is not None:
+            self.embedding_cache.put_many(model, self.settings.EMBED_DIMENSIONS, texts, vectors)
+        return vectors
+
+    def _build_embedding_cache(self, settings: Settings):
+        if not settings.EMBED_CACHE_ENABLED:
+            return None
+        from classes.embedding_cache import EmbeddingCache, PostgresEmbeddingStore
+
+        store = None
+        if settings.EMBED_CACHE_STORE == 'postgres':
+            from database import engine
+            store = PostgresEmbeddingStore(
+                engine, max_rows=settings.EMBED_CACHE_MAX_ROWS, touch_after=settings.EMBED_CACHE_TOUCH_AFTER,
+            )
+        return EmbeddingCache(store=store, max_entries=settings.EMBED_CACHE_MAX_ENTRIES)
+
+    def _build_summary_cache(self, settings: Settings):
+        if not settings.SUMMARY_CACHE_ENABLED:
+            return None
+        from classes.EmbeddingManager import summary_prompt_version
+        from classes.summary_cache import SummaryCache, PostgresSummaryStore
+
+        store = None
+        if settings.SUMMARY_CACHE_STORE == 'postgres':
+            from database import engine
+            store = PostgresSummaryStore(engine, ttl_days=settings.SUMMARY_CACHE_TTL_DAYS)
+        return SummaryCache(
+            summary_prompt_version(settings.SUMMARY_CACHE_VERSION),
+            store=store,
+            max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+        )
+
+    def _build_category_registry(self):
+        from classes.category_registry import CategoryRegistry
+        from database import engine
+
+        return CategoryRegistry(engine)
+
+    def _build_folder_matchers(self, settings: Settings):
+        from classes.folder_matcher import FolderMatcherCache
+
+        return FolderMatcherCache(max_users=settings.FOLDER_MATCHER_MAX_USERS, max_age=settings.FOLDER_MATCHER_MAX_AGE)
+
+    def _build_categorizer(self, settings: Settings):
+        # None leaves the manager on the Solr categorizer
+        if settings.CATEGORIZER_BACKEND != 'centroid':
+            return None
+        from classes.iab_centroids import CentroidIndex, CentroidCategorizer
+
+        model = 'text-embedding-3-small'
+        return CentroidCategorizer(
+            lambda: CentroidIndex.load_or_build(settings.IAB_CENTROIDS_PATH, self._embed_and_cache, model=model),
+            self._embed_one,
+            cutoff=settings.IAB_CUTOFF,
+            top_k=settings.IAB_TOP_K,
+        )
+
+    def _embed_one(self, text: str):
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get_many('text-embedding-3-small', self.settings.EMBED_DIMENSIONS, [text])[0]
+            if cached is not None:
+                return cached
+        return self.embedding_batcher.submit(text)
+
+    def _build_payload_store(self, settings: Settings):
+        from classes.payload_store import LocalPayloadStore, S3PayloadStore
+
+        if settings.PAYLOAD_STORE == 'local':
+            return LocalPayloadStore(settings.PAYLOAD_LOCAL_DIR, level=settings.PAYLOAD_ZSTD_LEVEL)
+        if settings.PAYLOAD_STORE == 's3':
+            return S3PayloadStore(self.s3_client, settings.BUCKET_NAME, level=settings.PAYLOAD_ZSTD_LEVEL)
+        raise ValueError(f"Unknown PAYLOAD_STORE: {settings.PAYLOAD_STORE}")
+
+    def _build_archive_store(self, settings: Settings):
+        from classes.archive_store import LocalArchiveStore, S3ArchiveStore
+
+        if settings.ARCHIVE_STORE == 'local':
+            return LocalArchiveStore(settings.ARCHIVE_LOCAL_DIR, encoding=settings.ARCHIVE_ENCODING)
+        if settings.ARCHIVE_STORE == 's3':
+            return S3ArchiveStore(self.s3_client, settings.BUCKET_NAME, encoding=settings.ARCHIVE_ENCODING)
+        raise ValueError(f"Unknown ARCHIVE_STORE: {settings.ARCHIVE_STORE}")
+
+    def close(self):
+        if self._archive_pipeline is not None:
+            # let queued snapshots finish before the browsers go away
+            self._archive_pipeline.shutdown(wait=True)
+        if self._embedding_batcher is not None:
+            self._embedding_batcher.close()
+        self.openai_http.close()
+        self.openrouter_http.close()
+        if self._render_pool is not None:
+            self._render_pool.close()
+
+
+def _http_pool_stats(client: httpx.Client) -> dict:
+    # httpx doesn't expose pool counters, read them off the httpcore pool
+    pool = getattr(client._transport, '_pool', None)
+    connections = list(getattr(pool, 'connections', []))
+    return {
+        'connections': len(connections),
+        'idle': sum(1 for conn in connections if conn.is_idle()),
+    }
+
+
+@lru_cache()
+def get_services() -> ServiceRegistry:
+    return ServiceRegistry(get_settings())
@@ -14,18 +14,136 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str
 
-    ACTIVEMQ_URL: str
-    ACTIVEMQ_QUEUE: str
-    ACTIVEMQ_USER: str
-    ACTIVEMQ_PASS: str
+    # 'activemq' (REST) or 'postgres' (job_queue table, FOR UPDATE SKIP LOCKED)
+    QUEUE_BACKEND: str = 'activemq'
+    QUEUE_NAME: str = 'csphere'
+    # Seconds a claimed postgres job stays hidden before another worker may claim it again
+    QUEUE_VISIBILITY_TIMEOUT: float = 300
+    QUEUE_MAX_ATTEMPTS: int = 5
+
+    # Priority lanes: bulk imports go to their own queue, leave it empty to use a single lane
+    QUEUE_BULK_NAME: str = 'csphere.bulk'
+    # Interactive batches taken in a row before waiting bulk work gets a turn
+    QUEUE_INTERACTIVE_WEIGHT: int = 4
+    QUEUE_BULK_USER_MAX_IN_FLIGHT: int = 2
+    # Bulk messages claimed ahead and held for users at their cap, and seconds one is held
+    # before it goes back to the queue (under QUEUE_VISIBILITY_TIMEOUT). Postgres only,
+    # ActiveMQ consumes a message on claim and is never held
+    QUEUE_BULK_MAX_HELD: int = 50
+    QUEUE_BULK_HOLD_TIMEOUT: float = 120
+
+    ACTIVEMQ_URL: str = ''
+    ACTIVEMQ_BULK_QUEUE: str = ''
+    ACTIVEMQ_QUEUE: str = ''
+    ACTIVEMQ_USER: str = ''
+    ACTIVEMQ_PASS: str = ''
+    # Server side wait for a message (long-poll) and how many messages to drain per batch
+    ACTIVEMQ_READ_TIMEOUT_MS: int = 10000
+    ACTIVEMQ_BATCH_SIZE: int = 10
+    # Client side backoff ceiling (seconds), only applied after polling errors
+    ACTIVEMQ_MAX_BACKOFF: float = 30.0
 
     
     AWS_ACCESS_KEY: str
     AWS_SECRET_KEY: str
     BUCKET_NAME: str
 
+    # Shared OpenAI / OpenRouter / S3 connection pools (core/services.py)
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE: int = 10
+    HTTP_TIMEOUT: float = 60.0
+
+    # Embeddings: inputs and (estimated) tokens per request, and how long a single
+    # embedding waits for concurrent ones to share its request
+    EMBED_MAX_BATCH_SIZE: int = 256
+    EMBED_MAX_BATCH_TOKENS: int = 100_000
+    EMBED_BATCH_WAIT_MS: float = 5.0
+    # text-embedding-3-small, part of the embedding cache key
+    EMBED_DIMENSIONS: int = 1536
+
+    # Embedding cache: in-process LRU in front of the embedding_cache table ('postgres'),
+    # or memory only ('none'). The table is created by the backend's migrations
+    EMBED_CACHE_ENABLED: bool = True
+    EMBED_CACHE_STORE: str = 'postgres'
+    EMBED_CACHE_MAX_ENTRIES: int = 10_000
+    EMBED_CACHE_MAX_ROWS: int = 500_000
+    # reads refresh a row's last_used_at at most once per this many seconds
+    EMBED_CACHE_TOUCH_AFTER: int = 3600
+
+    # Summary cache: LLM summaries keyed by the normalized page content and a hash of the
+    # model / prompt. Bump SUMMARY_CACHE_VERSION to drop every cached summary at once
+    SUMMARY_CACHE_ENABLED: bool = True
+    SUMMARY_CACHE_STORE: str = 'postgres'
+    SUMMARY_CACHE_VERSION: str = '1'
+    SUMMARY_CACHE_TTL_DAYS: int = 30
+    SUMMARY_CACHE_MAX_ENTRIES: int = 2000
+
+    # IAB categories: 'centroid' scores the summary embedding against precomputed
+    # category centroids in process (built on first use and saved to IAB_CENTROIDS_PATH),
+    # 'solr' keeps the remote Solr round trips
+    CATEGORIZER_BACKEND: str = 'centroid'
+    IAB_CENTROIDS_PATH: str = 'iab_centroids.npz'
+    IAB_CUTOFF: float = 0.3
+    IAB_TOP_K: int = 3
+    # Link the centroid categorizer's IAB tier 2 labels to saved content instead of the
+    # LLM's categories. Off keeps the app's categories, ignored with the Solr backend
+    IAB_LINK_CATEGORIES: bool = False
+
+    # users whose compiled folder matcher (url patterns, keywords, descriptions) is kept,
+    # and how long one is used before its folders are checked for changes again
+    FOLDER_MATCHER_MAX_USERS: int = 1000
+    FOLDER_MATCHER_MAX_AGE: float = 5.0
+
+    # Warm browser pool used to render pages that arrive without html (classes/render_pool.py)
+    RENDER_BROWSERS: int = 2
+    RENDER_MAX_CONCURRENCY: int = 8
+    RENDER_PAGE_TIMEOUT: float = 30.0
+    RENDER_RECYCLE_AFTER: int = 200
+    RENDER_BLOCK_RESOURCES: bool = True
+    RENDER_WAIT_UNTIL: str = 'domcontentloaded'
+
+    # SingleFile snapshots run in the render pool. Point this at single-file-bundle.js
+    # (node_modules/single-file-cli/lib/), left empty the usual npm install locations are
+    # tried. Without a bundle every capture runs `npx single-file-cli` (archive.cli_fallback)
+    SINGLEFILE_BUNDLE_PATH: str = ''
+    ARCHIVE_MAX_CONCURRENCY: int = 4
+    ARCHIVE_PAGE_TIMEOUT: float = 60.0
+
+    # Where snapshots are stored ('s3' or 'local') and how they are compressed ('gzip', 'br', 'identity')
+    ARCHIVE_STORE: str = 's3'
+    ARCHIVE_LOCAL_DIR: str = 'archive_store'
+    ARCHIVE_ENCODING: str = 'gzip'
+
+    # Claim check: html over PAYLOAD_OFFLOAD_BYTES travels as a reference to a zstd blob
+    # in the payload store ('s3' or 'local', same layout as the backend's)
+    PAYLOAD_STORE: str = 's3'
+    PAYLOAD_LOCAL_DIR: str = 'payload_store'
+    PAYLOAD_OFFLOAD_BYTES: int = 64 * 1024
+    PAYLOAD_ZSTD_LEVEL: int = 3
+
+    # Archive freshness: snapshots younger than this are reused as is, older ones are
+    # revalidated with a conditional HEAD (ETag / Last-Modified) before re-capturing
+    ARCHIVE_MAX_AGE_HOURS: float = 24 * 7
+    ARCHIVE_REVALIDATE: bool = True
+    ARCHIVE_HEAD_TIMEOUT: float = 5.0
+
+    # Bookmark import chunks: pages rendered and summarized at the same time per chunk
+    BATCH_CONCURRENCY: int = 8
 
+    # Library re-bucketing: bookmarks scored against the user's folders per chunk
+    REBUCKET_CHUNK_SIZE: int = 2000
 
+    # 'sequential' handles one message at a time, 'pipeline' runs the staged pipeline
+    WORKER_MODE: str = 'sequential'
+    PIPELINE_QUEUE_SIZE: int = 16
+    PIPELINE_CREATE_WORKERS: int = 2
+    PIPELINE_FETCH_WORKERS: int = 4
+    PIPELINE_PARSE_WORKERS: int = 2
+    PIPELINE_ENRICH_WORKERS: int = 8
+    PIPELINE_BUCKET_WORKERS: int = 2
+    # Archiving has its own queue and workers in both modes
+    PIPELINE_ARCHIVE_WORKERS: int = 2
+    ARCHIVE_QUEUE_SIZE: int = 1000
 
 
 
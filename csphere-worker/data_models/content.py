@@ -19,6 +19,10 @@ class Content(Base):
     source = Column(String, nullable=True)
     first_saved_at = Column(TIMESTAMP(timezone=True), default=func.now())
     html_content_url = Column(String, nullable=True)
+    # archive freshness: when the snapshot was taken/revalidated and the page's validators
+    html_archived_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    html_etag = Column(String, nullable=True)
+    html_last_modified = Column(String, nullable=True)
     content_ai = relationship("ContentAI", backref="content", uselist=False)
     
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, Integer, BigInteger, TIMESTAMP, Text, Index
+from sqlalchemy.sql import func
+
+from database import Base
+
+
+class QueueJob(Base):
+    __tablename__ = "job_queue"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    queue_name = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    available_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_job_queue_claim", "queue_name", "available_at", "id"),
+    )
@@ -1,4 +1,5 @@
 import os
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
@@ -35,4 +36,15 @@ def get_db():
     finally:
         db.close()
 
-from data_models import content, content_ai, content_item, user, folder, folder_item
+
+@contextmanager
+def get_db_connection():
+    '''Session scoped to one unit of work (a message or a pipeline stage)'''
+    db = SessionLocal()
+    try:
+        yield db
+
+    finally:
+        db.close()
+
+from data_models import content, content_ai, content_item, user, folder, folder_item, folder_suggestion
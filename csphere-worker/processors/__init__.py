@@ -1,28 +1,26 @@
 from .content import ContentProcessor
 from .bucket import BucketProcessor
 from .web import WebParsingProcessor
-from sqlalchemy.orm import Session
+from .batch import BatchProcessor
+from .rebucket import RebucketProcessor
+from core.services import get_services
 
 
 
 
 
-def get_processor(task_type: str, db : Session):
+def get_processor(task_type: str):
     '''
-    Returns the processor based on task_type
+    Returns the process wide processor based on task_type. Processors are stateless,
+    pass the message's db session to process()
     Possible task_types to input:
         process_message
         process_folder
         process_webpage
+        process_batch
+        process_rebucket
     
     :param task_type: processor key name you want
     :type task_type: str
     '''
-
-    PROCESSOR_MAP ={
-        'process_message': ContentProcessor(db=db),
-        'process_folder' : BucketProcessor(db=db),
-        'process_webpage' : WebParsingProcessor(db=db)
-
-    }
-    return PROCESSOR_MAP.get(task_type)
\ No newline at end of file
+    return get_services().processor(task_type)
@@ -4,10 +4,9 @@ from database import get_db
 import logging
 from data_models.content import Content
 from utils.utils import handle_existing_content
-from classes.EmbeddingManager import ContentEmbeddingManager
 
-import asyncio
-from playwright.async_api import async_playwright
+from core.services import get_services
+from classes.payload_store import stream_blob
 
 import requests
 logger = logging.getLogger(__name__)
@@ -15,9 +14,9 @@ logger = logging.getLogger(__name__)
 
 class BaseProcessor(ABC):
 
-    def __init__(self, db : Session):
-        self.db = db
-        self.embedding_manager = ContentEmbeddingManager(self.db)
+    def __init__(self, services):
+        # Long-lived (one per process), keep per-message state out of self
+        self.services = services
 
 
     @abstractmethod
@@ -39,25 +38,38 @@ class BaseProcessor(ABC):
     
 
 
-    async def capture_page(self, url):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-
-            print(f"Archiving: {url}...")
-            
-            # Go to the URL and wait until the network is idle
-            await page.goto(url, wait_until="networkidle")
+    @staticmethod
+    def capture_page(url: str) -> str | None:
+        '''
+        Renders the page in the shared browser pool and returns the raw html,
+        None when the page could not be loaded
+        '''
+        from classes.render_pool import BrowserUnavailable
 
-            text_content = await page.content() # Raw HTML
-            # visible_text = await page.inner_text("body")
+        logger.info(f"Rendering: {url}...")
+        try:
+            return get_services().render_pool.render(url)
+        except BrowserUnavailable as e:
+            logger.error(f"Can't render {url}: {e}")
+            return None
 
 
-            return text_content
-            
-   
+    @staticmethod
+    def raw_html_source(message: dict):
+        '''
+        The message's html: inline, or a lazy stream of the offloaded payload (nothing is
+        fetched until the parser reads it), None when the message has neither
+        '''
+        if message.get('raw_html'):
+            return message['raw_html']
+        # prefetched by the pipeline's fetch stage
+        if message.get('raw_html_blob'):
+            return stream_blob(message['raw_html_blob'])
+        ref = message.get('raw_html_ref')
+        if ref:
+            return get_services().payload_store.stream(ref)
+        return None
 
-      
 
     def get_html_content(self, url: str) -> str:
         try:
@@ -105,11 +117,11 @@ class BaseProcessor(ABC):
         
         return (user_id, notes, folder_id, raw_html, content_data, tag_ids)
     
-    def handle_if_exists(self, content_url: str, user_id: int, notes:str, folder_id: int, tag_ids: list[str]) -> str :
-        existing_content : Content = self.db.query(Content).filter(Content.url == content_url).first()
+    def handle_if_exists(self, db: Session, content_url: str, user_id: int, notes:str, folder_id: int, tag_ids: list[str]) -> str :
+        existing_content : Content = db.query(Content).filter(Content.url == content_url).first()
 
         if existing_content:
-            handle_existing_content(existing_content, user_id, self.db, notes, folder_id, tag_ids)
+            handle_existing_content(existing_content, user_id, db, notes, folder_id, tag_ids)
             logger.info("Bookmark succesfully saved to user")
             return existing_content.content_id
         
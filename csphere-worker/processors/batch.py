@@ -0,0 +1,230 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .base import BaseProcessor
+from core.metrics import metrics
+from classes.EmbeddingManager import build_summary_input
+from classes.iab_centroids import category_labels
+from data_models.content import Content
+from data_models.content_ai import ContentAI
+from data_models.content_item import ContentItem
+from schemas.content_schemas import BookmarkBatchSchema, MessageContentPayload
+
+logger = logging.getLogger(__name__)
+
+
+class BatchProcessor(BaseProcessor):
+    '''
+    Saves a chunk of imported bookmarks (a 'bookmark_batch' message) in one go instead
+    of one message per bookmark:
+        1. pages of the new urls are rendered (render pool) and summarized concurrently
+        2. all summaries are embedded together (embed_many)
+        3. content, content_item, content_ai and category links are written with set
+           based inserts, one transaction for the whole chunk
+    The saved content and the content the api already linked are then bucketed.
+    A bookmark whose page or summary fails is still saved, without ContentAI, the
+    same as the single message path. Existing content without ContentAI (a chunk
+    redelivered after a crash, a failed single save) is enriched along with the new
+    '''
+
+    def __init__(self, services, max_workers: int = 8):
+        super().__init__(services)
+        self.max_workers = max_workers
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def process(self, batch: BookmarkBatchSchema, db: Session) -> dict:
+        '''
+        Returns {'created': [...], 'linked': [...], 'failed': n}. created holds the new
+        content (content_id, url, title, embedding), linked the bookmarks that already
+        existed and were only saved for the user
+        '''
+        # the same url can only be saved once per chunk
+        bookmarks = list({bookmark.url: bookmark for bookmark in batch.bookmarks}.values())
+
+        existing = dict(
+            db.query(Content.url, Content.content_id)
+            .filter(Content.url.in_([bookmark.url for bookmark in bookmarks]))
+            .all()
+        ) if bookmarks else {}
+        # existing content that was never enriched is summarized like the new one
+        enriched_ids = {
+            row.content_id for row in
+            db.query(ContentAI.content_id).filter(ContentAI.content_id.in_(list(existing.values()))).all()
+        } if existing else set()
+        new_bookmarks = [
+            bookmark for bookmark in bookmarks
+            if bookmark.url not in existing or existing[bookmark.url] not in enriched_ids
+        ]
+
+        manager = self.services.embedding_manager(db)
+
+        with metrics.timed('batch.summarize'):
+            items = self._summarize_all(manager, new_bookmarks)
+
+        summarized = [item for item in items if item['summary']]
+        with metrics.timed('batch.embed'):
+            embeddings = manager.embed_many([item['summary'] for item in summarized])
+        for item, embedding in zip(summarized, embeddings):
+            item['embedding'] = embedding
+
+        try:
+            with metrics.timed('batch.write'):
+                saved_at = {bookmark.url: bookmark.first_saved_at for bookmark in bookmarks}
+                content_ids, created_urls = self._write(db, batch.user_id, items, existing, saved_at)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        created = [item for item in items if item['bookmark'].url in created_urls]
+        failed = sum(1 for item in created if item.get('embedding') is None)
+        metrics.incr('batch.bookmarks', len(bookmarks))
+        metrics.incr('batch.enrich_failed', failed)
+
+        return {
+            'created': [{
+                'content_id': str(content_ids[item['bookmark'].url]),
+                'url': item['bookmark'].url,
+                'title': item['title'],
+                'embedding': item.get('embedding'),
+            } for item in created],
+            'linked': [{
+                'content_id': str(content_ids[bookmark.url]),
+                'url': bookmark.url,
+                'title': bookmark.title,
+            } for bookmark in bookmarks if bookmark.url not in created_urls and bookmark.url in content_ids],
+            'failed': failed,
+        }
+
+    def batch_message(self, batch: BookmarkBatchSchema, content_payload: dict) -> dict:
+        '''Single message shape for one bookmark of the batch (what the bucket processor reads)'''
+        return {
+            'content_payload': content_payload,
+            'raw_html': '',
+            'user_id': batch.user_id,
+            'notes': '',
+            'folder_id': '',
+            'tag_ids': [],
+            'priority': batch.priority,
+            'enqueued_at': batch.enqueued_at.isoformat() if batch.enqueued_at else None,
+        }
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _summarize_all(self, manager, bookmarks: list[MessageContentPayload]) -> list[dict]:
+        if not bookmarks:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(bookmarks))) as executor:
+            return list(executor.map(lambda bookmark: self._summarize(manager, bookmark), bookmarks))
+
+    def _summarize(self, manager, bookmark: MessageContentPayload) -> dict:
+        item = {'bookmark': bookmark, 'title': bookmark.title, 'summary': None, 'categories': []}
+        try:
+            with metrics.timed('batch.fetch'):
+                raw_html = self.capture_page(bookmark.url)
+
+            summary_input, page_title = build_summary_input(bookmark.url, raw_html) if raw_html else (None, None)
+            if not item['title'] and page_title:
+                item['title'] = page_title
+
+            result = manager._summarize_content(summary_input or bookmark.title or bookmark.url)
+            if result:
+                item['summary'], item['categories'] = result
+        except Exception as e:
+            logger.warning(f"Failed to summarize {bookmark.url}, saving it without a summary: {e}")
+        return item
+
+    def _write(self, db: Session, user_id: str, items: list[dict], existing: dict, saved_at: dict) -> tuple[dict, set]:
+        '''
+        All inserts of the chunk, the caller commits. Returns ({url: content_id}, urls of
+        the content rows created here)
+        '''
+        content_ids = dict(existing)
+        created_urls = set()
+
+        rows = [{
+            'content_id': uuid4(),
+            'url': item['bookmark'].url,
+            'title': item['title'],
+            'source': item['bookmark'].source,
+            'first_saved_at': item['bookmark'].first_saved_at,
+        } for item in items if item['bookmark'].url not in existing]
+        if rows:
+            created = dict(db.execute(
+                insert(Content).values(rows)
+                .on_conflict_do_nothing(index_elements=['url'])
+                .returning(Content.url, Content.content_id)
+            ).all())
+            content_ids.update(created)
+            created_urls = set(created)
+
+            # saved by another message since the lookup: link to that row, its own save enriches it
+            raced = [row['url'] for row in rows if row['url'] not in created_urls]
+            if raced:
+                content_ids.update(dict(db.query(Content.url, Content.content_id).filter(Content.url.in_(raced)).all()))
+        # ContentAI for the rows created here and the existing ones that had none
+        items = [item for item in items if item['bookmark'].url in created_urls or item['bookmark'].url in existing]
+
+        if content_ids:
+            db.execute(
+                insert(ContentItem).values([{
+                    'user_id': user_id,
+                    'content_id': content_id,
+                    'saved_at': saved_at.get(url) or datetime.now(timezone.utc),
+                    'notes': '',
+                } for url, content_id in content_ids.items()])
+                .on_conflict_do_nothing(index_elements=['user_id', 'content_id'])
+            )
+
+        enriched = [item for item in items if item['summary'] and item.get('embedding') is not None]
+        if enriched:
+            db.execute(
+                insert(ContentAI).values([{
+                    'content_id': content_ids[item['bookmark'].url],
+                    'ai_summary': item['summary'],
+                    'embedding': item['embedding'],
+                } for item in enriched])
+                .on_conflict_do_nothing(index_elements=['content_id'])
+            )
+            self._link_categories(db, enriched, content_ids)
+
+        return content_ids, created_urls
+
+    def _link_categories(self, db: Session, items: list[dict], content_ids: dict):
+        '''
+        The LLM's categories, or with IAB_LINK_CATEGORIES the IAB labels scored with the
+        embeddings the chunk already has (the LLM's picks for items without any). Without
+        the centroid categorizer (CATEGORIZER_BACKEND=solr) the LLM's picks are kept, one
+        Solr round trip per bookmark would stall the chunk
+        '''
+        categorizer = self.services.categorizer if self.services.settings.IAB_LINK_CATEGORIES else None
+        self.services.category_registry.link(db, {
+            content_ids[item['bookmark'].url]: (
+                category_labels(categorizer.categorize(item['summary'], embedding=item['embedding'])) if categorizer else []
+            ) or item['categories']
+            for item in items
+        })
+
+
+def record_import_progress(db: Session, job_id: str, count: int):
+    '''Adds count to the job's processed bookmarks, the job completes once all are in'''
+    db.execute(
+        text(
+            "UPDATE background_job SET processed = processed + :count, "
+            "status = CASE WHEN processed + :count >= enqueued THEN 'completed' ELSE status END, "
+            "updated_at = now() WHERE job_id = :job_id"
+        ),
+        {'count': count, 'job_id': job_id},
+    )
+    db.commit()
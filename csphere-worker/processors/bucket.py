@@ -1,7 +1,5 @@
 import logging
 from uuid import uuid4
-import re
-import numpy as np
 from datetime import datetime, timezone
 from typing import List, Tuple, Optional
 
@@ -11,48 +9,58 @@ from data_models.content_item import ContentItem
 from data_models.folder_item import folder_item  
 from data_models.content_ai import ContentAI
 from data_models.folder import Folder
-from classes.EmbeddingManager import ContentEmbeddingManager
+from classes.folder_profile import add_to_folder_profile
+from classes.folder_matcher import VECTOR_WEIGHT, MATCH_THRESHOLD
 from exceptions.bucket_excpetions import FoldersNotFound, ItemExistInFolder, EmbeddingNotFound, ContentSummaryNotFound
 from schemas.folder_schemas import FolderBucketData
 from schemas.content_schemas import ContentPayload
 
 from sqlalchemy.orm import Session
 
-from rapidfuzz import fuzz
-
 # Using pgvector specific functions if available in your SQLAlchemy setup
 from sqlalchemy import func
 
 logger = logging.getLogger(__name__)
 
 class BucketProcessor(BaseProcessor):
-    def __init__(self, db : Session, content_embedding: list[float] = None):
-        super().__init__(db=db)
-        self.content_embedding = content_embedding
-        self.user_id = None
 
-    def process(self, message: dict, content_id: str) -> bool:
+    def process(self, message: dict, content_id: str, db: Session, content_embedding: list[float] = None) -> bool:
+        user_id = None
         try:
             # 1. Data Extraction & State Setup
             # We capture user_id to scope the Vector Search later
             user_id, notes, folder_id, raw_html, content_data, _ = self.extract_data(message=message)
-            self.user_id = user_id
+            content_url : str = content_data.get('url', '').lower()
+
+            # 1b. URL rules of every bucketing folder, decided before any vector work
+            matcher = self.services.folder_matchers.get(db, user_id)
+            if not matcher.folder_ids:
+                raise FoldersNotFound()
+
+            rule_folder_id = matcher.url_match(content_url)
+            if rule_folder_id:
+                logger.info(f"Content matched to folder by url rule: {rule_folder_id}")
+                self.assign_to_folder(db, content_data, rule_folder_id, content_id, user_id)
+                self.update_folder_learning(db, folder_id=rule_folder_id, content_id=content_id)
+                return True
 
             # 2. Embedding Retrieval
             # If embedding isn't passed in, fetch the pre-calculated one from ContentAI table
-            if self.content_embedding is None:
-                self.content_embedding = self._get_content_embedding(content_id=content_id)
+            if content_embedding is None:
+                content_embedding = self._get_content_embedding(db, content_id=content_id)
             
             # 3. Preparation for Matching
 
             #get the content summary 
-            content_summary : str = self._get_content_ai_summary(content_id=content_id)
+            content_summary : str = self._get_content_ai_summary(db, content_id=content_id)
             content_text : str = f"{content_data.get('title', '')} {notes or ''}{content_summary or ''}".lower()
-            content_url : str = content_data.get('url', '').lower()
 
             # 4. Hybrid Matching Engine
-            # This calls the DB for the top 5, then reranks them locally
+            # No url rule fired: this calls the DB for the top 5, then reranks them locally
             matched_folder_id = self.find_best_matching_folder(
+                db,
+                content_embedding=content_embedding,
+                user_id=user_id,
                 content_title=content_data.get('title', ''),
                 content_text=content_text,
                 content_url=content_url
@@ -60,17 +68,17 @@ class BucketProcessor(BaseProcessor):
 
             if matched_folder_id:
                 logger.info(f"Content matched to folder: {matched_folder_id}")
-                self.assign_to_folder(content_data, matched_folder_id, content_id, user_id)
+                self.assign_to_folder(db, content_data, matched_folder_id, content_id, user_id)
 
                 #Update the centroid matrix for a better learning rate 
-                self.update_folder_learning(folder_id=matched_folder_id)
+                self.update_folder_learning(db, folder_id=matched_folder_id, content_id=content_id)
                 return True
             
             logger.info("No confident match found for content.")
             return True
 
         except FoldersNotFound:
-            logger.info(f"No bucketing folders found for user {self.user_id}, skipping.")
+            logger.info(f"No bucketing folders found for user {user_id}, skipping.")
             return True
         except Exception as e:
             logger.error(f"Unexpected error in BucketProcessor: {e}", exc_info=True)
@@ -78,7 +86,7 @@ class BucketProcessor(BaseProcessor):
 
     #Next Steps:
     #Find a way to correlate words like playlist to music for better precision
-    def find_best_matching_folder(self, content_title: str, content_text: str, content_url: str) -> Optional[str]:
+    def find_best_matching_folder(self, db: Session, content_embedding: list[float], user_id: str, content_title: str, content_text: str, content_url: str) -> Optional[str]:
         """
         Two-Step Matching: 
         1. Recall (Vector Search in DB)
@@ -86,11 +94,15 @@ class BucketProcessor(BaseProcessor):
         """
         # STEP 1: RECALL - Get Top 5 candidates from DB using pgvector
         # This is the "Amazon Level" efficiency - we don't loop over every folder in Python.
-        candidates = self._get_best_matching_folders(self.content_embedding, self.user_id)
+        candidates = self._get_best_matching_folders(db, content_embedding, user_id)
         
         if not candidates:
             return None
 
+        # keywords and descriptions of all the user's folders, compiled once
+        matcher = self.services.folder_matchers.get(db, user_id)
+        lexical_scores = matcher.scores(content_text)
+
         scores = []
 
         for folder_row in candidates:
@@ -104,33 +116,16 @@ class BucketProcessor(BaseProcessor):
             
             score = 0.0
 
-            # LAYER 1: URL Pattern (The "Deterministic" Match)
-            # If the URL matches a pattern, we give it a massive boost (Amazon-style Rule Engine)
-            if folder.url_patterns:
-                for pattern in folder.url_patterns:
-                    try:
-                        if re.search(pattern.lower(), content_url):
-                            return folder.folder_id  # Immediate exit for high-confidence match
-                    except re.error:
-                        continue
-
-            # LAYER 2: Keyword Overlap (The "Signal" Match)
-            # Weights: 40% of the local reranking score
-            if folder.keywords:
-                matches = sum(1 for kw in folder.keywords if kw.lower() in content_text)
-                keyword_score = (matches / len(folder.keywords))
-                score += keyword_score * 0.2
-
-            if folder.description and folder.description.strip():
-                desc_similarity = fuzz.token_set_ratio(folder.description.lower(), content_text) / 100.0
-                score += desc_similarity * 0.30 # 20% weight for descriptive context
-
+            # LAYER 1: URL Pattern (The "Deterministic" Match) already ran on every folder
+            # in process(), none of them fired for this url
 
+            # LAYER 2: Keyword Overlap (20%) and description similarity (30%)
+            score += lexical_scores.get(folder.folder_id, 0.0)
 
             # LAYER 3: Semantic Strength (The "Intent" Match)
             # Weights: 50% of the local reranking score
             # We use the vector similarity already calculated by the DB!
-            score += vector_similarity * 0.5
+            score += vector_similarity * VECTOR_WEIGHT
 
             #later on update based on saved bookmarks in this folder 
 
@@ -143,14 +138,14 @@ class BucketProcessor(BaseProcessor):
         
         # CONFIDENCE THRESHOLD
         # Amazon doesn't match if it's not sure. 0.45 is a solid starting point for cosine similarity
-        if scores and round(float(scores[0][1]),2  )>= 0.20:
+        if scores and round(float(scores[0][1]),2  )>= MATCH_THRESHOLD:
             return scores[0][0]
         
 
         
         return None
 
-    def _get_best_matching_folders(self, metadataVector: list[float], user_id: str):
+    def _get_best_matching_folders(self, db: Session, metadataVector: list[float], user_id: str):
         """
         Executes pgvector cosine distance search.
         Moves the compute-heavy similarity check to the database.
@@ -161,7 +156,7 @@ class BucketProcessor(BaseProcessor):
         similarity = (1 - cosine_dist).label("similarity")
 
         results = (
-            self.db.query(Folder, similarity)
+            db.query(Folder, similarity)
             .filter(Folder.user_id == user_id)
             .filter(Folder.bucketing_mode == True)
             .order_by(cosine_dist) # Nearest distance first
@@ -170,9 +165,9 @@ class BucketProcessor(BaseProcessor):
         )
         return results
 
-    def _get_content_embedding(self, content_id: str) -> list[float]:
+    def _get_content_embedding(self, db: Session, content_id: str) -> list[float]:
         """Fetch pre-calculated embedding from the AI table."""
-        result = self.db.query(ContentAI.embedding).filter(ContentAI.content_id == content_id).first()
+        result = db.query(ContentAI.embedding).filter(ContentAI.content_id == content_id).first()
         
         if result is None:
             logger.error(f"No ContentAI record found for content_id {content_id}")
@@ -184,7 +179,7 @@ class BucketProcessor(BaseProcessor):
             
         return result.embedding
 
-    def _create_folder_profile_embedding(self, folder: Folder):
+    def _create_folder_profile_embedding(self, db: Session, folder: Folder):
         """
         Run this when a folder is created or metadata is updated.
         Creates a rich string representation for better vectorization.
@@ -197,14 +192,13 @@ class BucketProcessor(BaseProcessor):
         input_text = " ".join(parts)
         
         # Generate via your manager
-        embedding_mgr = ContentEmbeddingManager(db=self.db)
+        embedding_mgr = self.services.embedding_manager(db)
         return embedding_mgr._generate_embedding(input_text)
 
 
 
-    def assign_to_folder(self, content_data : ContentPayload, matched_folder_id : str, content_id : str, user_id : str)  -> bool:
+    def assign_to_folder(self, db: Session, content_data : ContentPayload, matched_folder_id : str, content_id : str, user_id : str)  -> bool:
         
-        db = self.db
         present = db.query(folder_item).filter(content_id == folder_item.content_id, matched_folder_id == folder_item.folder_id, user_id == folder_item.user_id).first()
 
         if present:
@@ -234,8 +228,7 @@ class BucketProcessor(BaseProcessor):
 
    
     
-    @staticmethod
-    def _create_content_embeding(self, folder: Folder):
+    def _create_content_embeding(self, db: Session, folder: Folder):
         parts = [
             f"Folder name: {folder.folder_name}",
             f"Description: {folder.description}" if folder.description else None,
@@ -245,14 +238,13 @@ class BucketProcessor(BaseProcessor):
 
         embedding_text = "\n".join(p for p in parts if p)
 
-        embedding_mgr = ContentEmbeddingManager(db=self.db)
+        embedding_mgr = self.services.embedding_manager(db)
         return embedding_mgr._generate_embedding(embedding_text)
     
-    def _get_content_ai_summary(self, content_id):
+    def _get_content_ai_summary(self, db: Session, content_id):
 
         try:
 
-            db = self.db 
             content_summary = db.query(ContentAI.ai_summary).filter(ContentAI.content_id == content_id ).first()
 
             if not content_summary:
@@ -264,44 +256,23 @@ class BucketProcessor(BaseProcessor):
             logging.error(f"Error occured trying to get the IA summary: {e}")
 
 
-    def update_folder_learning(self, folder_id: str):
+    def update_folder_learning(self, db: Session, folder_id: str, content_id: str):
         """
-        Updates the folder's vector profile based on newly added content.
+        Adds the content's embedding to the folder's vector profile (sum + count, exact mean).
+        One atomic UPDATE, the embedding is summed inside postgres (classes/folder_profile.py)
         This allows the 'Amazon-level' matching to drift toward user habits.
         """
-        db = self.db
-        folder = db.query(Folder).filter(Folder.folder_id == folder_id).first()
-
-        content_embedding : list[float] = self.content_embedding
-
-
-        # if folder is None or folder.folder_embedding is None or content_embedding is None:
-
-
-        if  folder is None or folder.folder_embedding is None or  content_embedding is None:
-            logging.error("Folder, folder embedding, or content combedding not found")
-            return
-
-        # Convert to numpy arrays for vector math
-        current_vec = np.array(folder.folder_embedding)
-        new_content_vec = np.array(content_embedding)
-
-        # LEARNING RATE (Alpha)
-        # 0.1 means the folder profile is 90% history and 10% this new item.
-        alpha = 0.1 
-
-        # Calculate the new centroid
-        updated_vec = ((1 - alpha) * current_vec) + (alpha * new_content_vec)
-
-        # Re-normalize the vector (Crucial for Cosine Similarity to work correctly)
-        norm = np.linalg.norm(updated_vec)
-        if norm > 0:
-            updated_vec = updated_vec / norm
-
-        # Save back to DB
-        folder.folder_embedding = updated_vec.tolist()
-        db.commit()
-        logger.info(f"Folder {folder_id} 'learned' from new content. Profile shifted.")
+        try:
+            if not add_to_folder_profile(db, folder_id, [content_id]):
+                # counted by add_to_filed_profiles once the content is embedded
+                logging.info(f"Learning deferred: content {content_id} has no embedding yet or is already in folder {folder_id}")
+                db.rollback()
+                return
+            db.commit()
+            logger.info(f"Folder {folder_id} 'learned' from new content. Profile shifted.")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to update the profile of folder {folder_id}: {e}")
 
     
 
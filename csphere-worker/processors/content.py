@@ -1,50 +1,65 @@
 from .base import BaseProcessor
 import logging
 from data_models.content import Content
+from data_models.content_ai import ContentAI
 from sqlalchemy.orm import Session
 
 from datetime import datetime, timezone
 from data_models.content_item import ContentItem
-from classes.EmbeddingManager import ContentEmbeddingManager
 from data_models.folder_item import folder_item
 from data_models.content_tag import ContentTag
 
 from uuid import uuid4
+from classes.EmbeddingManager import build_text_summary_input
 
 
 logger = logging.getLogger(__name__)
 
 
 class ContentProcessor(BaseProcessor):
-
-
-    def __init__(self, db:Session):
-        super().__init__(db=db)
+    '''
+    Saving a bookmark is split in two so the row exists (and can be archived) before
+    the slow LLM work:
+        create: content row + user item + folder + tags, committed
+        enrich: page capture if needed, summary, categories and embedding
+    Enrichment runs while the content has no ContentAI row, so a message redelivered
+    after a failed or interrupted enrich finishes the job instead of only linking
+    '''
 
 
     #Message now has the tag_ids we need to connect 
-    def process(self, message: dict) -> str:
-
+    def process(self, message: dict, db: Session) -> str:
+        content_id, needs_enrich = self.create(message=message, db=db)
+        if content_id and needs_enrich:
+            self.enrich(message=message, content_id=content_id, db=db)
+        return content_id
+
+
+    def create(self, message: dict, db: Session) -> tuple[str, bool]:
+        '''
+        Returns (content_id, needs_enrich). Existing content is linked to the user and
+        only enriched when it has no ContentAI yet, content_id is '' when saving failed
+        '''
         user_id, notes, folder_id, _, content_data, tag_ids = self.extract_data(message=message)
 
         content_url = content_data.get('url')
 
-        existing_content_id = self.handle_if_exists(content_url, user_id, notes, folder_id, tag_ids)
+        existing_content_id = self.handle_if_exists(db, content_url, user_id, notes, folder_id, tag_ids)
 
         if existing_content_id != '':
             logger.info('Content existed and was saved appropriately')
-            return existing_content_id
+            return existing_content_id, self.needs_enrichment(db, existing_content_id)
         
         new_content : Content = Content(**content_data)
 
         try:
-            self.db.add(new_content)
-            self.db.flush()
+            db.add(new_content)
+            db.flush()
 
             utc_time = datetime.now(timezone.utc)
 
             # Ensure the user-content relationship exists even if AI processing fails.
-            existing_item = self.db.query(ContentItem).filter(
+            existing_item = db.query(ContentItem).filter(
                 ContentItem.user_id == user_id,
                 ContentItem.content_id == new_content.content_id
             ).first()
@@ -56,29 +71,7 @@ class ContentProcessor(BaseProcessor):
                     saved_at=utc_time,
                     notes=notes,
                 )
-                self.db.add(new_item)
-
-            #update the content Embedding manager when necessary 
-            content_manager = ContentEmbeddingManager(db=self.db, content_url=new_content.url)
-
-            raw_html = message.get('raw_html')
-            if not raw_html:
-                logging.info("No raw html provided, categorization and summarization may be poor")
-                raw_html = self.capture_page(url=content_url)
-
-                #confirm the raw html was fetched
-
-                if not raw_html or raw_html == '':
-                    logging.warning(f"No raw HTML was fetched for the following url: {raw_html}")
-
-            content_ai = content_manager.process_content(new_content, raw_html)
-
-            self.db.commit()
-
-            if not content_ai:
-                logging.info("Embedding generation failed or skipped.")
-            else:
-                logging.debug(f"Summary Generated: {content_ai.ai_summary}")
+                db.add(new_item)
 
             # Add to the corresponding folder if any
             if folder_id and folder_id != '' and folder_id != 'default':
@@ -90,15 +83,13 @@ class ContentProcessor(BaseProcessor):
                     added_at=datetime.utcnow(),
                 )
 
-                self.db.add(new_folder_item)
-                self.db.commit()
-                self.db.refresh(new_folder_item)
+                db.add(new_folder_item)
             else:
                 print("No valid folder id found, skipping this part")
 
             if tag_ids:
                 for tag_id in tag_ids:
-                    existing_tag_link = self.db.query(ContentTag).filter(
+                    existing_tag_link = db.query(ContentTag).filter(
                         ContentTag.c.tag_id == tag_id,
                         ContentTag.c.content_id == new_content.content_id,
                         ContentTag.c.user_id == user_id,
@@ -110,15 +101,68 @@ class ContentProcessor(BaseProcessor):
                             content_id=new_content.content_id,
                             user_id=user_id,
                         )
-                        self.db.execute(stmt)
-                self.db.commit()
+                        db.execute(stmt)
+
+            db.commit()
 
             logging.info(f"Successfully saved content for user. Returning content id: {new_content.content_id}")
-            return new_content.content_id
+            return new_content.content_id, True
 
         except Exception as e:
-            self.db.rollback()
+            db.rollback()
             logging.error(f"Error occurred while saving the bookmark: {str(e)}")
-            return ''
-            
-        
+            return '', False
+
+
+    def needs_enrichment(self, db: Session, content_id: str) -> bool:
+        '''No ContentAI row: the content's summary and embedding were never written'''
+        return db.query(ContentAI.content_id).filter(ContentAI.content_id == content_id).first() is None
+
+
+    def enrich(self, message: dict, content_id: str, db: Session):
+        '''
+        Summarizes, categorizes and embeds content saved by create()
+        '''
+        content : Content = db.query(Content).filter(Content.content_id == content_id).first()
+        if not content:
+            logging.error(f"No content found to enrich for content_id: {content_id}")
+            return None
+
+        try:
+            #update the content Embedding manager when necessary 
+            content_manager = self.services.embedding_manager(db, content_url=content.url)
+
+            raw_html = self.raw_html_source(message)
+            # Set by the pipeline's parse stage when the html was already parsed
+            summary_input = message.get('summary_input')
+            page_title = message.get('page_title')
+            if not raw_html and not summary_input and message.get('page_text'):
+                summary_input, page_title = build_text_summary_input(content.url, content.title, message['page_text'])
+            if not raw_html and not summary_input:
+                logging.info("No raw html provided, categorization and summarization may be poor")
+                raw_html = self.capture_page(url=content.url)
+
+                #confirm the raw html was fetched
+
+                if not raw_html or raw_html == '':
+                    logging.warning(f"No raw HTML was fetched for the following url: {content.url}")
+
+            content_ai = content_manager.process_content(
+                content,
+                raw_html,
+                summary_input=summary_input,
+                page_title=page_title,
+            )
+
+            db.commit()
+
+            if not content_ai:
+                logging.info("Embedding generation failed or skipped.")
+            else:
+                logging.debug(f"Summary Generated: {content_ai.ai_summary}")
+            return content_ai
+
+        except Exception as e:
+            db.rollback()
+            logging.error(f"Error occurred while enriching the bookmark: {str(e)}")
+            return None
@@ -0,0 +1,205 @@
+import logging
+from uuid import uuid4
+
+import numpy as np
+from sqlalchemy import exists, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .base import BaseProcessor
+from core.metrics import metrics
+from classes.folder_matcher import FolderMatcher, assign_folders
+from classes.folder_profile import EMBEDDING_DIMS, add_to_folder_profile
+from data_models.content import Content
+from data_models.content_ai import ContentAI
+from data_models.content_item import ContentItem
+from data_models.folder import Folder
+from data_models.folder_item import folder_item
+from data_models.folder_suggestion import FolderSuggestion
+from schemas.content_schemas import RebucketSchema
+
+logger = logging.getLogger(__name__)
+
+
+class RebucketProcessor(BaseProcessor):
+    '''
+    Buckets a user's existing library (a 'folder_rebucket' message), what BucketProcessor
+    does for a single save done for every bookmark that isn't in a folder yet:
+        1. the user's bucketing folders are loaded once, profiles as one matrix
+        2. bookmarks are read chunk_size at a time, embeddings as a (chunk x dims) matrix
+        3. every (bookmark, folder) pair is scored with one matrix multiply plus the
+           keyword / description matrices and the url rules (classes/folder_matcher.py)
+        4. the chunk's assignments are written with set based inserts and the job's
+           progress is committed, the api streams it back to the client
+    apply=False writes folder_suggestion rows instead of filing the bookmarks
+    '''
+
+    def __init__(self, services, chunk_size: int = 2000):
+        super().__init__(services)
+        self.chunk_size = chunk_size
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def process(self, job: RebucketSchema, db: Session) -> dict:
+        '''Returns {'processed': n, 'assigned': n}'''
+        version, folders = self._load_folders(db, job.user_id)
+        total = self._count_unfiled(db, job.user_id)
+        self._update_job(db, job.job_id, status='running', total=total)
+        if not folders or not total:
+            self._update_job(db, job.job_id, status='completed')
+            return {'processed': 0, 'assigned': 0}
+
+        matcher = FolderMatcher(folders)
+        folder_matrix = np.vstack([_vector(folder.folder_embedding) for folder in folders])
+
+        processed, assigned, last_id = 0, 0, None
+        while True:
+            # folders edited while the job runs (the api reuses the running job instead of
+            # starting another): the rest of the library is scored with the new rules, and
+            # what is still unfiled gets another pass
+            if self._folders_version(db, job.user_id) != version:
+                version, folders = self._load_folders(db, job.user_id)
+                if not folders:
+                    break
+                matcher = FolderMatcher(folders)
+                folder_matrix = np.vstack([_vector(folder.folder_embedding) for folder in folders])
+                last_id = None
+                self._update_job(db, job.job_id, total=processed + self._count_unfiled(db, job.user_id))
+                logger.info(f"Rebucket {job.job_id}: folders changed, scoring the unfiled bookmarks again")
+
+            query = self._unfiled(job.user_id)
+            if last_id is not None:
+                query = query.where(ContentItem.content_id > last_id)
+            rows = db.execute(query.order_by(ContentItem.content_id).limit(self.chunk_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].content_id
+
+            with metrics.timed('rebucket.score'):
+                texts = [f"{row.title or ''} {row.notes or ''}{row.ai_summary or ''}".lower() for row in rows]
+                rules = np.asarray([
+                    matcher.positions.get(matcher.url_match((row.url or '').lower()), -1) for row in rows
+                ], dtype=np.intp)
+                best, scores = assign_folders(
+                    np.vstack([_vector(row.embedding) for row in rows]),
+                    folder_matrix,
+                    matcher.lexical_matrix(texts),
+                    rules,
+                )
+
+            matches = [
+                (row.content_id, matcher.folder_ids[position], float(score))
+                for row, position, score in zip(rows, best.tolist(), scores.tolist()) if position >= 0
+            ]
+            with metrics.timed('rebucket.write'):
+                if job.apply:
+                    linked = self._file(db, job.user_id, matches)
+                else:
+                    linked = self._suggest(db, job, matches)
+
+            processed += len(rows)
+            assigned += linked
+            # committed with the chunk's assignments, progress never runs ahead of them
+            self._update_job(db, job.job_id, processed=len(rows), linked=linked)
+
+        self._update_job(db, job.job_id, status='completed')
+        metrics.incr('rebucket.processed', processed)
+        metrics.incr('rebucket.assigned', assigned)
+        logger.info(f"Rebucket {job.job_id}: {processed} bookmarks scored against {len(folders)} folders, {assigned} assigned")
+        return {'processed': processed, 'assigned': assigned}
+
+    def fail(self, db: Session, job_id: str, error: str):
+        db.rollback()
+        self._update_job(db, job_id, status='failed', error=error)
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _folders_version(self, db: Session, user_id: str) -> tuple:
+        '''Same version FolderMatcherCache keys on: count and latest updated_at'''
+        return tuple(db.execute(
+            select(func.count(), func.max(Folder.updated_at))
+            .where(Folder.user_id == user_id, Folder.bucketing_mode == True)
+        ).one())
+
+    def _load_folders(self, db: Session, user_id: str) -> tuple:
+        version = self._folders_version(db, user_id)
+        folders = db.execute(
+            select(Folder.folder_id, Folder.keywords, Folder.url_patterns, Folder.description, Folder.folder_embedding)
+            .where(Folder.user_id == user_id, Folder.bucketing_mode == True)
+        ).all()
+        return version, folders
+
+    def _count_unfiled(self, db: Session, user_id: str) -> int:
+        return db.execute(select(func.count()).select_from(self._unfiled(user_id).subquery())).scalar()
+
+    def _unfiled(self, user_id: str):
+        '''The user's bookmarks that aren't in any of their folders'''
+        filed = exists().where(
+            folder_item.user_id == ContentItem.user_id,
+            folder_item.content_id == ContentItem.content_id,
+        )
+        return (
+            select(ContentItem.content_id, ContentItem.notes, Content.url, Content.title, ContentAI.ai_summary, ContentAI.embedding)
+            .join(Content, Content.content_id == ContentItem.content_id)
+            .outerjoin(ContentAI, ContentAI.content_id == ContentItem.content_id)
+            .where(ContentItem.user_id == user_id, ~filed)
+        )
+
+    def _file(self, db: Session, user_id: str, matches: list[tuple]) -> int:
+        '''Files the matches, returns how many were new. Only those go into the profiles'''
+        if not matches:
+            return 0
+        filed = db.execute(
+            insert(folder_item)
+            .values([
+                {'folder_item_id': uuid4(), 'folder_id': folder_id, 'user_id': user_id, 'content_id': content_id}
+                for content_id, folder_id, _ in matches
+            ])
+            # filed since the chunk was read (a save, another job): already in the profile
+            .on_conflict_do_nothing(index_elements=['user_id', 'folder_id', 'content_id'])
+            .returning(folder_item.folder_id, folder_item.content_id)
+        ).all()
+        # one profile update per folder for the whole chunk
+        by_folder = {}
+        for folder_id, content_id in filed:
+            by_folder.setdefault(folder_id, []).append(content_id)
+        for folder_id, content_ids in by_folder.items():
+            add_to_folder_profile(db, folder_id, content_ids)
+        return len(filed)
+
+    def _suggest(self, db: Session, job: RebucketSchema, matches: list[tuple]) -> int:
+        '''Writes the matches as suggestions, returns how many were new'''
+        if not matches:
+            return 0
+        return len(db.execute(
+            insert(FolderSuggestion)
+            .values([
+                {'job_id': job.job_id, 'content_id': content_id, 'folder_id': folder_id, 'user_id': job.user_id, 'score': score}
+                for content_id, folder_id, score in matches
+            ])
+            .on_conflict_do_nothing()
+            .returning(FolderSuggestion.content_id)
+        ).all())
+
+    def _update_job(self, db: Session, job_id: str, status: str | None = None, total: int | None = None,
+                    processed: int = 0, linked: int = 0, error: str | None = None):
+        '''processed: bookmarks scored, linked: bookmarks filed (or proposed)'''
+        db.execute(
+            text(
+                "UPDATE background_job SET status = coalesce(:status, status), total = coalesce(:total, total), "
+                "processed = processed + :processed, linked = linked + :linked, "
+                "error = coalesce(:error, error), updated_at = now() WHERE job_id = :job_id"
+            ),
+            {'status': status, 'total': total, 'processed': processed, 'linked': linked, 'error': error, 'job_id': job_id},
+        )
+        db.commit()
+
+
+def _vector(embedding) -> np.ndarray:
+    if embedding is None:
+        return np.zeros(EMBEDDING_DIMS, dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
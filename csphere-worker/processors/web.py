@@ -3,9 +3,8 @@ import logging
 from data_models.content import Content
 from sqlalchemy.orm import Session
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from data_models.content_item import ContentItem
-from classes.EmbeddingManager import ContentEmbeddingManager
 from data_models.folder_item import folder_item
 from data_models.content_tag import ContentTag
 
@@ -13,14 +12,10 @@ from uuid import uuid4
 
 from urllib.parse import urlparse
 
-import os 
-import subprocess
-import boto3
 from core.settings import get_settings
-
-import json
-
-from fake_useragent import UserAgent
+from core.metrics import metrics
+from classes.archive_policy import ArchivePolicy, REUSE_UNCHANGED
+from classes.archive_store import StoredArchive
 
 logger = logging.getLogger(__name__)
 
@@ -29,115 +24,80 @@ settings = get_settings()
 
 
 class WebParsingProcessor(BaseProcessor):
-    def __init__(self, db: Session):
-        super().__init__(db)
-        self.s3 = boto3.client(
-            "s3",
-            region_name="us-east-1",  
-            aws_access_key_id=settings.AWS_ACCESS_KEY,
-            aws_secret_access_key=settings.AWS_SECRET_KEY,
-        )
+    def __init__(self, services):
+        super().__init__(services)
+        self.s3 = services.s3_client
         self.bucket_name = settings.BUCKET_NAME
+        self.store = services.archive_store
+        self.policy = ArchivePolicy(
+            max_age=timedelta(hours=settings.ARCHIVE_MAX_AGE_HOURS),
+            revalidate=settings.ARCHIVE_REVALIDATE,
+            head_timeout=settings.ARCHIVE_HEAD_TIMEOUT,
+        )
 
-    def process(self, content_id: str, url: str):
+    def process(self, content_id: str, url: str, db: Session):
         """
         Orchestrates the archival, upload, and DB update.
+        Existing snapshots are reused according to the archive freshness policy
         """
-        # 1. Create a unique identifier for this snapshot
-        unique_id = f"{content_id}_{uuid4().hex}"
-        local_filename = f"{unique_id}.html"
-        
-        # 2. Capture the page locally
-        local_path = self.archive_page(url, unique_id)
-        
-        if not local_path or not os.path.exists(local_path):
-            logger.error(f"Failed to archive page for content_id: {content_id}")
-            return False
-
-        try:
-            # 3. Upload to S3
-            s3_key = f"archives/{content_id}/{local_filename}"
-            s3_url = self.save_to_s3(local_path, s3_key)
-
-            if s3_url:
-                content_item : Content = self.db.query(Content).filter(Content.content_id == content_id).first()
-                if content_item:
-                    # Assuming you have a field to store the permanent link
-                    content_item.html_content_url = s3_url 
-                    self.db.commit()
-                    logger.info(f"Successfully processed and linked archive for {content_id}")
-            
-            return True
-
-        finally:
-            if os.path.exists(local_path):
-                os.remove(local_path)
-
-    def archive_page(self, url, filename):
         if not url.startswith("http"):
             url = "https://" + url
 
-        output_dir = "temp_archives"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.abspath(os.path.join(output_dir, f"{filename}.html"))
+        content_item : Content = db.query(Content).filter(Content.content_id == content_id).first()
+        if not content_item:
+            logger.error(f"No content found to archive for content_id: {content_id}")
+            return False
 
-        ua = UserAgent(browsers=['chrome', 'edge'], os=['macos', 'windows'])
-        random_ua = ua.random
+        decision = self.policy.decide(content_item, url)
+        if not decision.capture:
+            if decision.action == REUSE_UNCHANGED:
+                # revalidated, the snapshot counts as fresh again
+                content_item.html_archived_at = datetime.now(timezone.utc)
+                db.commit()
+            return True
 
-        browser_args = [
-            "--no-sandbox",
-            "--disable-setuid-sandbox",
-            "--disable-gpu",
-            "--disable-dev-shm-usage",
-            f"--user-agent={random_ua}",
-            "--disable-blink-features=AutomationControlled",
-        ]
+        # 1. Capture the page in the shared archiver, the snapshot comes back in memory
+        snapshot = self.archive_page(url)
+        metrics.incr('archive.captures')
 
-        command = [
-            "npx",
-            "single-file-cli",
-            url,
-            output_path,
-            "--browser-args",
-            json.dumps(browser_args),
-        ]
+        if not snapshot:
+            logger.error(f"Failed to archive page for content_id: {content_id}")
+            metrics.incr('archive.capture_failed')
+            return False
 
+        # 2. Store it compressed under its content hash (identical snapshots are stored once)
+        stored = self.save_snapshot(snapshot)
+        if not stored:
+            return False
 
+        content_item.html_content_url = stored.url
+        content_item.html_archived_at = datetime.now(timezone.utc)
+        content_item.html_etag = decision.etag
+        content_item.html_last_modified = decision.last_modified
+        db.commit()
+        logger.info(f"Successfully processed and linked archive for {content_id}: {stored}")
 
-        logger.info(f"Archiving following url: {url}")
-        try:
-            result = subprocess.run(command, capture_output=True, text=True, timeout=120)
-            logger.error(f"SingleFile stdout: {result.stdout}") 
-            logger.error(f"SingleFile stderr: {result.stderr}")
-            logger.error(f"SingleFile return code: {result.returncode}")
+        return True
 
+    def archive_page(self, url: str) -> bytes | None:
+        return self.services.archiver.archive(url)
 
-            if result.returncode == 0 and os.path.exists(output_path):
-                return output_path
-            logger.error(f"SingleFile Error: {result.stderr}")
-        except Exception as e:
-            logger.error(f"Archive subprocess failed: {e}")
-        return None
-
-    def save_to_s3(self, local_path, s3_key):
-        """
-        Uploads the file with proper Content-Type so it renders in browser.
-        """
+    def save_snapshot(self, snapshot: bytes) -> StoredArchive | None:
         try:
-            self.s3.upload_file(
-                local_path, 
-                self.bucket_name, 
-                s3_key,
-                ExtraArgs={
-                    "ContentType": "text/html",
-                }
-            )
-            # Construct the base S3 URL (you'll use your pre-signed method to view it)
-            return f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
+            stored = self.store.put(snapshot)
         except Exception as e:
-            logger.error(f"S3 Upload failed: {e}")
+            logger.error(f"Archive upload failed: {e}")
             return None
 
+        if stored.deduplicated:
+            metrics.incr('archive.dedup_hits')
+            metrics.incr('archive.s3_puts_avoided')
+        else:
+            metrics.incr('archive.s3_puts')
+            metrics.incr('archive.bytes_raw', stored.size)
+            metrics.incr('archive.bytes_stored', stored.stored_size)
+        return stored
+
     def extract_s3_key(self, s3_url: str) -> str:
         parsed = urlparse(s3_url)
         return parsed.path.lstrip('/')
@@ -0,0 +1,52 @@
+from .base import QueueBackend, QueuedMessage
+from .activemq import ActiveMQConsumer, ActiveMQQueue
+from .fake_broker import FakeActiveMQBroker
+from .scheduler import LaneScheduler, INTERACTIVE, BULK
+
+
+def get_queue_backend(settings) -> QueueBackend:
+    '''
+    Builds the queue driver selected by QUEUE_BACKEND ('activemq' or 'postgres').
+    When a bulk queue is configured both lanes are consumed through a LaneScheduler
+    '''
+    interactive = _build_backend(settings, INTERACTIVE)
+
+    bulk_queue = settings.QUEUE_BULK_NAME if settings.QUEUE_BACKEND == 'postgres' else settings.ACTIVEMQ_BULK_QUEUE
+    if not bulk_queue:
+        return interactive
+
+    return LaneScheduler(
+        interactive,
+        _build_backend(settings, BULK),
+        interactive_weight=settings.QUEUE_INTERACTIVE_WEIGHT,
+        bulk_user_max_in_flight=settings.QUEUE_BULK_USER_MAX_IN_FLIGHT,
+        max_held=settings.QUEUE_BULK_MAX_HELD,
+        hold_timeout=settings.QUEUE_BULK_HOLD_TIMEOUT,
+    )
+
+
+def _build_backend(settings, lane: str) -> QueueBackend:
+    if settings.QUEUE_BACKEND == 'postgres':
+        from database import engine
+        from .postgres import PostgresQueue
+
+        return PostgresQueue(
+            engine,
+            settings.QUEUE_BULK_NAME if lane == BULK else settings.QUEUE_NAME,
+            visibility_timeout=settings.QUEUE_VISIBILITY_TIMEOUT,
+            wait_timeout=settings.ACTIVEMQ_READ_TIMEOUT_MS / 1000,
+            max_attempts=settings.QUEUE_MAX_ATTEMPTS,
+        )
+
+    if settings.QUEUE_BACKEND == 'activemq':
+        return ActiveMQQueue(
+            base_url=settings.ACTIVEMQ_URL,
+            queue_name=settings.ACTIVEMQ_BULK_QUEUE if lane == BULK else settings.ACTIVEMQ_QUEUE,
+            user=settings.ACTIVEMQ_USER,
+            password=settings.ACTIVEMQ_PASS,
+            read_timeout_ms=settings.ACTIVEMQ_READ_TIMEOUT_MS,
+            batch_size=settings.ACTIVEMQ_BATCH_SIZE,
+            max_backoff=settings.ACTIVEMQ_MAX_BACKOFF,
+        )
+
+    raise ValueError(f"Unknown QUEUE_BACKEND: {settings.QUEUE_BACKEND}")
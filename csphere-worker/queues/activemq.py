@@ -0,0 +1,123 @@
+import logging
+from urllib.parse import quote
+from typing import Optional
+from uuid import uuid4
+
+import requests
+
+from .base import QueueBackend, QueuedMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveMQConsumer:
+    '''
+    Consumes a queue through the ActiveMQ REST api with one long-lived consumer.
+
+    oneShot=true creates and tears down a consumer on the broker for every GET. Here the
+    consumer stays attached to our HTTP session (JSESSIONID cookie + clientId) so every
+    request reuses it, and readTimeout makes the broker hold the request open until a
+    message shows up instead of us sleeping between empty polls. Batches are pulled in a
+    loop by QueueBackend.batches (through ActiveMQQueue).
+
+    :param read_timeout_ms: how long the broker waits for the first message of a batch
+    :param drain_timeout_ms: wait used while draining a batch back-to-back
+    :param batch_size: max messages pulled before handing a batch back
+    :param min_backoff / max_backoff: client side sleep (seconds) after polling errors, an
+        empty poll is padded to min_backoff only when the broker answered early
+    '''
+
+    def __init__(self, base_url: str, queue_name: str, user: str, password: str,
+                 read_timeout_ms: int = 10000, drain_timeout_ms: int = 50, batch_size: int = 10,
+                 min_backoff: float = 0.5, max_backoff: float = 30.0, client_id: Optional[str] = None,
+                 session: Optional[requests.Session] = None):
+        self.queue_url = f"{base_url.rstrip('/')}/api/message/{quote(queue_name, safe='')}"
+        self.read_timeout_ms = read_timeout_ms
+        self.drain_timeout_ms = drain_timeout_ms
+        self.batch_size = batch_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.client_id = client_id or f"csphere-worker-{uuid4().hex[:8]}"
+
+        self.session = session or requests.Session()
+        self.session.auth = (user, password)
+
+        self.received = 0
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def receive(self, read_timeout_ms: Optional[int] = None) -> Optional[str]:
+        '''One GET against the queue. Returns the message body or None when the queue stayed empty'''
+        timeout_ms = self.read_timeout_ms if read_timeout_ms is None else read_timeout_ms
+        params = {
+            'type': 'queue',
+            'clientId': self.client_id,
+            'readTimeout': timeout_ms,
+        }
+        # Give the socket a little longer than the broker's own wait
+        response = self.session.get(self.queue_url, params=params, timeout=(5, timeout_ms / 1000 + 10))
+
+        if response.status_code == 204 or not response.text.strip():
+            return None
+        response.raise_for_status()
+        return response.text.strip()
+
+    def receive_batch(self, max_messages: Optional[int] = None, read_timeout_ms: Optional[int] = None) -> list[str]:
+        '''
+        Long-polls for the first message, then drains whatever else is queued back-to-back
+        without waiting, up to max_messages
+        '''
+        max_messages = max_messages or self.batch_size
+        first = self.receive(read_timeout_ms=read_timeout_ms)
+        if first is None:
+            return []
+
+        batch = [first]
+        while len(batch) < max_messages:
+            message = self.receive(read_timeout_ms=self.drain_timeout_ms)
+            if message is None:
+                break
+            batch.append(message)
+
+        self.received += len(batch)
+        return batch
+
+    def close(self):
+        self.session.close()
+
+
+class ActiveMQQueue(QueueBackend):
+    '''
+    ActiveMQ REST driver. Messages are acknowledged by the broker when they are
+    delivered over REST, so ack/nack are no-ops here and release re-publishes the
+    message at the back of the queue
+    '''
+
+    def __init__(self, base_url: str, queue_name: str, user: str, password: str, **consumer_options):
+        self.consumer = ActiveMQConsumer(base_url, queue_name, user, password, **consumer_options)
+        self.max_backoff = self.consumer.max_backoff
+        self.min_backoff = self.consumer.min_backoff
+
+    def enqueue(self, body: str, db=None) -> bool:
+        try:
+            response = self.consumer.session.post(
+                self.consumer.queue_url,
+                params={'type': 'queue'},
+                data=body.encode('utf-8'),
+                headers={'Content-Type': 'text/plain'},
+                timeout=10,
+            )
+            logger.debug(f"Response from ActiveMQ: {response.status_code} - {response.text}")
+            return response.status_code == 200
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error pushing to ActiveMQ: {e}")
+            return False
+
+    def claim(self, max_messages: int, wait: bool = True) -> list[QueuedMessage]:
+        read_timeout_ms = None if wait else self.consumer.drain_timeout_ms
+        return [QueuedMessage(body) for body in self.consumer.receive_batch(max_messages, read_timeout_ms=read_timeout_ms)]
+
+    def close(self):
+        self.consumer.close()
@@ -0,0 +1,92 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedMessage:
+    '''
+    A message handed out by a queue backend. receipt is whatever the backend needs
+    to ack/nack it later (row id for Postgres, None for ActiveMQ)
+    '''
+
+    def __init__(self, body: str, receipt=None, attempts: int = 1):
+        self.body = body
+        self.receipt = receipt
+        self.attempts = attempts
+        # set by the LaneScheduler
+        self.lane = None
+        self.user_id = None
+
+    def __repr__(self):
+        return (f"QueuedMessage(receipt={self.receipt!r}, attempts={self.attempts}, lane={self.lane!r}, "
+                f"size={len(self.body)})")
+
+
+class QueueBackend(ABC):
+    '''
+    Common interface for the message queue drivers used by the worker.
+
+    claim() may block for up to the backend's server side wait. Messages must be
+    ack()ed once handled; nack() hands them back for a retry where the driver supports it.
+    '''
+
+    min_backoff: float = 0.5
+    max_backoff: float = 30.0
+    # a claimed message that is never acked comes back (visibility timeout), so a
+    # consumer may hold claimed messages without losing them if it dies
+    redelivers: bool = False
+
+    @abstractmethod
+    def enqueue(self, body: str, db=None) -> bool:
+        """Publishes a message. Drivers backed by the database join db's transaction."""
+        pass
+
+    @abstractmethod
+    def claim(self, max_messages: int, wait: bool = True) -> list[QueuedMessage]:
+        """
+        Returns up to max_messages messages, or an empty list when the queue stayed empty.
+        wait=False only takes what is ready now instead of waiting server side.
+        """
+        pass
+
+    def ack(self, message: QueuedMessage):
+        pass
+
+    def nack(self, message: QueuedMessage):
+        pass
+
+    def release(self, message: QueuedMessage, delay: float = 0):
+        """Hands back a message that was claimed but not started, without counting an attempt."""
+        self.enqueue(message.body)
+
+    def close(self):
+        pass
+
+    def batches(self, max_messages: int) -> Iterator[list[QueuedMessage]]:
+        '''
+        Yields batches forever. claim() already waits server side (long-poll / LISTEN),
+        so an empty claim is followed by the next one right away. Only polling errors
+        back off exponentially, up to max_backoff
+        '''
+        backoff = 0.0
+        while True:
+            started = time.monotonic()
+            try:
+                batch = self.claim(max_messages)
+            except Exception as e:
+                backoff = min(self.max_backoff, max(self.min_backoff, backoff * 2))
+                logger.error(f"[ERROR] Polling error, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                continue
+
+            backoff = 0.0
+            if batch:
+                yield batch
+                continue
+
+            # an empty claim that came back early (a broker that didn't wait) is padded
+            # to min_backoff, so it can't turn into a busy loop
+            time.sleep(max(0.0, self.min_backoff - (time.monotonic() - started)))
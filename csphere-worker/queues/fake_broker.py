@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class FakeActiveMQBroker:
+    '''
+    In-process stand-in for the ActiveMQ REST api (/api/message/<queue>), for local
+    benchmarks and tests. Supports POST to enqueue and GET with readTimeout (ms) and
+    oneShot. An optional per-request latency simulates the network round trip.
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, request_latency: float = 0.0):
+        self.request_latency = request_latency
+        self._queues: dict[str, deque] = defaultdict(deque)
+        self._cond = threading.Condition()
+        self.stats = {'get': 0, 'empty_get': 0, 'post': 0}
+
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                queue_name, params = broker._parse(self.path)
+                if queue_name is None:
+                    self.send_error(404)
+                    return
+                read_timeout_ms = int(params.get('readTimeout', ['0'])[0])
+                body = broker._pop(queue_name, read_timeout_ms / 1000)
+                if body is None:
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                queue_name, _ = broker._parse(self.path)
+                if queue_name is None:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                broker.put(queue_name, self.rfile.read(length).decode('utf-8'))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeActiveMQBroker':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def put(self, queue_name: str, body: str):
+        with self._cond:
+            self._queues[queue_name].append(body)
+            self.stats['post'] += 1
+            self._cond.notify()
+
+    def depth(self, queue_name: str) -> int:
+        with self._cond:
+            return len(self._queues[queue_name])
+
+    def _pop(self, queue_name: str, wait: float) -> Optional[str]:
+        if self.request_latency:
+            time.sleep(self.request_latency)
+        deadline = time.monotonic() + wait
+        with self._cond:
+            self.stats['get'] += 1
+            while not self._queues[queue_name]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['empty_get'] += 1
+                    return None
+                self._cond.wait(remaining)
+            return self._queues[queue_name].popleft()
+
+    @staticmethod
+    def _parse(path: str):
+        parsed = urlparse(path)
+        prefix = '/api/message/'
+        if not parsed.path.startswith(prefix):
+            return None, {}
+        return unquote(parsed.path[len(prefix):]), parse_qs(parsed.query)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,170 @@
+import logging
+import select
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .base import QueueBackend, QueuedMessage
+
+logger = logging.getLogger(__name__)
+
+
+NOTIFY_CHANNEL = 'csphere_job_queue'
+
+
+class PostgresQueue(QueueBackend):
+    '''
+    Transactional job queue on the `job_queue` table.
+
+    Claims use FOR UPDATE SKIP LOCKED so any number of workers can pull batches without
+    blocking each other. A claimed row is hidden by pushing available_at forward by the
+    visibility timeout: ack deletes it, and a row that is never acked (worker crashed)
+    becomes claimable again once the timeout passes. Producers NOTIFY on commit, so an
+    idle worker waits on LISTEN instead of polling the table.
+    '''
+
+    redelivers = True
+
+    CLAIM_SQL = text("""
+        WITH next_jobs AS (
+            SELECT id FROM job_queue
+            WHERE queue_name = :queue_name
+              AND available_at <= now()
+              AND attempts < :max_attempts
+            ORDER BY available_at, id
+            LIMIT :max_messages
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE job_queue
+        SET attempts = job_queue.attempts + 1,
+            available_at = now() + make_interval(secs => :visibility_timeout)
+        FROM next_jobs
+        WHERE job_queue.id = next_jobs.id
+        RETURNING job_queue.id, job_queue.payload, job_queue.attempts
+    """)
+
+    def __init__(self, engine: Engine, queue_name: str, visibility_timeout: float = 300,
+                 wait_timeout: float = 10, retry_delay: float = 30, max_attempts: int = 5):
+        self.engine = engine
+        self.queue_name = queue_name
+        self.visibility_timeout = visibility_timeout
+        self.wait_timeout = wait_timeout
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._listen_conn = None
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def enqueue(self, body: str, db=None) -> bool:
+        '''
+        Inserts the job. With db the insert joins the caller's transaction and is only
+        visible (and notified) once the caller commits
+        '''
+        if db is not None:
+            self._insert(db, body)
+            return True
+
+        with self.engine.begin() as conn:
+            self._insert(conn, body)
+        return True
+
+    def enqueue_many(self, bodies: list[str], db=None) -> bool:
+        if not bodies:
+            return True
+        if db is not None:
+            self._insert_many(db, bodies)
+            return True
+
+        with self.engine.begin() as conn:
+            self._insert_many(conn, bodies)
+        return True
+
+    def claim(self, max_messages: int, wait: bool = True) -> list[QueuedMessage]:
+        messages = self._claim(max_messages)
+        if messages or not wait:
+            return messages
+
+        # Nothing ready: sleep on LISTEN until a producer commits or the wait runs out
+        if self._wait_for_notify(self.wait_timeout):
+            messages = self._claim(max_messages)
+        return messages
+
+    def ack(self, message: QueuedMessage):
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM job_queue WHERE id = :id"), {'id': message.receipt})
+
+    def nack(self, message: QueuedMessage):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("UPDATE job_queue SET available_at = now() + make_interval(secs => :delay) WHERE id = :id"),
+                {'id': message.receipt, 'delay': self.retry_delay},
+            )
+
+    def release(self, message: QueuedMessage, delay: float = 0):
+        # undo the claim: the attempt didn't happen
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "UPDATE job_queue SET attempts = greatest(attempts - 1, 0), "
+                    "available_at = now() + make_interval(secs => :delay) WHERE id = :id"
+                ),
+                {'id': message.receipt, 'delay': delay},
+            )
+
+    def close(self):
+        if self._listen_conn is not None:
+            self._listen_conn.close()
+            self._listen_conn = None
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _insert(self, conn, body: str):
+        conn.execute(
+            text("INSERT INTO job_queue (queue_name, payload) VALUES (:queue_name, :payload)"),
+            {'queue_name': self.queue_name, 'payload': body},
+        )
+        conn.execute(text("SELECT pg_notify(:channel, :queue_name)"), {'channel': NOTIFY_CHANNEL, 'queue_name': self.queue_name})
+
+    def _insert_many(self, conn, bodies: list[str]):
+        conn.execute(
+            text("INSERT INTO job_queue (queue_name, payload) VALUES (:queue_name, :payload)"),
+            [{'queue_name': self.queue_name, 'payload': body} for body in bodies],
+        )
+        conn.execute(text("SELECT pg_notify(:channel, :queue_name)"), {'channel': NOTIFY_CHANNEL, 'queue_name': self.queue_name})
+
+    def _claim(self, max_messages: int) -> list[QueuedMessage]:
+        with self.engine.begin() as conn:
+            rows = conn.execute(self.CLAIM_SQL, {
+                'queue_name': self.queue_name,
+                'max_attempts': self.max_attempts,
+                'max_messages': max_messages,
+                'visibility_timeout': self.visibility_timeout,
+            }).all()
+        return [QueuedMessage(row.payload, receipt=row.id, attempts=row.attempts) for row in rows]
+
+    def _listener(self):
+        if self._listen_conn is None:
+            # LISTEN is per connection, so keep a dedicated one detached from the pool
+            pooled = self.engine.raw_connection()
+            pooled.detach()
+            conn = pooled.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._listen_conn = conn
+        return self._listen_conn
+
+    def _wait_for_notify(self, timeout: float) -> bool:
+        conn = self._listener()
+        ready, _, _ = select.select([conn], [], [], timeout)
+        if not ready:
+            return False
+
+        conn.poll()
+        notified = any(n.payload == self.queue_name for n in conn.notifies)
+        conn.notifies.clear()
+        return notified
+
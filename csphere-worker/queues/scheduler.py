@@ -0,0 +1,214 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+from core.metrics import metrics
+from .base import QueueBackend, QueuedMessage
+
+logger = logging.getLogger(__name__)
+
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+class LaneScheduler(QueueBackend):
+    '''
+    Priority scheduler over two queues: interactive saves (extension / web app) and bulk
+    work (bookmark imports).
+
+    - Interactive messages go first. Only interactive_weight batches in a row are taken
+      while bulk work is waiting, then one bulk batch gets a turn, so neither lane starves.
+    - A user has at most bulk_user_max_in_flight bulk messages in flight, counted from
+      claim to ack across claims. Bulk messages are claimed ahead (up to max_held) and
+      held per user, every claim hands them out one per user in a rotation that carries
+      over to the next claim, so one large import can't take every slot. A user's
+      messages wait in the hold while they are at the cap, only the ones held longer than
+      hold_timeout (keep it under the queue's visibility timeout) go back to the queue.
+      Holding needs a bulk backend that redelivers unacked messages (Postgres): on
+      ActiveMQ a claim consumes the message, a crashed worker would lose what it held,
+      so only one batch is claimed and what can't be handed out is released right away.
+    - Time spent in the queue is recorded per lane (queue.wait.<lane>) from the
+      message's enqueued_at.
+
+    ack / nack / release are routed back to the lane the message came from.
+    '''
+
+    def __init__(self, interactive: QueueBackend, bulk: QueueBackend, interactive_weight: int = 4,
+                 bulk_user_max_in_flight: int = 2, max_held: int = 50, hold_timeout: float = 120.0,
+                 release_delay: float = 5.0):
+        self.lanes = {INTERACTIVE: interactive, BULK: bulk}
+        self.interactive_weight = interactive_weight
+        self.bulk_user_max_in_flight = bulk_user_max_in_flight
+        self.max_held = max_held if bulk.redelivers else 0
+        self.hold_timeout = hold_timeout
+        self.release_delay = release_delay
+        self.min_backoff = interactive.min_backoff
+        self.max_backoff = interactive.max_backoff
+
+        self._streak = 0
+        self._lock = threading.Lock()
+        self._bulk_in_flight = defaultdict(int)
+        # claimed bulk messages not handed out yet, user_id -> deque of (message, held_since).
+        # The dict's order is the rotation: a user goes to the back once served
+        self._held: dict = {}
+
+    ###############################################################################
+    # METHODS
+    ###############################################################################
+
+    def enqueue(self, body: str, db=None) -> bool:
+        lane = BULK if _read_body(body).get('priority') == BULK else INTERACTIVE
+        return self.lanes[lane].enqueue(body, db=db)
+
+    def claim(self, max_messages: int, wait: bool = True) -> list[QueuedMessage]:
+        interactive = self._claim(INTERACTIVE, max_messages, wait=False)
+        if interactive and self._streak < self.interactive_weight:
+            self._streak += 1
+            return interactive
+
+        # bulk's turn (or the interactive lane is empty)
+        self._streak = 0
+        bulk = self._claim_bulk(max(1, max_messages - len(interactive)))
+        if interactive or bulk:
+            return interactive + bulk
+
+        if not wait or self.held():
+            return []
+        # Both lanes are empty: wait on the interactive lane, bulk is checked again next round
+        return self._claim(INTERACTIVE, max_messages, wait=True)
+
+    def ack(self, message: QueuedMessage):
+        self.lanes[message.lane or INTERACTIVE].ack(message)
+        self._finished(message)
+
+    def nack(self, message: QueuedMessage):
+        self.lanes[message.lane or INTERACTIVE].nack(message)
+        self._finished(message)
+
+    def release(self, message: QueuedMessage, delay: float = 0):
+        self.lanes[message.lane or INTERACTIVE].release(message, delay=delay)
+        self._finished(message)
+
+    def close(self):
+        # held messages were never started, they go back for the next worker
+        with self._lock:
+            held = [message for messages in self._held.values() for message, _ in messages]
+            self._held = {}
+        for message in held:
+            self.lanes[BULK].release(message)
+        for backend in self.lanes.values():
+            backend.close()
+
+    def in_flight(self) -> dict:
+        with self._lock:
+            return dict(self._bulk_in_flight)
+
+    def held(self) -> dict:
+        with self._lock:
+            return {user_id: len(messages) for user_id, messages in self._held.items()}
+
+    ###############################################################################
+    # HELPER METHODS
+    ###############################################################################
+
+    def _claim(self, lane: str, max_messages: int, wait: bool) -> list[QueuedMessage]:
+        messages = self.lanes[lane].claim(max_messages, wait=wait)
+        now = datetime.now(timezone.utc)
+
+        for message in messages:
+            body = _read_body(message.body)
+            message.lane = lane
+            message.user_id = body.get('user_id')
+
+            enqueued_at = _parse_time(body.get('enqueued_at'))
+            if enqueued_at is not None:
+                metrics.observe(f'queue.wait.{lane}', max(0.0, (now - enqueued_at).total_seconds()))
+        if messages:
+            metrics.incr(f'queue.claimed.{lane}', len(messages))
+        return messages
+
+    def _claim_bulk(self, max_messages: int) -> list[QueuedMessage]:
+        if self.max_held:
+            with self._lock:
+                room = self.max_held - sum(len(messages) for messages in self._held.values())
+            # claimed ahead of what this batch needs, so the rotation sees the other users
+            # waiting behind a large import
+            claimed = self._claim(BULK, max(room, max_messages), wait=False) if room > 0 else []
+        else:
+            claimed = self._claim(BULK, max_messages, wait=False)
+
+        now = time.monotonic()
+        with self._lock:
+            for message in claimed:
+                self._held.setdefault(message.user_id, deque()).append((message, now))
+            admitted = self._admit(max_messages)
+            # nothing outlives the claim when the backend can't redeliver it
+            expired = self._expire(now, self.hold_timeout if self.max_held else 0)
+
+        for message in expired:
+            # not started, so it doesn't count as an attempt
+            self.lanes[BULK].release(message, delay=self.release_delay)
+            metrics.incr('queue.bulk.deferred')
+        return admitted
+
+    def _admit(self, max_messages: int) -> list[QueuedMessage]:
+        '''One held message per user under the cap per pass, in rotation order. Call with the lock held'''
+        admitted = []
+        progress = True
+        while progress and len(admitted) < max_messages:
+            progress = False
+            for user_id in list(self._held):
+                if len(admitted) >= max_messages:
+                    break
+                if self._bulk_in_flight.get(user_id, 0) >= self.bulk_user_max_in_flight:
+                    continue
+                messages = self._held.pop(user_id)
+                admitted.append(messages.popleft()[0])
+                self._bulk_in_flight[user_id] += 1
+                if messages:
+                    self._held[user_id] = messages
+                progress = True
+        return admitted
+
+    def _expire(self, now: float, hold_timeout: float) -> list[QueuedMessage]:
+        '''Takes the messages held longer than hold_timeout out of the hold. Call with the lock held'''
+        expired = []
+        for user_id in list(self._held):
+            messages = self._held[user_id]
+            while messages and now - messages[0][1] >= hold_timeout:
+                expired.append(messages.popleft()[0])
+            if not messages:
+                del self._held[user_id]
+        return expired
+
+    def _finished(self, message: QueuedMessage):
+        if message.lane != BULK:
+            return
+        with self._lock:
+            self._bulk_in_flight[message.user_id] -= 1
+            if self._bulk_in_flight[message.user_id] <= 0:
+                del self._bulk_in_flight[message.user_id]
+
+
+def _read_body(body: str) -> dict:
+    try:
+        data = json.loads(body)
+        return data if isinstance(data, dict) else {}
+    except (TypeError, ValueError):
+        return {}
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
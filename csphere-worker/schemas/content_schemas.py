@@ -34,10 +34,51 @@ class MessageContentPayload(BaseModel):
     source: str
     first_saved_at: datetime 
 
+class PayloadRef(BaseModel):
+    '''Claim check for an offloaded field (classes/payload_store.py)'''
+    key: str
+    sha256: str
+    size: int
+    encoding: str = 'zstd'
+
 class MessageSchema(BaseModel):
     content_payload: MessageContentPayload
     raw_html: Optional[str ] = None
+    # set instead of raw_html when the page was too large to ride in the message
+    raw_html_ref: Optional[PayloadRef] = None
+    # readable text extracted by the extension, used when there is no html
+    page_text: Optional[str] = None
     user_id: str 
     notes: Optional[str] = None  
     folder_id: Optional[str] = 'default'  
-    tag_ids: Optional[list[str]] = []
\ No newline at end of file
+    tag_ids: Optional[list[str]] = []
+    # 'interactive' (extension / web app saves) or 'bulk' (imports), set by the backend
+    priority: Optional[str] = 'interactive'
+    enqueued_at: Optional[datetime] = None
+
+class LinkedBookmark(BaseModel):
+    content_id: str
+    url: str
+    title: str | None = ''
+
+class BookmarkBatchSchema(BaseModel):
+    '''Chunk of a bookmark import (type 'bookmark_batch'), see backend import_services'''
+    type: str
+    job_id: str
+    user_id: str
+    # new urls: fetched, enriched and bucketed
+    bookmarks: list[MessageContentPayload] = []
+    # content the api already linked to the user: only bucketed
+    linked: list[LinkedBookmark] = []
+    priority: Optional[str] = 'bulk'
+    enqueued_at: Optional[datetime] = None
+
+class RebucketSchema(BaseModel):
+    '''Re-bucketing of a user's library (type 'folder_rebucket'), see backend rebucket_services'''
+    type: str
+    job_id: str
+    user_id: str
+    # True files the bookmarks, False only writes folder_suggestion rows
+    apply: bool = True
+    priority: Optional[str] = 'bulk'
+    enqueued_at: Optional[datetime] = None
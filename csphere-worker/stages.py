@@ -0,0 +1,146 @@
+import logging
+from functools import partial
+
+from core.pipeline import Stage, StagedPipeline
+from core.settings import Settings
+from core.metrics import metrics
+from core.services import get_services
+from database import get_db_connection
+from classes.EmbeddingManager import build_summary_input, build_text_summary_input
+from processors import get_processor
+from processors.base import BaseProcessor
+
+logger = logging.getLogger(__name__)
+
+# A job is a plain dict so it can cross into the parse stage's process pool:
+#   {'message': <queue message json>, 'receipt': <QueuedMessage>,
+#    'content_id': <set by the create stage>, 'needs_enrich': <content has no ContentAI yet>}
+# Archive jobs run on their own pipeline: {'content_id': ..., 'url': ...}
+
+
+def create_stage(job: dict, archive: StagedPipeline | None = None) -> dict | None:
+    '''Saves the content row and hands it to archiving straight away (quick, one commit)'''
+    message = job['message']
+    with get_db_connection() as db:
+        content_processor = get_processor('process_message')
+        content_id, needs_enrich = content_processor.create(message=message, db=db)
+
+    if not content_id:
+        logger.info("Content was not saved, stopping the job here")
+        return None
+
+    job['content_id'] = str(content_id)
+    job['needs_enrich'] = needs_enrich
+    if archive is not None:
+        schedule_archive(archive, job['content_id'], message.get('content_payload', {}).get('url'))
+    return job
+
+
+def fetch_stage(job: dict) -> dict:
+    '''Renders the page when new content came without html or text (I/O bound)'''
+    message = job['message']
+    # Enriched content only needs to be linked to the user, nothing to render.
+    # Saves from the extension carry the page it captured
+    if message.get('raw_html') or message.get('page_text') or not job.get('needs_enrich'):
+        return job
+
+    ref = message.get('raw_html_ref')
+    if ref:
+        # the compressed blob is small, the parse process decompresses it as it parses
+        message['raw_html_blob'] = get_services().payload_store.fetch(ref)
+        return job
+
+    url = message.get('content_payload', {}).get('url')
+    try:
+        message['raw_html'] = BaseProcessor.capture_page(url)
+    except Exception as e:
+        logger.warning(f"Failed to render {url}, summary will fall back to the url: {e}")
+    return job
+
+
+def parse_stage(job: dict) -> dict:
+    '''Turns the html into the summarizer input (CPU bound, runs in a process pool)'''
+    message = job['message']
+    # enriched content is only linked, its html (or payload store blob) isn't parsed
+    if not job.get('needs_enrich') or message.get('summary_input'):
+        return job
+    url = message.get('content_payload', {}).get('url')
+    raw_html = BaseProcessor.raw_html_source(message)
+    if raw_html:
+        summary_input, page_title = build_summary_input(url, raw_html)
+    elif message.get('page_text'):
+        title = message.get('content_payload', {}).get('title')
+        summary_input, page_title = build_text_summary_input(url, title, message['page_text'])
+    else:
+        return job
+
+    if summary_input:
+        message['summary_input'] = summary_input
+        message['page_title'] = page_title
+        # The html is no longer needed, don't carry it through the remaining queues
+        message['raw_html'] = None
+        message['raw_html_ref'] = None
+        message['raw_html_blob'] = None
+        message['page_text'] = None
+    return job
+
+
+def enrich_stage(job: dict) -> dict:
+    '''Summarizes and embeds content without ContentAI (I/O bound: LLM + embeddings)'''
+    if job.get('needs_enrich'):
+        with get_db_connection() as db:
+            content_processor = get_processor('process_message')
+            content_processor.enrich(message=job['message'], content_id=job['content_id'], db=db)
+    return job
+
+
+def bucket_stage(job: dict) -> dict:
+    message = job['message']
+    if message.get('folder_id') in ['default', None, '']:
+        with get_db_connection() as db:
+            bucket_processor = get_processor('process_folder')
+            bucket_processor.process(message=message, content_id=job['content_id'], db=db)
+    return job
+
+
+def archive_stage(job: dict) -> dict:
+    with get_db_connection() as db:
+        web_processor = get_processor('process_webpage')
+        web_processor.process(content_id=job['content_id'], url=job['url'], db=db)
+    return job
+
+
+def schedule_archive(archive: StagedPipeline, content_id: str, url: str) -> bool:
+    '''
+    Queues the snapshot without waiting on it. When the archive backlog is full the
+    capture is skipped, the freshness policy picks it up on the next save of the url
+    '''
+    if archive.submit({'content_id': content_id, 'url': url}, timeout=0):
+        metrics.incr('archive.scheduled')
+        return True
+
+    metrics.incr('archive.backlog_full')
+    logger.warning(f"Archive backlog is full, skipping the snapshot of {url}")
+    return False
+
+
+def build_pipeline(settings: Settings, on_complete=None, on_error=None, archive: StagedPipeline | None = None) -> StagedPipeline:
+    queue_size = settings.PIPELINE_QUEUE_SIZE
+    stages = [
+        Stage('create', partial(create_stage, archive=archive), workers=settings.PIPELINE_CREATE_WORKERS, queue_size=queue_size),
+        Stage('fetch', fetch_stage, workers=settings.PIPELINE_FETCH_WORKERS, queue_size=queue_size),
+        Stage('parse', parse_stage, workers=settings.PIPELINE_PARSE_WORKERS, queue_size=queue_size, use_processes=True),
+        Stage('enrich', enrich_stage, workers=settings.PIPELINE_ENRICH_WORKERS, queue_size=queue_size),
+        Stage('bucket', bucket_stage, workers=settings.PIPELINE_BUCKET_WORKERS, queue_size=queue_size),
+    ]
+    return StagedPipeline(stages, on_complete=on_complete, on_error=on_error)
+
+
+def build_archive_pipeline(settings: Settings) -> StagedPipeline:
+    '''
+    Archiving runs beside the message pipeline with its own queue and workers, so a slow
+    snapshot never holds up the summary of the message that scheduled it
+    '''
+    return StagedPipeline([
+        Stage('archive', archive_stage, workers=settings.PIPELINE_ARCHIVE_WORKERS, queue_size=settings.ARCHIVE_QUEUE_SIZE),
+    ])
@@ -0,0 +1,23 @@
+import gzip
+import hashlib
+
+from classes.archive_store import LocalArchiveStore
+
+
+def test_local_store_compresses_and_deduplicates(tmp_path):
+    store = LocalArchiveStore(str(tmp_path), encoding='gzip')
+    snapshot = b'<html><body>' + b'<p>archived page</p>' * 5000 + b'</body></html>'
+
+    first = store.put(snapshot)
+    second = store.put(snapshot)
+
+    digest = hashlib.sha256(snapshot).hexdigest()
+    assert first.key == f'archives/sha256/{digest}.html.gz'
+    assert not first.deduplicated
+    assert second.deduplicated and second.key == first.key
+    assert first.stored_size < len(snapshot)
+
+    stored_file = tmp_path / 'archives' / 'sha256' / f'{digest}.html.gz'
+    assert gzip.decompress(stored_file.read_bytes()) == snapshot
+    assert store.read(first.key) == snapshot
+    assert len(list((tmp_path / 'archives' / 'sha256').iterdir())) == 1
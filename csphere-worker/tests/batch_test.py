@@ -0,0 +1,95 @@
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from tests.conftest import as_array, vector
+
+
+def _item(url, summary=None, embedding=None, categories=()):
+    from schemas.content_schemas import MessageContentPayload
+
+    bookmark = MessageContentPayload(url=url, title='', source='chrome', first_saved_at=datetime.now(timezone.utc))
+    return {'bookmark': bookmark, 'title': url, 'summary': summary, 'categories': list(categories), 'embedding': embedding}
+
+
+def test_record_import_progress_completes_the_job(library):
+    from processors.batch import record_import_progress
+
+    job_id = library.job('bookmark_import')
+    library.db.execute(
+        library.text("UPDATE background_job SET status = 'running', enqueued = 3 WHERE job_id = :job_id"),
+        {'job_id': job_id},
+    )
+    library.db.commit()
+
+    record_import_progress(library.db, str(job_id), 2)
+    assert library.job_row(job_id)['status'] == 'running'
+    assert library.job_row(job_id)['processed'] == 2
+
+    record_import_progress(library.db, str(job_id), 1)
+    assert library.job_row(job_id)['status'] == 'completed'
+    assert library.job_row(job_id)['processed'] == 3
+
+
+def test_write_saves_new_content_and_enriches_existing(library):
+    from classes.category_registry import CategoryRegistry
+    from database import engine
+    from processors.batch import BatchProcessor
+
+    prefix = f"test-{uuid.uuid4()}"
+    unenriched = library.content(url=f"https://{prefix}.test/unenriched")
+    enriched = library.content(vector(0, 1), url=f"https://{prefix}.test/enriched")
+    existing = {
+        f"https://{prefix}.test/unenriched": unenriched,
+        f"https://{prefix}.test/enriched": enriched,
+    }
+
+    items = [
+        _item(f"https://{prefix}.test/new", 'a summary', vector(1), [f"{prefix} category"]),
+        _item(f"https://{prefix}.test/failed"),
+        _item(f"https://{prefix}.test/unenriched", 'summary of the old one', vector(0, 0, 1)),
+    ]
+    saved_at = {item['bookmark'].url: item['bookmark'].first_saved_at for item in items}
+    services = SimpleNamespace(
+        settings=SimpleNamespace(IAB_LINK_CATEGORIES=False), categorizer=None,
+        category_registry=CategoryRegistry(engine),
+    )
+
+    try:
+        content_ids, created_urls = BatchProcessor(services)._write(
+            library.db, str(library.user_id), items, existing, saved_at,
+        )
+        library.db.commit()
+        library.content_ids.extend(content_ids[url] for url in created_urls)
+
+        assert created_urls == {f"https://{prefix}.test/new", f"https://{prefix}.test/failed"}
+        assert content_ids[f"https://{prefix}.test/unenriched"] == unenriched
+
+        # every url is saved for the user
+        saved = {row[0] for row in library.db.execute(
+            library.text("SELECT content_id FROM content_item WHERE user_id = :user_id"), {'user_id': library.user_id},
+        ).all()}
+        assert saved == set(content_ids.values())
+
+        ai = {row.content_id: row for row in library.db.execute(
+            library.text("SELECT content_id, ai_summary, embedding FROM content_ai WHERE content_id = ANY(:ids)"),
+            {'ids': list(content_ids.values())},
+        ).all()}
+        # the failed one is saved without ContentAI, the existing one without any gets it
+        assert set(ai) == {content_ids[f"https://{prefix}.test/new"], unenriched, enriched}
+        assert ai[unenriched].ai_summary == 'summary of the old one'
+        assert as_array(ai[enriched].embedding)[1] == 1.0
+
+        linked = library.db.execute(library.text(
+            "SELECT content_category.content_id FROM content_category JOIN category USING (category_id) "
+            "WHERE category.category_name = :name"
+        ), {'name': f"{prefix} category"}).all()
+        assert [row[0] for row in linked] == [content_ids[f"https://{prefix}.test/new"]]
+    finally:
+        library.db.rollback()
+        library.db.execute(library.text(
+            "DELETE FROM content_category WHERE category_id IN "
+            "(SELECT category_id FROM category WHERE category_name LIKE :pattern)"
+        ), {'pattern': f"{prefix}%"})
+        library.db.execute(library.text("DELETE FROM category WHERE category_name LIKE :pattern"), {'pattern': f"{prefix}%"})
+        library.db.commit()
@@ -0,0 +1,56 @@
+import threading
+
+from classes.batching import MicroBatcher, split_batches
+from tests.conftest import drifted
+
+
+def test_split_batches_respects_size_and_budget():
+    texts = ['a' * 40, 'b' * 40, 'c' * 40, 'd' * 400, 'e']
+    batches = split_batches(texts, max_batch_size=2, max_tokens=25, cost=lambda text: len(text) // 4)
+
+    assert batches == [[0, 1], [2], [3], [4]]
+
+
+def test_concurrent_submits_share_one_call_and_keep_their_results():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait=0.2)
+    results = {}
+    start = threading.Barrier(5)
+
+    def caller(n):
+        start.wait()
+        results[n] = batcher.submit(n, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert results == {n: n * 10 for n in range(5)}
+    assert len(calls) == 1
+    assert batcher.stats()['avg_batch_size'] == 5
+
+
+def test_failed_batch_raises_in_every_caller():
+    def batch_fn(items):
+        raise RuntimeError('rate limited')
+
+    batcher = MicroBatcher(batch_fn, max_wait=0)
+    try:
+        batcher.submit('text', timeout=5)
+        assert False, 'expected the batch error'
+    except RuntimeError as e:
+        assert 'rate limited' in str(e)
+    finally:
+        batcher.close()
+
+
+def test_backend_copy_matches():
+    assert drifted('csphere-worker/classes/batching.py', 'backend/app/ai/batching.py') == []
@@ -1,5 +1,6 @@
 from processors import get_processor
 from processors.bucket import BucketProcessor
+from database import get_db_connection
 
 
         # "content_payload": {
@@ -44,7 +45,8 @@ content_id = '8ed8a17b-53f1-4c86-9f7d-39a60085fe85'
 def testBucket():
 
     bucket_processor : BucketProcessor = get_processor('process_folder')
-    status = bucket_processor.process(test_data, content_id)
+    with get_db_connection() as db:
+        status = bucket_processor.process(test_data, content_id, db=db)
 
     if status == True:
         print('sucesfully bucket the item')
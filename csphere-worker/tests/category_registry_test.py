@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+
+from tests.conftest import drifted
+
+
+def test_backend_copy_matches():
+    assert drifted(
+        'csphere-worker/classes/category_registry.py', 'backend/app/embeddings/category_registry.py',
+    ) == []
+
+
+@pytest.fixture
+def registry(live_db):
+    from sqlalchemy import text
+
+    from classes.category_registry import CategoryRegistry
+    from database import engine
+
+    prefix = f"test-{uuid.uuid4()}"
+    yield CategoryRegistry(engine), prefix
+
+    params = {'pattern': f"{prefix}%"}
+    live_db.execute(text(
+        "DELETE FROM content_category WHERE category_id IN "
+        "(SELECT category_id FROM category WHERE category_name LIKE :pattern)"
+    ), params)
+    live_db.execute(text("DELETE FROM category WHERE category_name LIKE :pattern"), params)
+    live_db.commit()
+
+
+def test_ids_creates_missing_categories_once(registry):
+    registry, prefix = registry
+    first = registry.ids([f"{prefix} a", f" {prefix} a ", f"{prefix} b", '', '  ', None])
+    assert sorted(first) == [f"{prefix} a", f"{prefix} b"]
+
+    # served from the map, the same ids
+    assert registry.ids([f"{prefix} b", f"{prefix} a"]) == first
+
+
+def test_category_created_by_another_process(registry):
+    from classes.category_registry import CategoryRegistry
+    from database import engine
+
+    registry, prefix = registry
+    other = CategoryRegistry(engine)
+    other.ids([f"{prefix} warm"])
+
+    created = registry.ids([f"{prefix} raced"])
+    # other warmed before the insert, its ON CONFLICT falls back to the existing row
+    assert other.ids([f"{prefix} raced"]) == created
+
+
+def test_link_is_idempotent(registry, library):
+    from sqlalchemy import text
+
+    registry, prefix = registry
+    first, second = library.content(), library.content()
+    links = {first: [f"{prefix} a", f"{prefix} b", ''], second: [f"{prefix} a"]}
+
+    registry.link(library.db, links)
+    registry.link(library.db, links)
+    library.db.commit()
+
+    rows = library.db.execute(text(
+        "SELECT content_category.content_id, category.category_name FROM content_category "
+        "JOIN category USING (category_id) WHERE category.category_name LIKE :pattern"
+    ), {'pattern': f"{prefix}%"}).all()
+    assert sorted((content_id, name) for content_id, name in rows) == sorted([
+        (first, f"{prefix} a"), (first, f"{prefix} b"), (second, f"{prefix} a"),
+    ])
@@ -0,0 +1,231 @@
+import ast
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+DIMS = 1536
+REPO = Path(__file__).resolve().parents[2]
+
+
+def vector(*head: float) -> list[float]:
+    '''A 1536 dims embedding starting with head, zeros after'''
+    return list(head) + [0.0] * (DIMS - len(head))
+
+
+def as_array(value):
+    '''Vector column read back with or without the pgvector type registered'''
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def drifted(worker: str, copy: str, local: tuple = ()) -> list[str]:
+    '''
+    Names of the functions, methods and constants whose code differs between the worker module and
+    its copy in another service (paths from the repo root). Only definitions both have are
+    compared, less metrics calls (the worker reports them) and the ones listed in local
+    '''
+    worker_definitions, copy_definitions = _definitions(REPO / worker), _definitions(REPO / copy)
+    return sorted(
+        name for name in worker_definitions.keys() & copy_definitions.keys()
+        if name not in local and worker_definitions[name] != copy_definitions[name]
+    )
+
+
+class Library:
+    '''
+    A throwaway user in the live database with helpers to create folders and bookmarks.
+    Rows are committed (concurrency tests need other sessions to see them) and deleted
+    by cleanup()
+    '''
+
+    def __init__(self, db):
+        from sqlalchemy import text
+
+        self.db = db
+        self.text = text
+        self.user_id = uuid.uuid4()
+        self.content_ids = []
+        db.execute(
+            text("INSERT INTO users (id, email, username, password) VALUES (:id, :email, 'test', '')"),
+            {'id': self.user_id, 'email': f"{self.user_id}@test.local"},
+        )
+        db.commit()
+
+    def folder(self, seed=None, embedding=None, bucketing: bool = True, keywords=(), url_patterns=(),
+               description: str = '', name: str = '') -> uuid.UUID:
+        folder_id = uuid.uuid4()
+        self.db.execute(
+            self.text(
+                "INSERT INTO folder (folder_id, user_id, parent_id, folder_name, bucketing_mode, keywords, "
+                "url_patterns, description, folder_seed, folder_embedding) VALUES (:folder_id, :user_id, "
+                ":folder_id, :name, :bucketing, :keywords, :url_patterns, :description, "
+                "CAST(:seed AS vector), CAST(:embedding AS vector))"
+            ),
+            {
+                'folder_id': folder_id, 'user_id': self.user_id, 'name': name or str(folder_id),
+                'bucketing': bucketing, 'keywords': list(keywords), 'url_patterns': list(url_patterns),
+                'description': description, 'seed': _literal(seed), 'embedding': _literal(embedding),
+            },
+        )
+        self.db.commit()
+        return folder_id
+
+    def content(self, embedding=None, url: str = '', title: str = '', summary: str = '') -> uuid.UUID:
+        '''A bookmark saved by the user, with ContentAI when embedding is given'''
+        content_id = uuid.uuid4()
+        self.db.execute(
+            self.text("INSERT INTO content (content_id, url, title) VALUES (:content_id, :url, :title)"),
+            {'content_id': content_id, 'url': url or f"https://test.local/{content_id}", 'title': title},
+        )
+        self.db.execute(
+            self.text("INSERT INTO content_item (user_id, content_id, notes) VALUES (:user_id, :content_id, '')"),
+            {'user_id': self.user_id, 'content_id': content_id},
+        )
+        self.content_ids.append(content_id)
+        if embedding is not None:
+            self.embed(content_id, embedding, summary)
+        self.db.commit()
+        return content_id
+
+    def embed(self, content_id, embedding, summary: str = ''):
+        self.db.execute(
+            self.text(
+                "INSERT INTO content_ai (content_id, ai_summary, embedding) "
+                "VALUES (:content_id, :summary, CAST(:embedding AS vector))"
+            ),
+            {'content_id': content_id, 'summary': summary, 'embedding': _literal(embedding)},
+        )
+        self.db.commit()
+
+    def file(self, folder_id, content_id):
+        '''folder_item row only, the profile is left to the code under test'''
+        self.db.execute(
+            self.text(
+                "INSERT INTO folder_item (folder_item_id, folder_id, user_id, content_id) "
+                "VALUES (:id, :folder_id, :user_id, :content_id)"
+            ),
+            {'id': uuid.uuid4(), 'folder_id': folder_id, 'user_id': self.user_id, 'content_id': content_id},
+        )
+        self.db.commit()
+
+    def job(self, kind: str = 'folder_rebucket') -> uuid.UUID:
+        job_id = uuid.uuid4()
+        self.db.execute(
+            self.text("INSERT INTO background_job (job_id, user_id, kind) VALUES (:job_id, :user_id, :kind)"),
+            {'job_id': job_id, 'user_id': self.user_id, 'kind': kind},
+        )
+        self.db.commit()
+        return job_id
+
+    def job_row(self, job_id) -> dict:
+        row = self.db.execute(
+            self.text("SELECT status, total, processed, linked, error FROM background_job WHERE job_id = :job_id"),
+            {'job_id': job_id},
+        ).one()
+        self.db.commit()
+        return dict(row._mapping)
+
+    def profile(self, folder_id) -> dict:
+        row = self.db.execute(
+            self.text(
+                "SELECT folder_seed, embedding_sum, member_count, folder_embedding FROM folder "
+                "WHERE folder_id = :folder_id"
+            ),
+            {'folder_id': folder_id},
+        ).one()
+        return {
+            'seed': as_array(row.folder_seed),
+            'sum': as_array(row.embedding_sum),
+            'count': row.member_count,
+            'embedding': as_array(row.folder_embedding),
+        }
+
+    def filed(self, folder_id=None) -> list[tuple]:
+        '''(folder_id, content_id, profiled) of the user's folder_item rows'''
+        query = "SELECT folder_id, content_id, profiled FROM folder_item WHERE user_id = :user_id"
+        if folder_id is not None:
+            query += " AND folder_id = :folder_id"
+        return [tuple(row) for row in self.db.execute(
+            self.text(query), {'user_id': self.user_id, 'folder_id': folder_id},
+        ).all()]
+
+    def cleanup(self):
+        self.db.rollback()
+        params = {'user_id': self.user_id, 'content_ids': self.content_ids}
+        for statement in (
+            "DELETE FROM folder_suggestion WHERE user_id = :user_id",
+            "DELETE FROM folder_item WHERE user_id = :user_id",
+            "DELETE FROM folder WHERE user_id = :user_id",
+            "DELETE FROM background_job WHERE user_id = :user_id",
+            "DELETE FROM content_category WHERE content_id = ANY(:content_ids)",
+            "DELETE FROM content_ai WHERE content_id = ANY(:content_ids)",
+            "DELETE FROM content_item WHERE user_id = :user_id",
+            "DELETE FROM content WHERE content_id = ANY(:content_ids)",
+            "DELETE FROM users WHERE id = :user_id",
+        ):
+            self.db.execute(self.text(statement), params)
+        self.db.commit()
+
+
+@pytest.fixture
+def live_db():
+    '''
+    Session on DATABASE_URL, a database migrated to head like the one bucket_test.py
+    runs against. Skipped when none is configured
+    '''
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if not os.getenv('DATABASE_URL'):
+        pytest.skip('needs DATABASE_URL (a migrated postgres with pgvector)')
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def library(live_db):
+    library = Library(live_db)
+    try:
+        yield library
+    finally:
+        library.cleanup()
+
+
+def _definitions(path: Path) -> dict[str, list[str]]:
+    source = path.read_text()
+    found = {}
+
+    def collect(nodes, prefix=''):
+        for node in nodes:
+            if isinstance(node, ast.ClassDef):
+                collect(node.body, f"{node.name}.")
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                lines = ast.get_source_segment(source, node).splitlines()
+                found[prefix + node.name] = [line for line in lines if 'metrics.' not in line]
+            elif isinstance(node, ast.Assign) and all(isinstance(target, ast.Name) for target in node.targets):
+                # constants, the SQL most of these modules keep at module or class level
+                for target in node.targets:
+                    found[prefix + target.id] = [ast.get_source_segment(source, node)]
+
+    collect(ast.parse(source).body)
+    return found
+
+
+def _literal(embedding):
+    if embedding is None:
+        return None
+    return '[' + ','.join(f"{float(value):.8g}" for value in embedding) + ']'
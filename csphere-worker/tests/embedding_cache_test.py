@@ -0,0 +1,93 @@
+import uuid
+
+from classes.embedding_cache import EmbeddingCache, PostgresEmbeddingStore, text_hash
+from tests.conftest import drifted
+
+
+class MemoryStore:
+    def __init__(self):
+        self.rows = {}
+
+    def get_many(self, model, dims, hashes):
+        return {key: self.rows[(model, dims, key)] for key in hashes if (model, dims, key) in self.rows}
+
+    def put_many(self, model, dims, entries):
+        for key, vector in entries.items():
+            self.rows[(model, dims, key)] = vector
+
+
+def test_identical_texts_are_embedded_once():
+    calls = []
+
+    def embed_fn(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    store = MemoryStore()
+    cache = EmbeddingCache(store=store, max_entries=10)
+
+    first = cache.embed_many('model', 1, ['Initial user embedding', 'Initial  user embedding ', 'other'], embed_fn)
+    assert first == [[22.0], [22.0], [5.0]]
+    assert calls == [['Initial user embedding', 'other']]
+
+    # a new process only has the store
+    fresh = EmbeddingCache(store=store, max_entries=10)
+    assert fresh.embed_many('model', 1, ['other'], embed_fn) == [[5.0]]
+    assert len(calls) == 1
+    assert fresh.stats()['store_hits'] == 1
+
+    # another model is another key
+    cache.embed_many('other-model', 1, ['other'], embed_fn)
+    assert len(calls) == 2
+
+
+def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put_many('model', 1, ['a', 'b'], [[1.0], [2.0]])
+    cache.get_many('model', 1, ['a'])
+    cache.put_many('model', 1, ['c'], [[3.0]])
+
+    assert cache.get_many('model', 1, ['a', 'b', 'c']) == [[1.0], None, [3.0]]
+    assert cache.stats()['entries'] == 2
+
+
+def test_copies_share_the_store_and_the_cache():
+    for copy in ('backend/app/embeddings/embedding_cache.py', 'user-embedding-worker/classes/embedding_cache.py'):
+        assert drifted('csphere-worker/classes/embedding_cache.py', copy) == []
+
+
+def test_reads_touch_only_stale_rows(live_db):
+    from sqlalchemy import text
+
+    from database import engine
+
+    model = f"test-{uuid.uuid4()}"
+    store = PostgresEmbeddingStore(engine, touch_after=3600)
+    key = text_hash('touched')
+
+    def last_used_at():
+        value = live_db.execute(
+            text("SELECT last_used_at FROM embedding_cache WHERE model = :model"), {'model': model},
+        ).scalar_one()
+        live_db.commit()
+        return value
+
+    try:
+        store.put_many(model, 2, {key: [1.0, 2.0]})
+        live_db.execute(
+            text("UPDATE embedding_cache SET last_used_at = now() - interval '2 hours' WHERE model = :model"),
+            {'model': model},
+        )
+        live_db.commit()
+        stale = last_used_at()
+
+        assert store.get_many(model, 2, [key]) == {key: [1.0, 2.0]}
+        touched = last_used_at()
+        assert touched > stale
+
+        # used again within touch_after: read without a write
+        assert store.get_many(model, 2, [key]) == {key: [1.0, 2.0]}
+        assert last_used_at() == touched
+    finally:
+        live_db.execute(text("DELETE FROM embedding_cache WHERE model = :model"), {'model': model})
+        live_db.commit()
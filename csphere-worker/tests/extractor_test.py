@@ -0,0 +1,40 @@
+from classes.extractor import extract
+
+
+PAGE = '''<!DOCTYPE html><html><head>
+<title> A page </title>
+<meta name="description" content="plain description">
+<meta property="og:description" content="og description">
+<meta name="keywords" content="python, html">
+<script>var tracking = 1;</script>
+</head><body>
+<nav><ul><li>Home</li><li>About</li></ul></nav>
+<div class="sidebar"><p>Related</p></div>
+<div class="content"><h1>Headline</h1>%s</div>
+<footer><p>© 2024 all rights reserved</p></footer>
+</body></html>'''
+
+
+def test_metadata_and_main_text():
+    html = PAGE % ('<p>First paragraph of the article.</p>' * 10)
+    metadata = extract(html)
+
+    assert metadata['title'] == 'A page'
+    assert metadata['description'] == 'og description'
+    assert metadata['tags'] == ['python', 'html']
+    assert metadata['body_text'].startswith('Headline First paragraph')
+    for boilerplate in ('Home', 'Related', 'tracking', '©'):
+        assert boilerplate not in metadata['body_text']
+
+
+def test_body_text_and_input_are_bounded():
+    html = PAGE % ('<p>%s</p>' % ('word ' * 200) * 500)
+
+    assert len(extract(html, max_chars=1000)['body_text']) == 1000
+    # the head still parses when the rest of the page is cut off
+    assert extract(html, max_bytes=600)['title'] == 'A page'
+
+
+def test_empty_and_unstructured_pages():
+    assert extract('')['body_text'] == ''
+    assert extract('<html><body>just text <div>in divs</div></body></html>')['body_text'] == 'just text in divs'
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import numpy as np
+from rapidfuzz import fuzz
+
+from classes.folder_matcher import FolderMatcher, assign_folders
+
+
+FOLDERS = [
+    SimpleNamespace(folder_id='music', keywords=['Playlist', 'album', 'album'], url_patterns=['spotify\\.com', '[bad'], description='Songs and albums'),
+    SimpleNamespace(folder_id='code', keywords=['python', 'py'], url_patterns=['GITHUB\\.com/.+'], description=None),
+    SimpleNamespace(folder_id='empty', keywords=[], url_patterns=[], description='   '),
+]
+
+
+def _loop_score(folder, content_text):
+    '''The per folder loop the matcher replaces'''
+    score = 0.0
+    if folder.keywords:
+        score += sum(1 for kw in folder.keywords if kw.lower() in content_text) / len(folder.keywords) * 0.2
+    if folder.description and folder.description.strip():
+        score += fuzz.token_set_ratio(folder.description.lower(), content_text) / 100.0 * 0.3
+    return score
+
+
+def test_scores_match_the_per_folder_loop():
+    matcher = FolderMatcher(FOLDERS)
+    for text in ('my python playlist with every album', 'nothing relevant here', ''):
+        scores = matcher.scores(text)
+        for folder in FOLDERS:
+            assert abs(scores[folder.folder_id] - _loop_score(folder, text)) < 1e-5
+
+
+def test_url_patterns():
+    matcher = FolderMatcher(FOLDERS)
+    assert matcher.url_matches('https://open.spotify.com/track/1') == ['music']
+    assert matcher.url_matches('https://github.com/crosve/csphere') == ['code']
+    assert matcher.url_matches('https://example.com') == []
+    assert matcher.url_match('https://example.com') is None
+    assert matcher.positions == {'music': 0, 'code': 1, 'empty': 2}
+
+    # patterns that can't be combined are still checked one by one
+    folders = [SimpleNamespace(folder_id='a', keywords=[], url_patterns=['(?i)docs', '(ab)\\1'], description='')]
+    matcher = FolderMatcher(folders)
+    assert matcher._url_filter is None
+    assert matcher.url_matches('https://x.io/abab') == ['a']
+    assert matcher.url_matches('https://docs.x.io') == ['a']
+
+
+def test_url_rule_picks_the_most_specific_folder():
+    folders = [
+        SimpleNamespace(folder_id='dev', keywords=[], url_patterns=['github\\.com'], description=''),
+        SimpleNamespace(folder_id='mine', keywords=[], url_patterns=['github\\.com/crosve/'], description=''),
+    ]
+    matcher = FolderMatcher(folders)
+    assert matcher.url_match('https://github.com/crosve/csphere') == 'mine'
+    assert matcher.url_match('https://github.com/python/cpython') == 'dev'
+    assert matcher.url_match('https://gitlab.com/crosve/') is None
+
+
+def test_no_folders():
+    matcher = FolderMatcher([])
+    assert matcher.scores('text') == {}
+    assert matcher.url_matches('https://example.com') == []
+    assert matcher.url_match('https://example.com') is None
+
+
+def test_assign_folders_matches_per_content_scoring():
+    matcher = FolderMatcher(FOLDERS)
+    texts = ['my python playlist with every album', 'nothing relevant here', 'python py']
+    embeddings = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 0]], dtype=np.float32)
+    # 'empty' has no profile yet, vector recall never returns it
+    folder_matrix = np.array([[2, 0, 0], [0, 0, 1], [0, 0, 0]], dtype=np.float32)
+    rules = np.array([-1, -1, 1])
+
+    best, scores = assign_folders(embeddings, folder_matrix, matcher.lexical_matrix(texts), rules)
+
+    expected = 0.5 + _loop_score(FOLDERS[0], texts[0])
+    assert best[0] == 0 and abs(scores[0] - expected) < 1e-5
+    # no folder is similar at all and the text matches nothing
+    assert best[1] == -1
+    # content without an embedding still follows a url rule
+    assert best[2] == 1 and scores[2] == 1.0
@@ -0,0 +1,159 @@
+import threading
+import time
+
+import numpy as np
+
+from classes.folder_profile import (
+    SEED_WEIGHT, add_to_filed_profiles, add_to_folder_profile, remove_from_folder_profile, set_folder_seed,
+)
+from tests.conftest import drifted, vector
+
+
+A, B, C = vector(1, 0, 0), vector(0, 2, 0), vector(0, 0, 3)
+META = vector(1, 1, 1)
+
+
+def _close(actual, expected):
+    return actual is not None and np.allclose(actual, np.asarray(expected, dtype=np.float32), atol=1e-5)
+
+
+def test_backend_copy_matches():
+    assert drifted('csphere-worker/classes/folder_profile.py', 'backend/app/embeddings/folder_profile.py') == []
+
+
+def test_remove_is_the_inverse_of_add(library):
+    db = library.db
+    folder_id = library.folder()
+    set_folder_seed(db, folder_id, META)
+    a, b = library.content(A), library.content(B)
+    library.file(folder_id, a)
+    library.file(folder_id, b)
+
+    assert add_to_folder_profile(db, folder_id, [a, b])
+    db.commit()
+    profile = library.profile(folder_id)
+    assert profile['count'] == 2
+    assert _close(profile['embedding'], np.asarray(META) * SEED_WEIGHT + np.asarray(A) + np.asarray(B))
+
+    assert remove_from_folder_profile(db, folder_id, [a])
+    db.commit()
+    profile = library.profile(folder_id)
+    assert profile['count'] == 1
+    assert _close(profile['sum'], B)
+
+    assert remove_from_folder_profile(db, folder_id, [b])
+    db.commit()
+    profile = library.profile(folder_id)
+    assert profile['count'] == 0
+    assert _close(profile['embedding'], np.asarray(META) * SEED_WEIGHT)
+
+
+def test_items_are_counted_once(library):
+    db = library.db
+    folder_id = library.folder()
+    a, c = library.content(A), library.content(C)
+    library.file(folder_id, a)
+    library.file(folder_id, c)
+
+    assert add_to_folder_profile(db, folder_id, [a])
+    assert not add_to_folder_profile(db, folder_id, [a])
+    # c was never added, removing it leaves the profile alone
+    assert not remove_from_folder_profile(db, folder_id, [c])
+    db.commit()
+
+    profile = library.profile(folder_id)
+    assert profile['count'] == 1
+    assert _close(profile['sum'], A)
+    assert sorted(profiled for _, _, profiled in library.filed(folder_id)) == [False, True]
+
+
+def test_content_embedded_after_filing_joins_every_folder(library):
+    db = library.db
+    first, second = library.folder(), library.folder()
+    c = library.content()
+    library.file(first, c)
+    library.file(second, c)
+
+    # no embedding yet: nothing to add
+    assert not add_to_folder_profile(db, first, [c])
+    library.embed(c, C)
+    assert add_to_filed_profiles(db, [c])
+    db.commit()
+
+    for folder_id in (first, second):
+        profile = library.profile(folder_id)
+        assert profile['count'] == 1
+        assert _close(profile['sum'], C)
+
+
+def test_folder_without_seed_is_null_when_empty(library):
+    db = library.db
+    folder_id = library.folder()
+    a = library.content(A)
+    library.file(folder_id, a)
+
+    add_to_folder_profile(db, folder_id, [a])
+    db.commit()
+    assert _close(library.profile(folder_id)['embedding'], A)
+
+    remove_from_folder_profile(db, folder_id, [a])
+    db.commit()
+    # never a zero vector, its cosine distance is NaN
+    assert library.profile(folder_id)['embedding'] is None
+
+
+def test_folder_not_backfilled_keeps_its_profile(library):
+    db = library.db
+    old = vector(5, 5, 5)
+    folder_id = library.folder(embedding=old)
+    a = library.content(A)
+    library.file(folder_id, a)
+
+    add_to_folder_profile(db, folder_id, [a])
+    db.commit()
+    profile = library.profile(folder_id)
+    assert _close(profile['embedding'], old)
+    assert _close(profile['sum'], A)
+
+    remove_from_folder_profile(db, folder_id, [a])
+    db.commit()
+    assert _close(library.profile(folder_id)['embedding'], old)
+
+    # the backfill rebuilds it from the seed and what the folder learned
+    add_to_folder_profile(db, folder_id, [a])
+    set_folder_seed(db, folder_id, META)
+    db.commit()
+    assert _close(library.profile(folder_id)['embedding'], np.asarray(META) * SEED_WEIGHT + np.asarray(A))
+
+
+def test_concurrent_adds_count_once(library):
+    from database import SessionLocal
+
+    folder_id = library.folder()
+    a = library.content(A)
+    library.file(folder_id, a)
+
+    results = {}
+    first = SessionLocal()
+    second = SessionLocal()
+    try:
+        results['first'] = add_to_folder_profile(first, folder_id, [a])
+
+        def add_again():
+            # waits on the first transaction's row lock, then sees the item counted
+            results['second'] = add_to_folder_profile(second, folder_id, [a])
+            second.commit()
+
+        thread = threading.Thread(target=add_again)
+        thread.start()
+        time.sleep(0.2)
+        first.commit()
+        thread.join(timeout=10)
+    finally:
+        first.close()
+        second.close()
+
+    assert results == {'first': True, 'second': False}
+    profile = library.profile(folder_id)
+    assert profile['count'] == 1
+    assert _close(profile['sum'], A)
@@ -0,0 +1,79 @@
+from classes.iab_centroids import CentroidIndex, CentroidCategorizer, category_labels, taxonomy_labels
+from tests.conftest import drifted
+
+
+def _embed_many(texts):
+    # one axis per tier 1 category
+    tiers = sorted({text.split(':')[0] for text in texts})
+    return [[1.0 if tier == text.split(':')[0] else 0.0 for tier in tiers] for text in texts]
+
+
+def test_summary_scores_against_every_centroid():
+    index = CentroidIndex.build(_embed_many, model='test')
+    keys, _ = taxonomy_labels()
+    assert index.matrix.shape[0] == len(keys)
+
+    science = sorted({key.split('/')[0] for key in keys}).index('Science')
+    vector = [0.0] * index.matrix.shape[1]
+    vector[science] = 2.0
+
+    categories = index.categorize(vector, cutoff=0.5, top_k=3)
+    assert len(categories) == 3
+    for key, values in categories.items():
+        assert key.startswith('Science/')
+        assert values[0][1] == 1.0
+
+    # nothing clears the cutoff
+    assert index.categorize([0.0] * index.matrix.shape[1], cutoff=0.1) == {}
+
+
+def test_centroids_are_saved_and_reloaded(tmp_path):
+    path = str(tmp_path / 'iab.npz')
+    calls = []
+
+    def embed_many(texts):
+        calls.append(len(texts))
+        return _embed_many(texts)
+
+    first = CentroidIndex.load_or_build(path, embed_many, model='test')
+    second = CentroidIndex.load_or_build(path, embed_many, model='test')
+    assert len(calls) == 1
+    assert second.keys == first.keys
+
+    # another embedding model can't reuse them
+    CentroidIndex.load_or_build(path, embed_many, model='other')
+    assert len(calls) == 2
+
+
+def test_categorizer_loads_the_index_once():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return CentroidIndex.build(_embed_many)
+
+    categorizer = CentroidCategorizer(load, lambda text: None)
+    assert categorizer.categorize('') == {}
+    assert loads == []
+    categorizer.categorize('summary', embedding=[1.0] + [0.0] * 28)
+    categorizer.categorize('summary', embedding=[1.0] + [0.0] * 28)
+    assert loads == [1]
+
+
+def test_category_labels_best_first():
+    categories = {
+        'Science/Physics': [('Physics', 0.41)],
+        'Science/Chemistry': [('Chemistry', 0.83)],
+    }
+    assert category_labels(categories) == ['Chemistry', 'Physics']
+    assert category_labels({}) == []
+
+
+def test_every_label_has_one_centroid():
+    keys, _ = taxonomy_labels()
+    labels = [key.split('/', 1)[-1] for key in keys]
+    assert len(labels) == len(set(labels))
+
+
+def test_backend_copy_matches():
+    assert drifted('csphere-worker/classes/iab_centroids.py', 'backend/app/classes/iab_centroids.py') == []
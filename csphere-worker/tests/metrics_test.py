@@ -0,0 +1,18 @@
+from core.metrics import Metrics
+
+
+def test_metrics_counts_and_times():
+    metrics = Metrics()
+    metrics.incr('archive.decision.reuse_fresh')
+    metrics.incr('archive.decision.reuse_fresh')
+    metrics.incr('queue.claimed', 5)
+    metrics.observe('stage.enrich', 0.2)
+    metrics.observe('stage.enrich', 0.4)
+
+    snapshot = metrics.snapshot(prefix='archive.')
+    assert snapshot['counters'] == {'archive.decision.reuse_fresh': 2}
+
+    timing = metrics.snapshot()['timings']['stage.enrich']
+    assert timing['count'] == 2
+    assert timing['avg_ms'] == 300.0
+    assert timing['max_ms'] == 400.0
@@ -0,0 +1,36 @@
+import json
+
+from classes.extractor import extract
+from classes.payload_store import LocalPayloadStore, offload_payload, stream_blob, message_digest
+from tests.conftest import drifted
+
+
+PAGE = '<html><head><title>Big page</title></head><body>%s</body></html>' % ('<p>paragraph text</p>' * 20_000)
+
+
+def test_large_html_is_offloaded_and_streamed_back(tmp_path):
+    store = LocalPayloadStore(str(tmp_path))
+    message = {'content_payload': {'url': 'https://example.com'}, 'raw_html': PAGE}
+
+    offloaded = offload_payload(message, store, threshold=64 * 1024)
+    assert offloaded['raw_html'] is None
+    assert offloaded['raw_html_ref']['size'] == len(PAGE)
+    # the message no longer grows with the page
+    assert len(json.dumps(offloaded)) < 512
+
+    assert store.read(offloaded['raw_html_ref']) == PAGE.encode('utf-8')
+    assert extract(store.stream(offloaded['raw_html_ref']))['title'] == 'Big page'
+    assert extract(stream_blob(store.fetch(offloaded['raw_html_ref'])))['title'] == 'Big page'
+
+    # same page, same blob
+    assert offload_payload(message, store, threshold=64 * 1024)['raw_html_ref'] == offloaded['raw_html_ref']
+
+
+def test_small_html_stays_inline(tmp_path):
+    message = {'raw_html': '<p>small</p>'}
+    assert offload_payload(message, LocalPayloadStore(str(tmp_path)), threshold=64 * 1024) == message
+    assert 'small' not in message_digest(json.dumps(message))
+
+
+def test_backend_copy_matches():
+    assert drifted('csphere-worker/classes/payload_store.py', 'backend/app/queues/payload_store.py') == []
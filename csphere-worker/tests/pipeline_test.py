@@ -0,0 +1,75 @@
+import threading
+import time
+
+from core.pipeline import Stage, StagedPipeline
+
+
+def _double(job):
+    job['value'] *= 2
+    return job
+
+
+def test_jobs_flow_through_every_stage():
+    done = []
+    lock = threading.Lock()
+
+    def collect(job):
+        with lock:
+            done.append(job['value'])
+
+    pipeline = StagedPipeline(
+        [
+            Stage('double', _double, workers=2, queue_size=2),
+            Stage('add', lambda job: {**job, 'value': job['value'] + 1}, workers=3, queue_size=2),
+        ],
+        on_complete=collect,
+    )
+    pipeline.start()
+    for i in range(20):
+        pipeline.submit({'value': i})
+    pipeline.shutdown()
+
+    assert sorted(done) == sorted(i * 2 + 1 for i in range(20))
+    assert pipeline.stats()['add']['processed'] == 20
+
+
+def test_dropped_and_failed_jobs_leave_the_pipeline():
+    completed, failed = [], []
+
+    def route(job):
+        if job['value'] == 0:
+            raise ValueError('boom')
+        return None if job['value'] == 1 else job
+
+    pipeline = StagedPipeline(
+        [Stage('route', route), Stage('never_for_dropped', lambda job: job)],
+        on_complete=lambda job: completed.append(job['value']),
+        on_error=lambda stage, job, e: failed.append((stage, job['value'])),
+    )
+    pipeline.start()
+    for i in range(3):
+        pipeline.submit({'value': i})
+    pipeline.shutdown()
+
+    assert failed == [('route', 0)]
+    assert sorted(completed) == [1, 2]
+    assert pipeline.stats()['never_for_dropped']['processed'] == 1
+
+
+def test_full_stage_pushes_back_on_submit():
+    release = threading.Event()
+
+    def slow(job):
+        release.wait()
+        return job
+
+    pipeline = StagedPipeline([Stage('slow', slow, workers=1, queue_size=1)])
+    pipeline.start()
+
+    assert pipeline.submit({'value': 0}, timeout=1)   # picked up by the worker
+    time.sleep(0.05)
+    assert pipeline.submit({'value': 1}, timeout=1)   # fills the queue
+    assert not pipeline.submit({'value': 2}, timeout=0.1)
+
+    release.set()
+    pipeline.shutdown()
@@ -0,0 +1,69 @@
+import time
+
+from queues import ActiveMQConsumer, FakeActiveMQBroker, QueueBackend, QueuedMessage
+
+
+class ScriptedQueue(QueueBackend):
+    '''claim() plays back results: a list is returned, an exception is raised'''
+    min_backoff = 0.05
+    max_backoff = 0.2
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    def enqueue(self, body, db=None):
+        return True
+
+    def claim(self, max_messages, wait=True):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_consumer_drains_queued_messages_in_one_batch():
+    with FakeActiveMQBroker() as broker:
+        for i in range(5):
+            broker.put('CSPHERETEST', f'message-{i}')
+
+        consumer = ActiveMQConsumer(broker.url, 'CSPHERETEST', 'admin', 'admin', read_timeout_ms=200, batch_size=10)
+        batch = consumer.receive_batch()
+        consumer.close()
+
+    assert batch == [f'message-{i}' for i in range(5)]
+    assert broker.depth('CSPHERETEST') == 0
+
+
+def test_consumer_returns_empty_batch_after_long_poll_times_out():
+    with FakeActiveMQBroker() as broker:
+        consumer = ActiveMQConsumer(broker.url, 'CSPHERETEST', 'admin', 'admin', read_timeout_ms=50)
+        assert consumer.receive_batch() == []
+        consumer.close()
+
+    assert broker.stats['empty_get'] == 1
+
+
+def test_batches_poll_again_after_an_empty_wait():
+    class WaitingQueue(ScriptedQueue):
+        def claim(self, max_messages, wait=True):
+            # the server side wait (long-poll / LISTEN)
+            time.sleep(self.min_backoff)
+            return super().claim(max_messages, wait)
+
+    queue = WaitingQueue([[], [], [QueuedMessage('saved')]])
+    start = time.perf_counter()
+    batch = next(queue.batches(10))
+
+    assert [message.body for message in batch] == ['saved']
+    # three waits, no client side sleep on top
+    assert time.perf_counter() - start < queue.min_backoff * 3 + 0.1
+
+
+def test_batches_back_off_only_after_errors():
+    queue = ScriptedQueue([RuntimeError('down'), RuntimeError('down'), [QueuedMessage('saved')]])
+    start = time.perf_counter()
+    batch = next(queue.batches(10))
+
+    assert [message.body for message in batch] == ['saved']
+    # 0.05 then 0.1
+    assert time.perf_counter() - start >= 0.15
@@ -0,0 +1,109 @@
+import numpy as np
+
+from tests.conftest import vector
+
+
+def _processor(chunk_size, file_hook=None):
+    from processors.rebucket import RebucketProcessor
+
+    class Processor(RebucketProcessor):
+        def _file(self, db, user_id, matches):
+            if file_hook is not None:
+                file_hook(matches)
+            return super()._file(db, user_id, matches)
+
+    return Processor(services=None, chunk_size=chunk_size)
+
+
+def _job(library, apply=True):
+    from schemas.content_schemas import RebucketSchema
+
+    kind = 'folder_rebucket' if apply else 'folder_rebucket_proposal'
+    job_id = library.job(kind)
+    return RebucketSchema(type='folder_rebucket', job_id=str(job_id), user_id=str(library.user_id), apply=apply)
+
+
+def test_library_is_scored_and_filed(library):
+    music = library.folder(url_patterns=['spotify\\.com'], embedding=vector(0, 0, 1))
+    code = library.folder(embedding=vector(1, 0, 0))
+    by_rule = library.content(url='https://open.spotify.com/track/1')
+    by_vector = library.content(vector(1, 0.1, 0))
+    unmatched = library.content(vector(0, 1, 0))
+    job = _job(library)
+
+    # chunks of 2: the last bookmark is scored in a second chunk
+    result = _processor(chunk_size=2).process(job, library.db)
+
+    assert result == {'processed': 3, 'assigned': 2}
+    assert sorted((folder_id, content_id) for folder_id, content_id, _ in library.filed()) == sorted([
+        (music, by_rule), (code, by_vector),
+    ])
+    assert unmatched not in {content_id for _, content_id, _ in library.filed()}
+
+    # only the bookmark with an embedding is in a profile
+    assert library.profile(music)['count'] == 0
+    profile = library.profile(code)
+    assert profile['count'] == 1
+    assert np.allclose(profile['sum'], np.asarray(vector(1, 0.1, 0), dtype=np.float32), atol=1e-5)
+
+    assert library.job_row(job.job_id) == {
+        'status': 'completed', 'total': 3, 'processed': 3, 'linked': 2, 'error': None,
+    }
+
+
+def test_proposal_writes_suggestions_only(library):
+    from sqlalchemy import text
+
+    code = library.folder(embedding=vector(1, 0, 0))
+    content_id = library.content(vector(1, 0, 0))
+    job = _job(library, apply=False)
+
+    assert _processor(chunk_size=10).process(job, library.db) == {'processed': 1, 'assigned': 1}
+    assert library.filed() == []
+    assert library.profile(code)['count'] == 0
+    suggestions = library.db.execute(
+        text("SELECT content_id, folder_id FROM folder_suggestion WHERE job_id = :job_id"), {'job_id': job.job_id},
+    ).all()
+    assert [tuple(row) for row in suggestions] == [(content_id, code)]
+
+
+def test_item_filed_during_the_job_is_counted_once(library):
+    from classes.folder_profile import add_to_folder_profile
+
+    code = library.folder(embedding=vector(1, 0, 0))
+    saved, other = library.content(vector(1, 0, 0)), library.content(vector(1, 0, 0))
+
+    def save_first(matches):
+        # the single-save path files one of them between the read and the write
+        library.file(code, saved)
+        add_to_folder_profile(library.db, code, [saved])
+        library.db.commit()
+
+    result = _processor(chunk_size=10, file_hook=save_first).process(_job(library), library.db)
+
+    # on_conflict skips the row that exists, only the new one is reported and profiled
+    assert result == {'processed': 2, 'assigned': 1}
+    assert sorted(content_id for _, content_id, _ in library.filed(code)) == sorted([saved, other])
+    profile = library.profile(code)
+    assert profile['count'] == 2
+    assert np.allclose(profile['sum'], np.asarray(vector(2, 0, 0), dtype=np.float32), atol=1e-5)
+
+
+def test_folder_added_mid_job_rescores_the_library(library):
+    library.folder(embedding=vector(0, 1, 0))
+    contents = [library.content(vector(1, 0, 0)) for _ in range(3)]
+    added = []
+
+    def add_folder(matches):
+        # nothing fits the first folder, a fitting one is created after the first chunk
+        if not added:
+            added.append(library.folder(embedding=vector(1, 0, 0)))
+
+    job = _job(library)
+    result = _processor(chunk_size=1, file_hook=add_folder).process(job, library.db)
+
+    # the first bookmark was scored before the folder existed: the reload starts over
+    # from the first unfiled bookmark instead of carrying on after it
+    assert result == {'processed': 4, 'assigned': 3}
+    assert sorted(content_id for _, content_id, _ in library.filed(added[0])) == sorted(contents)
+    assert library.job_row(job.job_id)['total'] == 4
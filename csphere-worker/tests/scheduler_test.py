@@ -0,0 +1,103 @@
+import json
+
+from queues import ActiveMQQueue, FakeActiveMQBroker, LaneScheduler, QueueBackend, QueuedMessage
+
+
+class MemoryQueue(QueueBackend):
+    # stands in for Postgres: unacked messages would come back
+    redelivers = True
+
+    def __init__(self):
+        self.messages = []
+
+    def enqueue(self, body, db=None):
+        self.messages.append(body)
+        return True
+
+    def claim(self, max_messages, wait=True):
+        batch, self.messages = self.messages[:max_messages], self.messages[max_messages:]
+        return [QueuedMessage(body) for body in batch]
+
+
+def _message(user_id, priority, n):
+    return json.dumps({'user_id': user_id, 'priority': priority, 'n': n})
+
+
+def test_interactive_first_and_bulk_capped_per_user():
+    interactive, bulk = MemoryQueue(), MemoryQueue()
+    scheduler = LaneScheduler(interactive, bulk, interactive_weight=1, bulk_user_max_in_flight=2)
+
+    for n in range(6):
+        scheduler.enqueue(_message('importer', 'bulk', n))
+    scheduler.enqueue(_message('other', 'bulk', 0))
+    scheduler.enqueue(_message('clicker', 'interactive', 0))
+    scheduler.enqueue(_message('clicker', 'interactive', 1))
+
+    first = scheduler.claim(1)
+    assert [m.lane for m in first] == ['interactive']
+
+    # the weight is used up, bulk gets its turn next to the remaining interactive message
+    second = scheduler.claim(8)
+    users = [m.user_id for m in second if m.lane == 'bulk']
+    assert second[0].lane == 'interactive'
+    assert users.count('importer') == 2
+    assert 'other' in users
+    # the importer's messages over the cap are held, not published again
+    assert bulk.messages == []
+    assert scheduler.held() == {'importer': 4}
+
+    for message in second:
+        scheduler.ack(message)
+    assert scheduler.in_flight() == {}
+
+    # acked messages free the importer's slots for the held ones
+    third = scheduler.claim(8)
+    assert [m.user_id for m in third] == ['importer', 'importer']
+    assert scheduler.held() == {'importer': 2}
+
+
+def test_users_rotate_across_claims():
+    interactive, bulk = MemoryQueue(), MemoryQueue()
+    scheduler = LaneScheduler(interactive, bulk, bulk_user_max_in_flight=1)
+
+    for user_id in 'abc':
+        for n in range(2):
+            scheduler.enqueue(_message(user_id, 'bulk', n))
+
+    order = []
+    for _ in range(6):
+        (message,) = scheduler.claim(1, wait=False)
+        order.append(message.user_id)
+        scheduler.ack(message)
+    assert order == ['a', 'b', 'c', 'a', 'b', 'c']
+
+
+def test_messages_held_too_long_go_back_to_the_queue():
+    interactive, bulk = MemoryQueue(), MemoryQueue()
+    scheduler = LaneScheduler(interactive, bulk, bulk_user_max_in_flight=1, hold_timeout=0)
+
+    for n in range(3):
+        scheduler.enqueue(_message('importer', 'bulk', n))
+
+    assert len(scheduler.claim(8, wait=False)) == 1
+    assert scheduler.held() == {}
+    assert len(bulk.messages) == 2
+
+
+def test_activemq_bulk_lane_holds_nothing():
+    with FakeActiveMQBroker() as broker:
+        for n in range(4):
+            broker.put('CSPHEREBULK', _message('importer', 'bulk', n))
+        broker.put('CSPHEREBULK', _message('other', 'bulk', 0))
+
+        options = {'read_timeout_ms': 50, 'batch_size': 10}
+        interactive = ActiveMQQueue(broker.url, 'CSPHERETEST', 'admin', 'admin', **options)
+        bulk = ActiveMQQueue(broker.url, 'CSPHEREBULK', 'admin', 'admin', **options)
+        scheduler = LaneScheduler(interactive, bulk, bulk_user_max_in_flight=2, release_delay=0)
+
+        batch = scheduler.claim(3, wait=False)
+        assert [m.user_id for m in batch] == ['importer', 'importer']
+        # a claim consumed them from the broker, nothing stays in the worker's memory
+        assert scheduler.held() == {}
+        assert broker.depth('CSPHEREBULK') == 3
+        scheduler.close()
@@ -0,0 +1,37 @@
+from classes.summary_cache import SummaryCache
+
+
+class MemoryStore:
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, key, prompt_version):
+        return self.rows.get((key, prompt_version))
+
+    def put(self, key, prompt_version, summary, categories):
+        self.rows[(key, prompt_version)] = (summary, categories)
+
+
+def test_same_content_is_summarized_once():
+    store = MemoryStore()
+    cache = SummaryCache('v1', store=store, max_entries=10)
+
+    assert cache.get('Title\n\nSome page   text') is None
+    cache.put('Title\n\nSome page   text', 'A summary.', ['News & Politics'])
+
+    # whitespace and case don't make it a different page
+    assert cache.get('title some page text') == ('A summary.', ['News & Politics'])
+
+    # a new process only has the store
+    fresh = SummaryCache('v1', store=store, max_entries=10)
+    assert fresh.get('Title Some page text') == ('A summary.', ['News & Politics'])
+    assert fresh.stats()['store_hits'] == 1
+
+
+def test_new_prompt_version_misses():
+    store = MemoryStore()
+    SummaryCache('v1', store=store).put('page', 'A summary.', [])
+
+    cache = SummaryCache('v2', store=store)
+    assert cache.get('page') is None
+    assert cache.stats()['misses'] == 1
@@ -3,6 +3,7 @@ from data_models.content_item import ContentItem
 from data_models.folder_item import folder_item
 from data_models.content_ai import ContentAI
 from data_models.content_tag import ContentTag
+from classes.folder_profile import add_to_folder_profile
 
 import logging
 import requests
@@ -63,6 +64,9 @@ def handle_existing_content(existing_content, user_id: str, db, notes: str, fold
                     added_at=utc_now
                 )
                 db.add(new_folder_link)
+                # existing content usually has its embedding already, it counts toward the folder profile now
+                db.flush()
+                add_to_folder_profile(db, folder_id, [content_id])
                 logging.info(f"Assigned content {content_id} to folder {folder_id}")
             else:
                 logging.info(f"Content {content_id} is already in folder {folder_id}, skipping link creation.")
@@ -1,32 +1,22 @@
 import json
-import requests
 import logging
-import time
-import os
-
-from uuid import uuid4
-from email.utils import quote
 
 from dotenv import load_dotenv
 
 from processors import get_processor
 from processors.bucket import BucketProcessor
 from processors.content import ContentProcessor
-from processors.web import WebParsingProcessor
-from schemas.content_schemas import MessageSchema
-
-from contextlib import contextmanager
-
-from database import SessionLocal
-
-@contextmanager
-def get_db_connection():
-    db = SessionLocal()
-    try:
-        yield db
+from processors.batch import BatchProcessor, record_import_progress
+from processors.rebucket import RebucketProcessor
+from schemas.content_schemas import MessageSchema, BookmarkBatchSchema, RebucketSchema
+from core.settings import get_settings
+from core.services import get_services
+from core.metrics import metrics
+from classes.payload_store import message_digest
+from stages import build_pipeline, schedule_archive
+from queues import QueueBackend, QueuedMessage, get_queue_backend
 
-    finally:
-        db.close()
+from database import get_db_connection
 
 
 #Logging config stuff
@@ -42,99 +32,221 @@ load_dotenv()
 
 
 def handle_message(message : dict, pydantic_message : MessageSchema):
+    '''
+    Sequential mode. The snapshot is scheduled on the archive workers as soon as the
+    content row is committed, so it runs while the summary is generated here
+    '''
     try:
 
         with get_db_connection() as db:
-            messageProcessor : ContentProcessor = get_processor('process_message', db )
+            messageProcessor : ContentProcessor = get_processor('process_message')
             logging.info("got the processor")
-            content_id : str = messageProcessor.process(message=message)
+            with metrics.timed('stage.create'):
+                content_id, needs_enrich = messageProcessor.create(message=message, db=db)
 
             logging.info(f'content id returned after processing message: {content_id}')
+            if content_id != '':
+                logging.info(f"Scheduling the archive of: {pydantic_message.content_payload.url}")
+                schedule_archive(get_services().archive_pipeline, str(content_id), pydantic_message.content_payload.url)
+
+            if content_id and needs_enrich:
+                with metrics.timed('stage.enrich'):
+                    messageProcessor.enrich(message=message, content_id=content_id, db=db)
+
             #only process if there is no folder id
             if content_id and pydantic_message.folder_id in ['default', None, '']:
                 logging.info('processing the content for folders')
-                bucketProcessor : BucketProcessor = get_processor('process_folder', db=db)
-                bucketProcessor.process(message=message, content_id=content_id)
-
-            if content_id != '':
-                webProcessor : WebParsingProcessor = get_processor('process_webpage', db=db)
-                logging.info(f"Processing following url and saving to content table: {pydantic_message.content_payload.url}")
-                webProcessor.process(content_id=content_id, url=pydantic_message.content_payload.url)
+                bucketProcessor : BucketProcessor = get_processor('process_folder')
+                with metrics.timed('stage.bucket'):
+                    bucketProcessor.process(message=message, content_id=content_id, db=db)
 
     except Exception as e:
         logging.error(f"Failed to fully process message: {e}")
+        raise
+
+
+def handle_batch_message(batch : BookmarkBatchSchema):
+    '''
+    One chunk of a bookmark import: the batch processor saves and enriches the new
+    bookmarks together (see processors/batch.py), then everything in the chunk is
+    archived / bucketed and the import job's progress is updated
+    '''
+    with get_db_connection() as db:
+        batchProcessor : BatchProcessor = get_processor('process_batch')
+        with metrics.timed('stage.batch'):
+            result = batchProcessor.process(batch=batch, db=db)
+
+        archive = get_services().archive_pipeline
+        for created in result['created']:
+            schedule_archive(archive, created['content_id'], created['url'])
+
+        bucketProcessor : BucketProcessor = get_processor('process_folder')
+        to_bucket = result['created'] + result['linked'] + [linked.model_dump() for linked in batch.linked]
+        for item in to_bucket:
+            message = batchProcessor.batch_message(batch, {
+                'url': item['url'],
+                'title': item['title'],
+                'source': 'browser import',
+                'first_saved_at': batch.enqueued_at.isoformat() if batch.enqueued_at else None,
+            })
+            with metrics.timed('stage.bucket'):
+                bucketProcessor.process(message=message, content_id=item['content_id'], db=db, content_embedding=item.get('embedding'))
+
+        count = len(batch.bookmarks) + len(batch.linked)
+        metrics.incr('import.processed', count)
+        metrics.incr('import.failed', result['failed'])
+        record_import_progress(db, batch.job_id, count)
+
+
+def handle_rebucket_message(job : RebucketSchema):
+    '''
+    Re-bucketing of a user's library: scored and filed chunk by chunk in one job
+    (see processors/rebucket.py), the job row carries the progress
+    '''
+    with get_db_connection() as db:
+        rebucketProcessor : RebucketProcessor = get_processor('process_rebucket')
+        try:
+            with metrics.timed('stage.rebucket'):
+                rebucketProcessor.process(job=job, db=db)
+        except Exception as e:
+            rebucketProcessor.fail(db, job.job_id, str(e))
+            raise
 
 
+def run_pipeline():
+    '''
+    Staged mode: messages are handed to the pipeline instead of being handled inline,
+    submit blocks while the first stage is full so polling slows down with it.
+    Messages are acked once they leave the pipeline and nacked when a stage fails
+    '''
+    settings = get_settings()
+    queue = get_queue_backend(settings)
 
-    
+    def on_complete(job : dict):
+        queue.ack(job['receipt'])
 
+    def on_error(stage_name : str, job : dict, e : Exception):
+        logging.error(f"[ERROR] Stage {stage_name} failed for {job['receipt']}: {e}")
+        queue.nack(job['receipt'])
 
-def poll_and_process():
-    ACTIVEMQ_URL=os.getenv('ACTIVEMQ_URL')
-    ACTIVEMQ_QUEUE= os.getenv('ACTIVEMQ_QUEUE')
-    ACTIVEMQ_USER= os.getenv('ACTIVEMQ_USER')
-    ACTIVEMQ_PASS= os.getenv('ACTIVEMQ_PASS')
+    pipeline = build_pipeline(settings, on_complete=on_complete, on_error=on_error, archive=get_services().archive_pipeline)
+    pipeline.start()
 
-    # ACTIVEMQ_URL='http://feeltiptop.com:8161/' 
-    # ACTIVEMQ_QUEUE='CSPHEREQUEUETEST' 
-    # ACTIVEMQ_USER='admin'
-    # ACTIVEMQ_PASS='tiptop'
+    def dispatch(msg_json : dict, pydantic_msg : MessageSchema, queued : QueuedMessage):
+        pipeline.submit({'message': msg_json, 'receipt': queued})
+        logging.info(f"Pipeline stats: {pipeline.stats()}")
+
+    try:
+        poll_and_process(dispatch=dispatch, queue=queue)
+    finally:
+        pipeline.shutdown()
 
 
-    queue_url = f"{ACTIVEMQ_URL}/api/message/{ACTIVEMQ_QUEUE}?type=queue&oneShot=true"
+def process_raw_message(queued: QueuedMessage, queue: QueueBackend, dispatch=None):
+    '''
+    Decodes and validates one queued message. Without a dispatch the message is handled
+    inline and acked here, otherwise dispatch takes over acking it
+    '''
+    message = queued.body
+    # large pages arrive as a payload reference, the body itself is never logged
+    digest = message_digest(message)
+    logging.info(f"Received message from queue: {digest}")
 
-    while True:
-        logging.info(f"Queue URL: {queue_url}")
-        try:
-            response = requests.get(queue_url, auth=(ACTIVEMQ_USER, ACTIVEMQ_PASS))
-            if response.text or response.text != "":
-                logging.info(f"Response status code: {response.status_code}")
-                logging.info(f"Response text: {response.text}")
-            
-            # Check if the response is valid and not empty
-            if response.status_code == 200 and response.text.strip():
-                logging.info("Pulled succesfully")
-                message = response.text.strip()
-
-                logging.info(f"Received message form queue: {message}")
-
-                try:
-                    msg_json = json.loads(message)
-                    #Validate the message JSON 
-                    pydantic_msg = MessageSchema(**msg_json)
-                    logging.info(f"Message json: {msg_json}")
-                    logging.info(f"Pydantic message: {pydantic_msg}")
-                    try:
-                        #function to actually handle the message / bookmark
-                        handle_message(msg_json, pydantic_msg)
-                    except Exception as e:
-                        logging.error(f"[ERROR] An error occurred in handle_message: {e} \n Message: {msg_json}")
-                        # retryCount = msg.get('retryCount', 0) + 1
-                        # msg['retryCount'] = retryCount
-
-                        # if 'timestamp' not in msg:
-                        #     msg['timestamp'] = datetime.now().isoformat()
-
-                        # logger.info(f"[REQUEUE] Requeueing message: {msg}")
-                        # if requeue_message(json.dumps(msg)):
-                        #     logging.info(f"[REQUEUE] Message requeued successfully: {msg}")
-                        # else:
-                        #     logging.error(f"[REQUEUE ERROR] Failed to requeue message: {msg}, message will not be processed again")
-                        
-                        # requeue_message(msg_json)
-                except json.JSONDecodeError:
-                    logging.error(f"[ERROR] Failed to decode JSON: {message}")
-            else:
-                logging.info(f"No messages found in the queue")
-            time.sleep(5)
+    try:
+        msg_json = json.loads(message)
+        if isinstance(msg_json, dict) and msg_json.get('type') == 'bookmark_batch':
+            return process_batch_message(queued, queue, BookmarkBatchSchema(**msg_json))
+        if isinstance(msg_json, dict) and msg_json.get('type') == 'folder_rebucket':
+            return process_rebucket_message(queued, queue, RebucketSchema(**msg_json))
+        #Validate the message JSON 
+        pydantic_msg = MessageSchema(**msg_json)
+        logging.info(f"Message {digest}: {pydantic_msg.content_payload.url} (html: {_html_digest(pydantic_msg)})")
+    except json.JSONDecodeError:
+        logging.error(f"[ERROR] Failed to decode JSON: {digest}")
+        # a malformed message will never succeed, drop it instead of redelivering it
+        queue.ack(queued)
+        return
+    except Exception as e:
+        logging.error(f"[ERROR] Invalid message: {e}")
+        queue.ack(queued)
+        return
 
-        except Exception as e:
-            logging.error(f"[ERROR] Polling error: {e}")
-            time.sleep(5)
+    if dispatch is not None:
+        dispatch(msg_json, pydantic_msg, queued)
+        return
+
+    try:
+        #function to actually handle the message / bookmark
+        handle_message(msg_json, pydantic_msg)
+        queue.ack(queued)
+    except Exception as e:
+        logging.error(f"[ERROR] An error occurred in handle_message: {e} \n Message: {digest}")
+        queue.nack(queued)
+
+
+def _html_digest(message: MessageSchema) -> str:
+    if message.raw_html_ref:
+        return f"{message.raw_html_ref.size} bytes offloaded, sha256:{message.raw_html_ref.sha256[:12]}"
+    if message.raw_html:
+        return f"{len(message.raw_html)} chars inline"
+    if message.page_text:
+        return f"{len(message.page_text)} chars of page text"
+    return 'none'
+
+
+def process_batch_message(queued: QueuedMessage, queue: QueueBackend, batch: BookmarkBatchSchema):
+    '''
+    Import chunks are handled inline in both modes, the scheduler already limits how
+    many of them a user has in flight
+    '''
+    try:
+        handle_batch_message(batch)
+        queue.ack(queued)
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to process import batch {batch.job_id}: {e}")
+        queue.nack(queued)
+
+
+def process_rebucket_message(queued: QueuedMessage, queue: QueueBackend, job: RebucketSchema):
+    '''
+    Handled inline like import chunks. A failed job is recorded on its row and acked,
+    a new job picks up whatever the failed one left unfiled
+    '''
+    try:
+        handle_rebucket_message(job)
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to re-bucket job {job.job_id}: {e}")
+    queue.ack(queued)
+
+
+def poll_and_process(dispatch=None, queue: QueueBackend = None):
+    '''
+    Pulls batches from the configured queue backend (QUEUE_BACKEND) and handles them
+    back-to-back. Idle waits happen server side in the backend, it only backs off after errors
+    '''
+    settings = get_settings()
+    queue = queue or get_queue_backend(settings)
+    logging.info(f"Consuming from {settings.QUEUE_BACKEND} queue")
+
+    try:
+        for batch in queue.batches(settings.ACTIVEMQ_BATCH_SIZE):
+            logging.info(f"Pulled {len(batch)} message(s) from the queue")
+            for queued in batch:
+                process_raw_message(queued, queue, dispatch=dispatch)
+            logging.debug(f"Connection pools: {get_services().pool_stats()}")
+            logging.debug(f"Metrics: {metrics.snapshot()}")
+    finally:
+        queue.close()
 
 
 if __name__ == '__main__':
     logging.info("Polling process has started")
     #start of the polling process
-    poll_and_process()
+    try:
+        if get_settings().WORKER_MODE == 'pipeline':
+            run_pipeline()
+        else:
+            poll_and_process()
+    finally:
+        get_services().close()
 
@@ -60,7 +60,7 @@ async function getAuthToken() {
   });
 }
 
-async function apiRequest(endpoint, method = "GET", body = null) {
+async function apiRequest(endpoint, method = "GET", body = null, { compress = false } = {}) {
   const token = await getAuthToken();
   const options = {
     method,
@@ -69,7 +69,12 @@ async function apiRequest(endpoint, method = "GET", body = null) {
       Authorization: `Bearer ${token}`,
     },
   };
-  if (body) options.body = JSON.stringify(body);
+  if (body && compress && typeof CompressionStream !== "undefined") {
+    options.headers["Content-Encoding"] = "gzip";
+    options.body = await gzipJSON(body);
+  } else if (body) {
+    options.body = JSON.stringify(body);
+  }
 
   const response = await fetch(`${BASE_URL}${endpoint}`, options);
   if (!response.ok) throw new Error(`API Error: ${response.status}`);
@@ -508,7 +513,8 @@ async function handleSaveBookmark() {
   btn.disabled = true;
 
   try {
-    const tab = await getActiveTab();
+    // the rendered page goes with the bookmark so the server doesn't have to load it again
+    const { html, tab } = await extractHTMLFromPage();
     const notesValue = document.getElementById("notesTextarea").value;
     const payload = {
       url: tab.url,
@@ -519,11 +525,12 @@ async function handleSaveBookmark() {
         tag_id: t.tag_id,
         tag_name: t.tag_name,
       })),
-      folder_id: activeFolderId !== "default" ? activeFolderId : null
+      folder_id: activeFolderId !== "default" ? activeFolderId : null,
+      raw_html: html
     };
 
-    console.log("sending request over", payload);
-    const res = await apiRequest("/content/save", "POST", payload);
+    console.log("sending request over", { ...payload, raw_html: html ? `${html.length} chars` : null });
+    const res = await apiRequest("/content/save", "POST", payload, { compress: true });
     if (res.status === "Success") {
       showStatus("Saved!", "success");
       resetBookmarkForm();
@@ -596,21 +603,28 @@ function resetBookmarkForm() {
   renderTags();
 }
 
-//Doesn't etract html anymore
-async function extractHTMLFromPage() {
-<<<<<<< HEAD:extension/popup.js
-  const [tab] = await chrome.tabs.query({ active: true, currentWindow: true });
-
-  // const [{ result }] = await chrome.scripting.executeScript({
-  //   target: { tabId: tab.id },
-  //   func: () => document.documentElement.outerHTML,
-  // });
+// Largest page sent with a save, the backend drops anything past 2 MB
+const MAX_CAPTURED_HTML = 2 * 1024 * 1024;
 
-  return { html: "", tab };
-=======
+async function extractHTMLFromPage() {
   const tab = await getActiveTab();
-  return { html: null, tab };
->>>>>>> a7c81e7 (Refactor: enqueue-only + worker HTML fetch):extension/firefox/popup.js
+  try {
+    const [result] = await browser.tabs.executeScript(tab.id, {
+      code: "document.documentElement.outerHTML",
+    });
+    return { html: result ? result.slice(0, MAX_CAPTURED_HTML) : null, tab };
+  } catch (err) {
+    // browser pages, the extension store, pdf viewers: the server renders these itself
+    console.warn("Could not capture the page html", err);
+    return { html: null, tab };
+  }
+}
+
+async function gzipJSON(body) {
+  const stream = new Blob([JSON.stringify(body)])
+    .stream()
+    .pipeThrough(new CompressionStream("gzip"));
+  return new Response(stream).arrayBuffer();
 }
 
 function renderLoginView() {
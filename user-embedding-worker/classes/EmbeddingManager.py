@@ -22,6 +22,7 @@ from data_models.content_item import ContentItem
 
 #currently not using the summarizer model 
 from classes import iab
+from classes.embedding_cache import get_embedding_cache
 
 
 
@@ -58,6 +59,9 @@ class ContentEmbeddingManager:
         self.openai_client = OpenAI(
             api_key= os.getenv("OPENAI_API_KEY")
         )
+        # shared with the api and csphere-worker through the embedding_cache table
+        self.embedding_cache = get_embedding_cache()
+        self.embedding_dims = int(os.getenv('EMBED_DIMENSIONS', '1536'))
 
         
 
@@ -185,9 +189,7 @@ class ContentEmbeddingManager:
 
 
     def generateCategories(self):
-        self.categorizer.setAiSummary(ai_summary=self.ai_summary)
-        self.categorizer.index_data()
-        categories_dic = self.categorizer.get_categories()
+        categories_dic = self.categorizer.categorize(self.ai_summary)
 
         return categories_dic
     
@@ -209,16 +211,22 @@ class ContentEmbeddingManager:
 
     def _generate_embedding(self, text):
         try:
-            response = self.openai_client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            if self.embedding_cache is not None:
+                return self.embedding_cache.embed_many(self.embedding_model, self.embedding_dims, [text], self._request_embeddings)[0]
+            return self._request_embeddings([text])[0]
         except Exception as e:
             print(f"OpenAI embedding failed: {e}")
             return None
         
 
+    def _request_embeddings(self, texts: list[str]) -> list:
+        response = self.openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
     def _content_ai_exists(self, content_id: UUID) -> bool:
         return self.db.query(ContentAI).filter_by(content_id=content_id).first() is not None
 
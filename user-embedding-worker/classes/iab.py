@@ -1,3 +1,4 @@
+import io
 import requests
 import json
 import argparse
@@ -5,6 +6,11 @@ from collections import defaultdict
 from typing import Dict, Optional
 import os
 
+# one pooled session for every SolrQuery, (connect, read) timeout on each call
+_session = requests.Session()
+TIMEOUT = (5, 30)
+
+
 class SolrQuery:
     """Base class for Solr interactions."""
     
@@ -17,7 +23,7 @@ class SolrQuery:
     def _post_file(self, url: str, files: dict, data: dict):
         """Helper method for posting files to a processing API."""
         print(f"[*] Uploading to {url}...")
-        resp = requests.post(url, files=files, data=data, verify=False)
+        resp = _session.post(url, files=files, data=data, verify=False, timeout=TIMEOUT)
         print(f"Status: {resp.status_code}")
         print(resp.text)
         print("Response headers: ", resp.headers)
@@ -25,7 +31,7 @@ class SolrQuery:
 
     def _get_request(self, url: str, params: dict):
         """Helper for GET requests."""
-        resp = requests.get(url, params=params, verify=False)
+        resp = _session.get(url, params=params, verify=False, timeout=TIMEOUT)
         print(f"GET {url} -> {resp.status_code}")
         return resp
 
@@ -57,13 +63,10 @@ class SolrQueryIAB(SolrQuery):
         })
 
     def get_file_content(self) -> Optional[Dict[str, object]]:
-        """Opens file and returns as dict for requests."""
-        if not self.file_path:
+        """Summary as an in-memory file for requests (no shared dummy.txt to race on)."""
+        if not self.ai_summary:
             return None
-        file_path = os.path.join(os.path.dirname(__file__), 'dummy.txt')
-        with open(file_path, 'w') as f:
-            f.write(self.ai_summary)
-        return {'file': open(file_path, 'rb')}
+        return {'file': ('summary.txt', io.BytesIO(self.ai_summary.encode('utf-8')), 'text/plain')}
 
     def index_data(self):
         """Uploads file to the processing API."""
@@ -85,7 +88,7 @@ class SolrQueryIAB(SolrQuery):
             }
             self._post_file(self.PROCESSING_API, files, data)
         finally:
-            for f in files.values():
+            for _, f, _ in files.values():
                 f.close()
 
     def index_html_data(self, url: str):
@@ -132,7 +135,7 @@ class SolrQueryIAB(SolrQuery):
     def get_html_content(self, url: str) -> Optional[str]:
         """Retrieves HTML content from a URL."""
         try:
-            resp = requests.get(url, timeout=10)
+            resp = _session.get(url, timeout=10)
             resp.raise_for_status()
             return resp.text
         except Exception as e:
@@ -184,11 +187,13 @@ class SolrQueryIAB(SolrQuery):
             print(f"{key}: {values}\n")
 
     def setAiSummary(self, ai_summary):
-        print("setting ai summary as : ", ai_summary)
         self.ai_summary = ai_summary
-        with open(self.file_path, 'w') as f:
-                f.write(self.ai_summary)
-                print("written succesfully")
+
+    def categorize(self, ai_summary: str) -> dict:
+        """Same interface as the centroid categorizer: upload the summary, then fetch its categories."""
+        self.setAiSummary(ai_summary)
+        self.index_data()
+        return self.get_categories()
 
 
 # if __name__ == "__main__":
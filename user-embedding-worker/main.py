@@ -4,6 +4,7 @@ from processors.user_embedding import UserEmbeddingProcessor
 from contextlib import contextmanager
 
 from database.database import SessionLocal
+from classes.embedding_cache import get_embedding_cache
 
 
 
@@ -44,6 +45,9 @@ def main():
             total_users_processed = embedding_processor.process_users_embeddings()
 
             logging.info(f"processed all ${total_users_processed} users")
+            cache = get_embedding_cache()
+            if cache is not None:
+                logging.info(f"Embedding cache: {cache.stats()}")
             return
 
             